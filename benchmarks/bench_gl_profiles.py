@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Frame time of every demo with the GL profiles of run.py, and with the flags the demos had before the profiles
+# (PyOpenGL's glGetError and logging after every call, errors on array copies).
+# Each measurement runs in a fresh process (PyOpenGL reads its flags on import) with an offscreen EGL context,
+# frames are rendered into a framebuffer object and finished with glFinish. The CPU time is the time of the
+# `render_frame` call (the GL calls are queued), that's where the per-call overhead of PyOpenGL is.
+# Run from the repository root:
+#   python -m benchmarks.bench_gl_profiles
+
+CONFIGURATIONS = {
+    # name -> (run.py profile, PyOpenGL flags overriding it)
+    'per-call checks': ('debug', dict(PYOPENGL_ERROR_CHECKING='1', PYOPENGL_ERROR_LOGGING='1', PYOPENGL_ERROR_ON_COPY='1')),
+    'debug': ('debug', {}),
+    'release': ('release', {}),
+}
+FRAME_SIZE = (800, 600)
+
+def measure(demo_id, n_warm_up_frames, n_frames):
+    """Runs in the child process, prints JSON with the frame times of the demo"""
+    from src.common import defines # applies COURSE_GL_PROFILE
+    import inspect
+    import time
+    from src.common.headless import HeadlessContext, OffscreenFramebuffer
+    HeadlessContext('egl')
+    from OpenGL.GL import glFinish
+    from src.common.asset_loader import default_asset_loader
+    from src.common.gl_debug import GlDebugOutput
+    from src.common.gl_state import default_gl_state
+    from src.common.shader_pool import default_shader_pool
+    from src.demos_loader import DemosLoader
+
+    if defines.DEFAULT_GL_PROFILE == 'debug':
+        debug_output = GlDebugOutput()
+        debug_output.enable()
+    width, height = FRAME_SIZE
+    framebuffer = OffscreenFramebuffer(width, height)
+
+    loader = DemosLoader.__new__(DemosLoader) # only the demo list, without a window
+    loader.register_all_demos()
+    demo = dict(loader.demos)[demo_id]
+    os.chdir(os.path.dirname(inspect.getfile(demo.__class__)))
+    for future in demo.load_assets(default_asset_loader):
+        future.result()
+    for shader in demo.load_programs(default_shader_pool):
+        shader.finish()
+    demo.load(window=None)
+    default_gl_state.invalidate()
+
+    frame_times_sec, cpu_times_sec = [], []
+    for frame_idx in range(n_warm_up_frames + n_frames):
+        start_sec = time.perf_counter()
+        demo.render_frame(width, height, frame_idx / 60, 1 / 60)
+        cpu_times_sec.append(time.perf_counter() - start_sec)
+        glFinish()
+        frame_times_sec.append(time.perf_counter() - start_sec)
+        default_gl_state.end_frame()
+    median_ms = lambda times_sec: sorted(times_sec[n_warm_up_frames:])[n_frames // 2] * 1000
+    print(json.dumps(dict(frame_ms=median_ms(frame_times_sec), cpu_ms=median_ms(cpu_times_sec))))
+    default_asset_loader.shutdown()
+
+def run_measurement(demo_id, configuration, args):
+    profile, flags = CONFIGURATIONS[configuration]
+    env = dict(os.environ, PYOPENGL_PLATFORM='egl', COURSE_GL_PROFILE=profile, **flags)
+    env.setdefault('EGL_PLATFORM', 'surfaceless')
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_gl_profiles', '--measure', demo_id,
+                             '--warm-up-frames', str(args.warm_up_frames), '--frames', str(args.frames)],
+                            capture_output=True, text=True, env=env)
+    if output.returncode != 0:
+        raise Exception(f'Measurement of {demo_id} with {configuration} failed: {output.stderr}')
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Demo frame times with the debug and release GL profiles')
+    parser.add_argument('demos', nargs='*', help='Demo ids, all demos by default')
+    parser.add_argument('--warm-up-frames', type=int, default=20)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure, args.warm_up_frames, args.frames)
+        return
+
+    src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+    demo_ids = args.demos or sorted(name for name in os.listdir(src_dir) if os.path.isfile(os.path.join(src_dir, name, 'demo.py')))
+    print('Median frame time / CPU time of a frame, ms')
+    print(f'{"demo":<28}' + ''.join(f'{name:>20}' for name in CONFIGURATIONS) + f'{"release CPU speedup":>21}')
+    for demo_id in demo_ids:
+        try:
+            medians = {name: run_measurement(demo_id, name, args) for name in CONFIGURATIONS}
+        except Exception as e:
+            print(f'{demo_id:<28} failed: {str(e).strip().splitlines()[-1]}')
+            continue
+        print(f'{demo_id:<28}' + ''.join(f'{median["frame_ms"]:>13.2f} /{median["cpu_ms"]:>5.2f}' for median in medians.values()) +
+              f'{medians["per-call checks"]["cpu_ms"] / medians["release"]["cpu_ms"]:>20.2f}x')
+
+if __name__ == '__main__':
+    main()
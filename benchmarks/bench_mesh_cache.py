@@ -0,0 +1,40 @@
+import argparse
+import tempfile
+import time
+
+from src.common.mesh_cache import MeshCache
+
+# Cold (parse + write the cache) vs warm (memory-map from the cache) mesh loading
+# Run from the repository root:
+#   python -m benchmarks.bench_mesh_cache
+
+ASSETS = [
+    'assets/human_head/head.obj',
+    'assets/spot_cow/spot_triangulated.obj',
+]
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesh cache cold vs warm load time')
+    parser.add_argument('--layout', default='P3_T2')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"input":<40} {"cold, ms":>9} {"warm, ms":>9} {"speedup":>8}')
+    for filepath in ASSETS:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MeshCache(cache_dir)
+            start = time.perf_counter()
+            cache.load(filepath, args.layout, use_index_buffer=True, verbose=False)
+            cold_sec = time.perf_counter() - start
+
+            warm_sec = float('inf')
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                attributes, indices = cache.load(filepath, args.layout, use_index_buffer=True, verbose=False)
+                # touch the data, as glBufferData would
+                attributes.sum(), indices.sum()
+                warm_sec = min(warm_sec, time.perf_counter() - start)
+            print(f'{filepath:<40} {cold_sec*1e3:>9.1f} {warm_sec*1e3:>9.1f} {cold_sec/warm_sec:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import time
+import numpy as np
+
+from src.common.obj_loader import ParsedWavefront, parse_interleaved_layout
+from .bench_obj_loader import make_grid_wavefront
+
+# Compares building interleaved attributes with the structured buffer against
+# the previous gather + pad + hstack + ascontiguousarray path
+# Run from the repository root:
+#   python -m benchmarks.bench_obj_interleave
+
+def interleave_with_hstack(parsed, attributes_layout, dtype):
+    """The previous implementation of ParsedWavefront.__make_interleaved_attributes for indexed data"""
+    attributes = {
+        'P': np.asarray(parsed['positions_parsed'])[parsed['positions_indices']],
+        'T': np.asarray(parsed['texcoords_parsed'])[parsed['texcoords_indices']],
+        'N': np.asarray(parsed['normals_parsed'])[parsed['normals_indices']],
+    }
+    arrays_to_stack = []
+    for key, used_coordinates in parse_interleaved_layout(attributes_layout):
+        extension_width = max(0, used_coordinates - attributes[key].shape[1])
+        if extension_width:
+            attributes[key] = np.pad(attributes[key], ((0, 0), (0, extension_width)))
+        arrays_to_stack.append(attributes[key][:, :used_coordinates])
+    return np.ascontiguousarray(np.hstack(arrays_to_stack), dtype=dtype)
+
+def measure(fn, repeats):
+    best_sec = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best_sec = min(best_sec, time.perf_counter() - start)
+    return best_sec
+
+def main():
+    parser = argparse.ArgumentParser(description='Interleaving time of parsed OBJ attributes')
+    parser.add_argument('--grid', type=int, default=1000, help='Side of the synthetic quad grid')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    scene = ParsedWavefront('', parse=False)
+    scene.parsed = ParsedWavefront.parse_string(make_grid_wavefront(args.grid), verbose=False)
+    n_vertices = len(scene.parsed['positions_indices'])
+
+    print(f'{"layout":<12} {"dtype":<8} {"vertices":>10} {"hstack, ms":>11} {"structured, ms":>15} {"speedup":>8}')
+    for layout in ['P3_T2', 'P3_T2_N3', 'P4_N3']:
+        for dtype in [np.float32, np.float64]:
+            def structured():
+                scene.materialized = {}
+                scene.as_numpy_indexed(layout, attrib_dtype=dtype)
+            hstack_sec = measure(lambda: interleave_with_hstack(scene.parsed, layout, dtype), args.repeats)
+            structured_sec = measure(structured, args.repeats)
+            print(f'{layout:<12} {np.dtype(dtype).name:<8} {n_vertices:>10} {hstack_sec*1000:>11.1f} {structured_sec*1000:>15.1f} {hstack_sec/structured_sec:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
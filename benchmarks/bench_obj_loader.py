@@ -0,0 +1,59 @@
+import argparse
+import time
+import numpy as np
+
+from src.common.obj_loader import ParsedWavefront
+
+# Compares the bulk OBJ parser against the line-by-line reference parser
+# Run from the repository root:
+#   python -m benchmarks.bench_obj_loader
+
+ASSETS = [
+    'assets/human_head/head.obj',
+    'assets/spot_cow/spot_triangulated.obj',
+]
+
+def make_grid_wavefront(n_quads_side: int) -> str:
+    """Generates an OBJ string with a flat grid of n_quads_side x n_quads_side quads,
+       with positions, texture coordinates and one normal"""
+    n_vertices_side = n_quads_side + 1
+    u, v = np.meshgrid(np.linspace(0, 1, n_vertices_side), np.linspace(0, 1, n_vertices_side))
+    u, v = u.ravel(), v.ravel()
+    positions = '\n'.join(map('v {:.6f} {:.6f} 0.0'.format, u, v))
+    texcoords = '\n'.join(map('vt {:.6f} {:.6f}'.format, u, v))
+
+    rows, cols = np.meshgrid(np.arange(n_quads_side), np.arange(n_quads_side), indexing='ij')
+    corner = (rows * n_vertices_side + cols).ravel() + 1
+    quads = np.stack([corner, corner + 1, corner + n_vertices_side + 1, corner + n_vertices_side], axis=-1)
+    faces = '\n'.join(map('f {0}/{0}/1 {1}/{1}/1 {2}/{2}/1 {3}/{3}/1'.format, *quads.T))
+    return f'# synthetic grid\n{positions}\n{texcoords}\nvn 0.0 0.0 1.0\n{faces}\n'
+
+def measure(parse_fn, wavefront_str, repeats):
+    best_sec = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse_fn(wavefront_str, verbose=False)
+        best_sec = min(best_sec, time.perf_counter() - start)
+    return best_sec
+
+def main():
+    parser = argparse.ArgumentParser(description='OBJ parsing throughput, lines per second')
+    parser.add_argument('--grid', type=int, default=700, help='Side of the synthetic quad grid')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    inputs = []
+    for filepath in ASSETS:
+        with open(filepath, 'r') as f:
+            inputs.append((filepath, f.read()))
+    inputs.append((f'synthetic {args.grid}x{args.grid} quads', make_grid_wavefront(args.grid)))
+
+    print(f'{"input":<40} {"lines":>9} {"per-line, lines/s":>18} {"bulk, lines/s":>14} {"speedup":>8}')
+    for name, wavefront_str in inputs:
+        n_lines = wavefront_str.count('\n')
+        per_line_sec = measure(ParsedWavefront.parse_string_per_line, wavefront_str, args.repeats)
+        bulk_sec = measure(ParsedWavefront.parse_string, wavefront_str, args.repeats)
+        print(f'{name:<40} {n_lines:>9} {n_lines/per_line_sec:>18,.0f} {n_lines/bulk_sec:>14,.0f} {per_line_sec/bulk_sec:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from .bench_obj_loader import make_grid_wavefront
+
+# Peak resident memory of parsing an OBJ file and building indexed arrays,
+# each input is measured in a fresh process
+# Run from the repository root:
+#   python -m benchmarks.bench_obj_memory
+
+def measure_in_subprocess(obj_path):
+    # VmHWM is the peak RSS of the current process image (unlike ru_maxrss, it isn't inherited from the parent)
+    code = (
+        'def peak_rss_kib():\n'
+        "    with open('/proc/self/status') as f:\n"
+        "        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))\n"
+        'from src.common.obj_loader import ParsedWavefront\n'
+        'baseline_kib = peak_rss_kib()\n'
+        f'scene = ParsedWavefront({obj_path!r}, verbose=False)\n'
+        "attributes, indices = scene.as_numpy_indexed('P3_T2')\n"
+        "attributes, indices = scene.as_numpy_indexed('P3_T2')\n"
+        'print(baseline_kib, peak_rss_kib())\n'
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if output.returncode != 0:
+        return None, None
+    baseline_kib, peak_kib = map(int, output.stdout.split())
+    return baseline_kib / 1024, peak_kib / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak RSS of OBJ parsing')
+    parser.add_argument('--grid', type=int, default=1581, help='Side of the synthetic quad grid (1581 is ~5M triangles)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        grid_path = os.path.join(temporary_dir, 'grid.obj')
+        with open(grid_path, 'w') as f:
+            f.write(make_grid_wavefront(args.grid))
+
+        inputs = [
+            ('assets/human_head/head.obj', 'assets/human_head/head.obj'),
+            (f'synthetic {2*args.grid**2/1e6:.1f}M triangles', grid_path),
+        ]
+        print(f'{"input":<40} {"file, MiB":>10} {"peak RSS, MiB":>14} {"after imports, MiB":>19}')
+        for name, obj_path in inputs:
+            baseline_mib, peak_mib = measure_in_subprocess(obj_path)
+            file_mib = os.path.getsize(obj_path) / 2**20
+            if peak_mib is None:
+                print(f'{name:<40} {file_mib:>10.0f} {"failed (out of memory?)":>14}')
+                continue
+            print(f'{name:<40} {file_mib:>10.0f} {peak_mib:>14.0f} {baseline_mib:>19.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import os
+import tempfile
+import time
+
+from src.common.obj_loader import ParsedWavefront
+from .bench_obj_loader import make_grid_wavefront
+
+# Scaling of the multi-process OBJ parsing with the number of workers
+# Run from the repository root:
+#   python -m benchmarks.bench_obj_parallel --max-workers 8
+
+def main():
+    parser = argparse.ArgumentParser(description='OBJ parsing time from 1 to N worker processes')
+    parser.add_argument('--grid', type=int, default=1000, help='Side of the synthetic quad grid (each quad is 2 triangles)')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        obj_path = os.path.join(temporary_dir, 'grid.obj')
+        with open(obj_path, 'w') as f:
+            f.write(make_grid_wavefront(args.grid))
+        with open(obj_path, 'rb') as f:
+            n_lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(2**24), b''))
+        print(f'Synthetic grid: {args.grid}x{args.grid} quads, {n_lines} lines, '
+              f'{os.path.getsize(obj_path) / 2**20:.0f} MiB, {os.cpu_count()} CPUs')
+
+        print(f'{"workers":>7} {"time, s":>8} {"lines/s":>12} {"speedup":>8}')
+        serial_sec = None
+        for workers in range(1, args.max_workers + 1):
+            start = time.perf_counter()
+            ParsedWavefront(obj_path, verbose=False, workers=workers)
+            elapsed_sec = time.perf_counter() - start
+            serial_sec = serial_sec or elapsed_sec
+            print(f'{workers:>7} {elapsed_sec:>8.2f} {n_lines/elapsed_sec:>12,.0f} {serial_sec/elapsed_sec:>7.2f}x')
+
+if __name__ == '__main__':
+    main()
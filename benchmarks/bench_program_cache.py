@@ -0,0 +1,99 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Shader loading time of every demo with a cold and a warm program binary cache,
+# each measurement runs in a fresh process with an offscreen EGL context (e.g. Mesa's llvmpipe without a display).
+# Mesa's own shader cache starts empty in every process (it can't be disabled, Mesa implements program binaries with it),
+# so that the cold run really compiles and the warm run is sped up only by the program binary cache.
+# Run from the repository root:
+#   python -m benchmarks.bench_program_cache
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+COMMON_SHADERS_DIR = os.path.join(SRC_DIR, 'common', 'shaders')
+
+# programs of TextureDrawer and AxesGismoDrawer, made by the demos with extra visualizations
+DRAWER_PROGRAMS = [
+    (os.path.join(COMMON_SHADERS_DIR, 'transform_vert.glsl'), os.path.join(COMMON_SHADERS_DIR, 'texture_frag.glsl')),
+    (os.path.join(COMMON_SHADERS_DIR, 'transform_vert.glsl'), os.path.join(COMMON_SHADERS_DIR, 'color_frag.glsl')),
+]
+
+DEMOS_WITH_DRAWERS = ['L02_4_mesh']
+
+def demo_programs():
+    """Returns a dict demo id -> list of (vertex shader path, fragment shader path)"""
+    programs = {}
+    for demo_dp in sorted(glob.glob(os.path.join(SRC_DIR, 'L*'))):
+        pairs = []
+        for vertex_path in sorted(glob.glob(os.path.join(demo_dp, '*vert.glsl'))):
+            fragment_path = vertex_path[:-len('vert.glsl')] + 'frag.glsl'
+            if os.path.isfile(fragment_path):
+                pairs.append((vertex_path, fragment_path))
+        if pairs:
+            demo_id = os.path.basename(demo_dp)
+            programs[demo_id] = pairs + (DRAWER_PROGRAMS if demo_id in DEMOS_WITH_DRAWERS else [])
+    return programs
+
+def measure(demo_id, cache_dir):
+    """Runs in the child process, prints JSON with the loading time of the demo programs"""
+    import time
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+    from src.common.program_binary_cache import ProgramBinaryCache
+    from src.common.shader_pool import ShaderPool
+    from src.common.headless import HeadlessContext
+    HeadlessContext('egl')
+
+    # the first compilation initializes the compiler, it isn't a part of any demo load
+    warm_up_pairs = DRAWER_PROGRAMS[:1]
+    ShaderPool().load(*warm_up_pairs[0], out_variable=b'out_color')
+
+    cache = ProgramBinaryCache(cache_dir)
+    pool = ShaderPool(binary_cache=cache)
+    start_sec = time.perf_counter()
+    shaders = [pool.load(vertex_path, fragment_path, out_variable=b'out_color') for vertex_path, fragment_path in demo_programs()[demo_id]]
+    glFinish()
+    load_time_sec = time.perf_counter() - start_sec
+    print(json.dumps(dict(load_time_sec=load_time_sec, hits=cache.hits, misses=cache.misses,
+                          n_programs=len(shaders), renderer=glGetString(GL_RENDERER).decode())))
+
+def run_measurement(demo_id, cache_dir):
+    with tempfile.TemporaryDirectory() as mesa_cache_dir:
+        env = dict(os.environ, PYOPENGL_PLATFORM='egl', MESA_SHADER_CACHE_DIR=mesa_cache_dir)
+        env.setdefault('EGL_PLATFORM', 'surfaceless')
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_program_cache', '--measure', demo_id, '--cache-dir', cache_dir],
+                                capture_output=True, text=True, env=env)
+    if output.returncode != 0:
+        raise Exception(f'Measurement of {demo_id} failed: {output.stderr}')
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Demo shader loading time with a cold and a warm program binary cache')
+    parser.add_argument('--repeats', type=int, default=3, help='Best of N runs')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure, args.cache_dir)
+        return
+
+    renderer = None
+    print(f'{"demo":<28} {"programs":>8} {"cold, ms":>9} {"warm, ms":>9} {"speedup":>8}')
+    for demo_id in demo_programs():
+        cold_ms, warm_ms = [], []
+        for _ in range(args.repeats):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cold = run_measurement(demo_id, cache_dir)
+                warm = run_measurement(demo_id, cache_dir)
+            assert warm['hits'] == warm['n_programs'], f'{demo_id}: not all programs were loaded from binaries'
+            cold_ms.append(cold['load_time_sec'] * 1000)
+            warm_ms.append(warm['load_time_sec'] * 1000)
+            renderer = cold['renderer']
+        print(f'{demo_id:<28} {cold["n_programs"]:>8} {min(cold_ms):>9.1f} {min(warm_ms):>9.1f} {min(cold_ms)/min(warm_ms):>7.1f}x')
+    print('Renderer:', renderer)
+
+if __name__ == '__main__':
+    main()
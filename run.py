@@ -1,26 +1,237 @@
 import argparse
-from src.demos_loader import DemosLoader
+import json
+import logging
+import os
+import sys
 from src.common.window import *
 
+# sets up PyOpenGL, before anything imports OpenGL.GL
 from src.common import defines
-from OpenGL.GL import *
 
 def parse_arguments():
     parser = argparse.ArgumentParser(prog='CourseDemos', description='OpenGL ISP course demos and homeworks')
     parser.add_argument('startup_demo', nargs='?', default='L01_7_julia',
                     help='Directory of the demo that will show up first (helps to debug)')
     parser.add_argument('--nogui', dest='use_gui', action='store_false')
+    parser.add_argument('--prefetch-budget-mb', type=int, default=512,
+                    help='Memory for assets of the neighbouring demos loaded ahead, 0 disables prefetching')
+    parser.add_argument('--no-program-cache', dest='use_program_cache', action='store_false',
+                    help='Always compile shaders from sources, without the program binaries stored in .cache/programs')
+    parser.add_argument('--gl-profile', choices=list(defines.GL_PROFILES), default=defines.DEFAULT_GL_PROFILE,
+                    help='debug: errors are reported by the driver through GL_KHR_debug (checked after every call without it), '
+                         'release: no GL error reporting')
+    parser.add_argument('--gl-debug-severity', choices=defines.GL_DEBUG_SEVERITIES, default='medium',
+                    help='Least severe driver messages logged by the debug profile')
+    parser.add_argument('--gl-debug-sources', type=lambda value: value.split(','), default=list(defines.GL_DEBUG_SOURCES),
+                    help=f'Comma-separated sources of driver messages logged by the debug profile, of: {",".join(defines.GL_DEBUG_SOURCES)}')
+    parser.add_argument('--error-on-copy', action='store_true',
+                    help='Raise when PyOpenGL has to copy an array passed to a GL call (with any profile)')
+    parser.add_argument('--trace-dump-sec', type=float, default=10.0,
+                    help='Seconds of the CPU frame trace collected after the T key, then exported (Chrome trace_event JSON in .cache/traces)')
+    parser.add_argument('--max-fps', type=float, default=60.0,
+                    help='Frame rate cap of the animated demos, 0 for none (vsync still applies), '
+                         'the other demos are redrawn only after input and window events')
+    parser.add_argument('--capture-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'captures'),
+                    help='Directory of the frames recorded with the C key')
+    parser.add_argument('--capture-video', action='store_true',
+                    help='Record a video with ffmpeg instead of PNG files')
+    parser.add_argument('--capture-encoder',
+                    help='Encoder command reading raw RGBA frames from stdin for --capture-video, '
+                         'with {width}, {height}, {fps} and {output} placeholders')
+    parser.add_argument('--size', type=parse_size, default=(800, 600),
+                    help='Size of the window or of the headless frames, WIDTHxHEIGHT')
+    parser.add_argument('--headless', nargs='?', const='egl', choices=defines.HEADLESS_BACKENDS,
+                    help='Render without a window and a display into an offscreen framebuffer, with EGL (default) or OSMesa')
+    parser.add_argument('--frames', type=int, default=60,
+                    help='Number of frames rendered in the headless mode')
+    parser.add_argument('--screenshot', help='PNG file to save the last headless frame to')
     return parser.parse_args()
 
+def parse_size(value):
+    try:
+        width, height = (int(size) for size in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Expected WIDTHxHEIGHT, got {value}')
+    return width, height
+
+def parse_bench_arguments(argv):
+    parser = argparse.ArgumentParser(prog='CourseDemos bench',
+                    description='Headless frame time benchmark of the demos, with a comparison to a baseline report')
+    parser.add_argument('demos', nargs='*', help='Demo ids, all demos by default')
+    parser.add_argument('--warm-up-frames', type=int, default=20, help='Frames rendered before the measured ones')
+    parser.add_argument('--frames', type=int, default=200, help='Measured frames of each demo')
+    parser.add_argument('--size', type=parse_size, default=(800, 600), help='Size of the frames, WIDTHxHEIGHT')
+    parser.add_argument('--backend', choices=defines.HEADLESS_BACKENDS, default='egl')
+    parser.add_argument('--gl-profile', choices=list(defines.GL_PROFILES), default='release')
+    parser.add_argument('--no-program-cache', dest='use_program_cache', action='store_false')
+    parser.add_argument('--output', default=os.path.join('.cache', 'bench', 'report.json'), help='JSON report file')
+    parser.add_argument('--baseline', help='JSON report to compare with, the exit code is 1 if any demo regressed')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                    help='Regression threshold, e.g. 0.1 when a demo is 10%% slower than in the baseline')
+    parser.add_argument('--min-regression-ms', type=float, default=0.05,
+                    help="Smaller slowdowns aren't regressions, whatever the threshold")
+    parser.add_argument('--update-baseline', action='store_true', help='Write the report to the baseline file too')
+    return parser.parse_args(argv)
+
+def parse_render_arguments(argv):
+    parser = argparse.ArgumentParser(prog='CourseDemos render',
+                    description='Offline rendering of a demo into PNG files, with the time of a virtual clock')
+    parser.add_argument('--demo', default='L01_7_julia', help='Directory of the demo')
+    parser.add_argument('--frames', type=parse_frame_range, default=range(0, 600),
+                    help='Frames START:STOP (STOP excluded) or a number of frames from 0, frame n is at n / fps seconds')
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--size', type=parse_size, default=(1920, 1080), help='Size of the frames, WIDTHxHEIGHT')
+    parser.add_argument('--output', help='Directory of the PNG files, .cache/renders/<demo> by default')
+    parser.add_argument('--workers', type=int, help='PNG encoding processes, the number of CPUs by default')
+    parser.add_argument('--backend', choices=defines.HEADLESS_BACKENDS, default='egl')
+    parser.add_argument('--gl-profile', choices=list(defines.GL_PROFILES), default='release')
+    return parser.parse_args(argv)
+
+def parse_frame_range(value):
+    try:
+        start, stop = value.split(':') if ':' in value else (0, value)
+        frames = range(int(start), int(stop))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Expected START:STOP or a number of frames, got {value}')
+    if not frames:
+        raise argparse.ArgumentTypeError(f'No frames in {value}')
+    return frames
+
+def run_render(args):
+    defines.apply_headless_backend(args.backend)
+    defines.apply_gl_profile(args.gl_profile)
+    from src.demos_loader import DemosLoader
+    from src.common.frame_capture import FrameCapture, ProcessPoolPngSink
+    from src.common.headless import HeadlessContext, OffscreenFramebuffer
+    from src.common.asset_loader import default_asset_loader
+    import time
+
+    output_dir = os.path.abspath(args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'renders', args.demo))
+    HeadlessContext(args.backend, size=args.size)
+    framebuffer = OffscreenFramebuffer(*args.size)
+    loader = DemosLoader(prefetch_budget_bytes=0)
+    if args.demo not in dict(loader.demos):
+        raise Exception(f'Unknown demo {args.demo}, expected one of {", ".join(demo_id for demo_id, _ in loader.demos)}')
+    # every frame is written, the renderer waits for the encoding instead of dropping frames
+    capture = FrameCapture(drop_frames=False)
+    start_sec = time.perf_counter()
+    try:
+        loader.load(None, use_gui=False, startup_demo_id=args.demo, framebuffer=framebuffer)
+        capture.start(ProcessPoolPngSink(output_dir, max_workers=args.workers))
+        loader.render_headless(args.frames, fps=args.fps, frame_capture=capture)
+    finally:
+        capture.stop()
+        default_asset_loader.shutdown()
+    elapsed_sec = time.perf_counter() - start_sec
+    print(f'> {capture.n_written} frames written to {output_dir} in {elapsed_sec:.1f} s, '
+          f'{capture.n_written / elapsed_sec:.1f} frames/s')
+
+def run_bench(args):
+    defines.apply_headless_backend(args.backend)
+    defines.apply_gl_profile(args.gl_profile)
+    from src.demos_loader import DemosLoader
+    from src.demos_benchmark import DemosBenchmark, compare_reports
+    from src.common.headless import HeadlessContext, OffscreenFramebuffer
+    from src.common.asset_loader import default_asset_loader
+
+    # demos change the working directory
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    HeadlessContext(args.backend, size=args.size)
+    framebuffer = OffscreenFramebuffer(*args.size)
+    loader = DemosLoader(prefetch_budget_bytes=0, use_program_cache=args.use_program_cache)
+    loader.use_framebuffer(framebuffer)
+    try:
+        benchmark = DemosBenchmark(loader, warm_up_frames=args.warm_up_frames, n_frames=args.frames)
+        report = benchmark.run(args.demos)
+    finally:
+        default_asset_loader.shutdown()
+
+    print(f'Renderer: {report["renderer"]}, {args.frames} frames of {args.size[0]}x{args.size[1]}')
+    print(f'{"demo":<28}{"load ms":>10}{"frame p50":>11}{"p95":>8}{"p99":>8}{"gpu p50":>10}{"p95":>8}{"p99":>8}')
+    for demo_id, result in report['demos'].items():
+        if 'error' in result:
+            print(f'{demo_id:<28} failed: {result["error"]}')
+            continue
+        frame_ms, gpu_ms = result['frame_ms'], result['gpu_ms']
+        print(f'{demo_id:<28}{result["load_ms"]:>10.1f}{frame_ms["p50"]:>11.2f}{frame_ms["p95"]:>8.2f}{frame_ms["p99"]:>8.2f}' +
+              (f'{gpu_ms["p50"]:>10.2f}{gpu_ms["p95"]:>8.2f}{gpu_ms["p99"]:>8.2f}' if gpu_ms else f'{"-":>10}'))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('> Report written to', output_path)
+
+    regressions = []
+    if baseline_path and os.path.isfile(baseline_path):
+        with open(baseline_path) as f:
+            regressions = compare_reports(report, json.load(f), args.threshold, args.min_regression_ms)
+        for regression in regressions:
+            print('> Regression:', regression)
+        print(f'> {len(regressions)} regressions over {args.threshold*100:.0f}% compared to {baseline_path}')
+    elif baseline_path and not args.update_baseline:
+        raise Exception(f"Baseline {baseline_path} doesn't exist, --update-baseline creates it")
+    if baseline_path and args.update_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('> Baseline updated')
+    return 1 if regressions else 0
+
+def run_headless(args):
+    from src.demos_loader import DemosLoader
+    from src.common.gl_debug import GlDebugOutput
+    from src.common.headless import HeadlessContext, OffscreenFramebuffer
+    from OpenGL.GL import glGetString, GL_RENDERER
+    from src.common.asset_loader import default_asset_loader
+    from PIL import Image
+
+    # the context lives until the process exits, as the GL objects of the demos and of the caches
+    HeadlessContext(args.headless, size=args.size)
+    print('> GPU Configuration', glGetString(GL_RENDERER))
+    print('> GL profile:', args.gl_profile)
+    if args.gl_profile == 'debug':
+        debug_output = GlDebugOutput(min_severity=args.gl_debug_severity, sources=args.gl_debug_sources)
+        debug_output.enable()
+    # demos change the working directory
+    screenshot_path = os.path.abspath(args.screenshot) if args.screenshot else None
+
+    framebuffer = OffscreenFramebuffer(*args.size)
+    # there is no demo switch to prefetch for
+    loader = DemosLoader(prefetch_budget_bytes=0, use_program_cache=args.use_program_cache)
+    try:
+        loader.load(None, use_gui=False, startup_demo_id=args.startup_demo, framebuffer=framebuffer)
+        loader.render_headless(range(args.frames))
+        if screenshot_path:
+            Image.fromarray(framebuffer.read_pixels()).save(screenshot_path)
+            print('> Saved the last frame to', screenshot_path)
+    finally:
+        default_asset_loader.shutdown()
+
 def main():
+    # warnings of all modules, the GL debug output lowers the level of its logger to the wanted severity
+    logging.basicConfig(level=logging.WARNING)
+    if sys.argv[1:2] == ['bench']:
+        sys.exit(run_bench(parse_bench_arguments(sys.argv[2:])))
+    if sys.argv[1:2] == ['render']:
+        run_render(parse_render_arguments(sys.argv[2:]))
+        return
     args = parse_arguments()
+    if args.headless:
+        defines.apply_headless_backend(args.headless)
+    defines.apply_gl_profile(args.gl_profile, error_on_copy=args.error_on_copy)
+    if args.headless:
+        run_headless(args)
+        return
+    from src.demos_loader import DemosLoader
+    from src.common.gl_debug import GlDebugOutput
+    from src.common.frame_capture import EncoderPipeSink
+    from OpenGL.GL import glGetString, GL_VENDOR, GL_RENDERER
 
     # GLFW is cross platform library for creating and interacting with windows
     if not glfw.init():
         raise SystemError("Can't initialize windowing library GLFW")
 
     try:
-        window = glfw_create_window('OpenGL Course Demos', window_size=(800, 600))
+        window = glfw_create_window('OpenGL Course Demos', window_size=args.size, debug_context=args.gl_profile == 'debug')
 
         # OpenGL commands can be called from one and only thread
         # this commands marks the current thread as the drawing one
@@ -28,8 +239,15 @@ def main():
 
         print('> GPU Vendor:', glGetString(GL_VENDOR))
         print('> GPU Configuration', glGetString(GL_RENDERER))
+        print('> GL profile:', args.gl_profile)
+        if args.gl_profile == 'debug':
+            debug_output = GlDebugOutput(min_severity=args.gl_debug_severity, sources=args.gl_debug_sources)
+            debug_output.enable()
 
-        loader = DemosLoader()
+        capture_encoder = (args.capture_encoder or EncoderPipeSink.DEFAULT_COMMAND) if args.capture_video else None
+        loader = DemosLoader(prefetch_budget_bytes=args.prefetch_budget_mb * 2**20, use_program_cache=args.use_program_cache,
+                             trace_dump_sec=args.trace_dump_sec, capture_dir=os.path.abspath(args.capture_dir),
+                             capture_encoder=capture_encoder, max_fps=args.max_fps)
         loader.load(window, use_gui=args.use_gui, startup_demo_id=args.startup_demo)
         loader.render_loop(window)
     finally:
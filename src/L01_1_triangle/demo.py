@@ -5,7 +5,7 @@ from OpenGL.GL import *
 
 class Lecture01_TriangleDemo(BaseDemo):
     def __init__(self):
-        super().__init__(ui_defaults=None)
+        super().__init__(ui_defaults=None, is_animated=False)
 
     def load(self, window):
         self.make_shader()
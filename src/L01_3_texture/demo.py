@@ -1,9 +1,9 @@
 from dataclasses import dataclass
-from ..common.gpu_shader import GpuShader
+from ..common.texture_cache import default_texture_cache
 from ..base_demo import BaseDemo
 from ..common.defines import *
+from ..common.gl_state import default_gl_state
 from OpenGL.GL import *
-import PIL
 import numpy as np
 
 @dataclass
@@ -13,7 +13,14 @@ class UiDefaults:
 class Lecture01_TextureDemo(BaseDemo):
     def __init__(self):
         #ui_defaults = parse_json.parse_json('ui_defaults.json', UiDefaults.__name__, ['color'])
-        super().__init__(ui_defaults=None)
+        super().__init__(ui_defaults=None, is_animated=False)
+
+    def load_assets(self, asset_loader):
+        return [default_texture_cache.load_image_async('crate_color.jpeg')]
+
+    def load_programs(self, shader_pool):
+        self.shader = shader_pool.load('vert.glsl', 'frag.glsl', out_variable=b'out_color', deferred=True)
+        return [self.shader]
 
     def load(self, window):
         super().load(window)
@@ -22,21 +29,19 @@ class Lecture01_TextureDemo(BaseDemo):
         self.is_loaded = True
 
     def make_shader(self):
-        self.shader = GpuShader('vert.glsl', 'frag.glsl', out_variable=b'out_color')
-
         # The fragrament shader uses rasterized texture coordinates `v_texcoord`
         # connect texture and the shader, so that we can render pixels with texture values
 
-        self.texture_id = self.make_gpu_texture('../../assets/crate_color.jpeg')
+        self.texture_id = self.make_gpu_texture('crate_color.jpeg')
 
         self.shader.use()
         glActiveTexture(GL_TEXTURE0)
         glBindTexture(GL_TEXTURE_2D, self.texture_id)
-        uniform_texture = glGetUniformLocation(self.shader.shader_program, "u_texture")
-        glUniform1i(uniform_texture, 0)
+        self.shader.set('u_texture', 0)
 
     def make_gpu_texture(self, image_path):
-        cpu_image = PIL.Image.open(image_path)
+        # decoded once for all demos that use the image
+        cpu_image = default_texture_cache.load_image(image_path)
         width, height = cpu_image.size
         target = GL_TEXTURE_2D
         # OpenGL creates a unique texture identifier (just a number) on its GPU side
@@ -129,11 +134,10 @@ class Lecture01_TextureDemo(BaseDemo):
         glClearColor(0,0,0,1)
         glClear(GL_COLOR_BUFFER_BIT)
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
-        glUniform1f(uniform_aspect, width / height)
+        self.shader.use()
+        self.shader.set('u_aspect_ratio', width / height)
 
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
         glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
 
 
@@ -1,7 +1,8 @@
 from ..common.gpu_texture import GpuTexture
-from ..common.gpu_shader import GpuShader
+from ..common.texture_cache import default_texture_cache
 from ..base_demo import BaseDemo
 from ..common.defines import *
+from ..common.gl_state import default_gl_state
 from OpenGL.GL import *
 from PIL import Image
 import numpy as np
@@ -10,6 +11,13 @@ class Lecture01_TransformDemo(BaseDemo):
     def __init__(self):
         super().__init__(ui_defaults=None)
 
+    def load_assets(self, asset_loader):
+        return default_texture_cache.prepare('crate_color.jpeg')
+
+    def load_programs(self, shader_pool):
+        self.shader = shader_pool.load('vert.glsl', 'frag.glsl', out_variable=b'out_color', deferred=True)
+        return [self.shader]
+
     def load(self, window):
         super().load(window)
         self.make_shader()
@@ -17,17 +25,15 @@ class Lecture01_TransformDemo(BaseDemo):
         self.is_loaded = True
 
     def make_shader(self):
-        self.shader = GpuShader('vert.glsl', 'frag.glsl', out_variable=b'out_color')
-
         # The fragrament shader uses rasterized texture coordinates `v_texcoord`
         # connect texture and the shader, so that we can render pixels with texture values
-        self.texture = GpuTexture(cpu_image=Image.open('../../assets/crate_color.jpeg'))
+        # shared with other demos, decoded and uploaded only once
+        self.texture = default_texture_cache.load('crate_color.jpeg')
         # self.texture = GpuTexture(cpu_image=Image.open('../../assets/KAMEN-stup.png'))
         self.texture.use(texture_unit=0)
 
         self.shader.use()
-        uniform_texture = glGetUniformLocation(self.shader.shader_program, "u_texture")
-        glUniform1i(uniform_texture, 0)
+        self.shader.set('u_texture', 0)
 
 
     def make_vertex_data(self):
@@ -86,9 +92,8 @@ class Lecture01_TransformDemo(BaseDemo):
         glClearColor(0,0,0,1)
         glClear(GL_COLOR_BUFFER_BIT)
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
-        glUniform1f(uniform_aspect, width / height)
+        self.shader.use()
+        self.shader.set('u_aspect_ratio', width / height)
 
         # === CHANGE #3
         # make rotation, scale, translation
@@ -109,14 +114,12 @@ class Lecture01_TransformDemo(BaseDemo):
         ], dtype=np.float32)
 
         transform = rotation @ scale
-        uniform_transform = glGetUniformLocation(shader_id, "u_transform")
-        glUniformMatrix2fv(uniform_transform, 1, GL_TRUE, transform)
+        self.shader.set('u_transform', transform, transpose=True)
 
-        uniform_translation = glGetUniformLocation(shader_id, "u_translation")
         translation_x, translation_y = 0.0, time_sin * 0.5
-        glUniform2f(uniform_translation, translation_x, translation_y)
+        self.shader.set('u_translation', (translation_x, translation_y))
 
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
         glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
 
 
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 from ..common.gpu_texture import GpuTexture
-from ..common.gpu_shader import GpuShader
+from ..common.texture_cache import default_texture_cache
 from ..base_demo import BaseDemo
 from ..common.defines import *
+from ..common.gl_state import default_gl_state
 from OpenGL.GL import *
 from PIL import Image
 import numpy as np
@@ -16,6 +17,13 @@ class Lecture01_TransformMatrixDemo(BaseDemo):
         #ui_defaults = parse_json.parse_json('ui_defaults.json', UiDefaults.__name__, ['color'])
         super().__init__(ui_defaults=None)
 
+    def load_assets(self, asset_loader):
+        return default_texture_cache.prepare('crate_color.jpeg')
+
+    def load_programs(self, shader_pool):
+        self.shader = shader_pool.load('vert.glsl', 'frag.glsl', out_variable=b'out_color', deferred=True)
+        return [self.shader]
+
     def load(self, window):
         super().load(window)
         self.make_shader()
@@ -23,16 +31,14 @@ class Lecture01_TransformMatrixDemo(BaseDemo):
         self.is_loaded = True
 
     def make_shader(self):
-        self.shader = GpuShader('vert.glsl', 'frag.glsl', out_variable=b'out_color')
-
         # The fragrament shader uses rasterized texture coordinates `v_texcoord`
         # connect texture and the shader, so that we can render pixels with texture values
-        self.texture = GpuTexture(cpu_image=Image.open('../../assets/crate_color.jpeg'))
+        # shared with other demos, decoded and uploaded only once
+        self.texture = default_texture_cache.load('crate_color.jpeg')
         self.texture.use(texture_unit=0)
 
         self.shader.use()
-        uniform_texture = glGetUniformLocation(self.shader.shader_program, "u_texture")
-        glUniform1i(uniform_texture, 0)
+        self.shader.set('u_texture', 0)
 
 
     def make_vertex_data(self):
@@ -91,9 +97,8 @@ class Lecture01_TransformMatrixDemo(BaseDemo):
         glClearColor(0,0,0,1)
         glClear(GL_COLOR_BUFFER_BIT)
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
-        glUniform1f(uniform_aspect, width / height)
+        self.shader.use()
+        self.shader.set('u_aspect_ratio', width / height)
 
         # === CHANGE #3
         # make rotation, scale, translation
@@ -116,10 +121,9 @@ class Lecture01_TransformMatrixDemo(BaseDemo):
 
         transform = rotation_translation @ scale
 
-        uniform_transform = glGetUniformLocation(shader_id, "u_transform")
-        glUniformMatrix3fv(uniform_transform, 1, GL_TRUE, transform)
+        self.shader.set('u_transform', transform, transpose=True)
 
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
         glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
 
 
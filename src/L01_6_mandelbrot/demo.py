@@ -1,68 +1,49 @@
 from dataclasses import dataclass
-from ..common.gpu_shader import GpuShader
+from ..common.shader_variants import ShaderVariants
+from ..common.texture_cache import default_texture_cache
 from ..base_demo import BaseDemo
 from ..common.defines import *
+from ..common.gl_state import default_gl_state
 from OpenGL.GL import *
-import PIL
 import numpy as np
+import imgui
 
 @dataclass
 class UiDefaults:
     color: int
 
+# compile-time parameters of the fractal shader, each combination is a separate program variant
+N_CONVERGENCE_STEPS_OPTIONS = [20, 40, 80, 160, 320]
+THRESHOLD_OPTIONS = [2.0, 4.0, 16.0, 256.0]
+
 class Lecture01_MandelbrotDemo(BaseDemo):
     def __init__(self):
         #ui_defaults = parse_json.parse_json('ui_defaults.json', UiDefaults.__name__, ['color'])
         super().__init__(ui_defaults=None)
 
-    def load(self, window):
-        super().load(window)
+    def load_assets(self, asset_loader):
+        return default_texture_cache.prepare('pallete_1d.png', is_1d=True)
 
-        self.shader = GpuShader('vert.glsl', 'frag.glsl', out_variable=b'out_color')
-        self.texture_id = self.make_gpu_texture('../../assets/pallete_1d.png')
+    def load_programs(self, shader_pool):
+        self.n_convergence_steps, self.threshold = 80, 4.0
+        self.shader_variants = ShaderVariants('vert.glsl', 'frag.glsl', out_variable=b'out_color', shader_pool=shader_pool)
+        self.shader = self.shader_variants.get(self.fractal_defines(), deferred=True)
+        return [self.shader]
 
-        self.shader.use()
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_1D, self.texture_id)
-        uniform_texture = glGetUniformLocation(self.shader.shader_program, "u_palette")
-        glUniform1i(uniform_texture, 0)
+    def load(self, window):
+        super().load(window)
 
-        uniform_center = glGetUniformLocation(self.shader.shader_program, "u_center")
-        #glUniform2d(uniform_center, 0.77568377, -0.13646737)
-        glUniform2f(uniform_center, 0.10109636384562, -0.95628651080914)
+        # the other iteration counts are compiled ahead, one per frame, so that switching them doesn't stall
+        self.shader_variants.warm_up([self.fractal_defines(n_convergence_steps=n) for n in N_CONVERGENCE_STEPS_OPTIONS])
+        # shared by the fractal demos
+        self.texture = default_texture_cache.load('pallete_1d.png', is_1d=True)
+        self.texture.use(texture_unit=0)
 
         self.make_vertex_data()
 
         self.zoom = 10.0
         self.is_loaded = True
 
-    def make_gpu_texture(self, image_path):
-        cpu_image = PIL.Image.open(image_path)
-        width, height = cpu_image.size
-
-        target = GL_TEXTURE_1D
-        texture_id = glGenTextures(1)
-        glBindTexture(target, texture_id)
-        assert height == 1
-        glTexImage1D(target,
-            0,       # mip-map level we're filling in
-            GL_RGB, # how on GPU the data will be layed out
-            width,
-            0,      # always 0
-            GL_RGB, # how on CPU we stored the `pixels` array
-            GL_UNSIGNED_BYTE, # which type of all values is in the `pixels` array
-            np.ascontiguousarray(cpu_image).flatten(), # array of channels for all pixels
-        )
-
-        glTexParameteri(target, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(target, GL_TEXTURE_WRAP_T, GL_REPEAT)
-
-        glTexParameteri(target, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(target, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-
-        glGenerateMipmap(target)
-        return texture_id
-
     def make_vertex_data(self):
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
@@ -119,17 +100,44 @@ class Lecture01_MandelbrotDemo(BaseDemo):
         glClearColor(0,0,0,1)
         glClear(GL_COLOR_BUFFER_BIT)
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
-        glUniform1f(uniform_aspect, width / height)
-
-        uniform_aspect = glGetUniformLocation(shader_id, "u_zoom")
         self.zoom /= 1.003
-        glUniform1f(uniform_aspect, self.zoom)
-
-        glBindVertexArray(self.vao)
+        self.shader = self.shader_variants.get(self.fractal_defines())
+        self.shader.use()
+        # every variant is a separate program with its own uniform values
+        self.shader.set_many({
+            'u_aspect_ratio': width / height,
+            'u_zoom': self.zoom,
+            'u_palette': 0,
+            #'u_center': (0.77568377, -0.13646737),
+            'u_center': (0.10109636384562, -0.95628651080914),
+        })
+
+        default_gl_state.bind_vertex_array(self.vao)
         glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
 
+        self.shader_variants.warm_up_next()
+
+
+    def fractal_defines(self, n_convergence_steps=None, threshold=None):
+        n_convergence_steps = self.n_convergence_steps if n_convergence_steps is None else n_convergence_steps
+        threshold = self.threshold if threshold is None else threshold
+        # THRESHOLD is compared with a float, it needs the decimal point
+        return {'N_CONVERGENCE_STEPS': n_convergence_steps, 'THRESHOLD': f'{threshold:.1f}'}
+
+    def render_ui(self):
+        imgui.set_next_window_position(0, 0, condition=imgui.FIRST_USE_EVER)
+        imgui.begin("Controls", closable=False, flags=imgui.WINDOW_NO_FOCUS_ON_APPEARING | imgui.WINDOW_ALWAYS_AUTO_RESIZE)
+        changed, idx = imgui.combo('Iterations', N_CONVERGENCE_STEPS_OPTIONS.index(self.n_convergence_steps),
+                                   [str(n) for n in N_CONVERGENCE_STEPS_OPTIONS])
+        if changed:
+            self.n_convergence_steps = N_CONVERGENCE_STEPS_OPTIONS[idx]
+        changed, idx = imgui.combo('Threshold', THRESHOLD_OPTIONS.index(self.threshold),
+                                   [str(threshold) for threshold in THRESHOLD_OPTIONS])
+        if changed:
+            self.threshold = THRESHOLD_OPTIONS[idx]
+            self.shader_variants.warm_up([self.fractal_defines(n_convergence_steps=n) for n in N_CONVERGENCE_STEPS_OPTIONS])
+        imgui.text(f'Compiled variants: {len(self.shader_variants.variants)}')
+        imgui.end()
 
     def unload(self):
         if not self.is_loaded:
@@ -138,8 +146,7 @@ class Lecture01_MandelbrotDemo(BaseDemo):
         glUseProgram(0)
         glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
         glDeleteBuffers(2, np.asarray([self.gpu_positions, self.gpu_screen_coords], dtype=np.uint32))
-        glDeleteTextures(1, np.asarray([self.texture_id], dtype=np.uint32))
-        del self.shader
+        del self.shader, self.shader_variants, self.texture
         del self.vao, self.gpu_positions, self.gpu_screen_coords
         super().unload()
 
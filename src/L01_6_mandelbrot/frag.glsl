@@ -1,7 +1,12 @@
 #version 150 core
 
+// defaults, the demo compiles variants with other values (see ShaderVariants)
+#ifndef N_CONVERGENCE_STEPS
 #define N_CONVERGENCE_STEPS 80
+#endif
+#ifndef THRESHOLD
 #define THRESHOLD 4.0
+#endif
 
 precision highp float;
 in vec2 v_screen_coords;
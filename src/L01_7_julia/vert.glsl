@@ -1,7 +1,8 @@
-#version 150 core
+#version 330 core
 
-in vec2 a_position;
-in vec2 a_screen_coords;
+// fixed locations, so that all variants of the program match the same vertex array
+layout(location = 0) in vec2 a_position;
+layout(location = 1) in vec2 a_screen_coords;
 
 out vec2 v_screen_coords;
 
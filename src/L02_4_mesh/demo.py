@@ -1,13 +1,15 @@
 from ..common.axes_gismo_drawer import AxesGismoDrawer
 from ..common.texture_drawer import TextureDrawer
+from ..common.gl_state import default_gl_state
+from ..common.gpu_profiler import default_gpu_profiler
 from ..common.gpu_texture import GpuTexture
-from ..common.gpu_shader import GpuShader
-from ..common.obj_loader import ParsedWavefront
+from ..common.texture_cache import default_texture_cache
+from ..common.mesh_cache import default_mesh_cache
+from ..common.mesh_registry import GpuMeshBuffers, default_mesh_registry, make_mesh_key
 from ..base_demo import BaseDemo
 from ..common.defines import *
 from OpenGL.GL import *
 from typing import Optional
-from PIL import Image
 import numpy as np
 import glfw
 import pyrr
@@ -21,6 +23,8 @@ class GpuMesh:
         self.texture_filepath = texture_filepath
         self.texture_unit = texture_unit
         self.use_index_buffer = use_index_buffer
+        self.vertex_data = None
+        self.mesh_key, self.buffers = None, None
 
     def with_attributes_size(self, position_n_coords: int, texcoord_n_coords: int):
         self.position_n_coords = position_n_coords
@@ -32,6 +36,18 @@ class GpuMesh:
         self.texcoord_location = texcoord_location
         return self
 
+    def prepare(self, asset_loader, verbose=True):
+        """Starts parsing the OBJ file and decoding the texture in background (unless they are
+           already on the GPU), `build` waits for them"""
+        attributes_layout = f'P{self.position_n_coords}_T{self.texcoord_n_coords}'
+        futures = []
+        if make_mesh_key(self.obj_filepath, attributes_layout, self.use_index_buffer) not in default_mesh_registry:
+            self.vertex_data = asset_loader.load_mesh(self.obj_filepath, attributes_layout, self.use_index_buffer, verbose=verbose)
+            futures.append(self.vertex_data)
+        if self.texture_filepath is not None:
+            futures += default_texture_cache.prepare(self.texture_filepath, flip_y=True)
+        return futures
+
     def build(self, verbose=True):
         assert self.position_location is not None and self.texcoord_location is not None
         self.load_vertex_data(self.obj_filepath, verbose=verbose)
@@ -49,37 +65,33 @@ class GpuMesh:
 
     def use(self):
         assert self.is_built
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
         if self.texture is not None:
-            glActiveTexture(GL_TEXTURE0 + self.texture_unit)
-            glBindTexture(GL_TEXTURE_2D, self.texture.gpu_id)
+            self.texture.use(self.texture_unit)
         return self.vao
 
-    def load_vertex_data(self, obj_filepath: str, verbose=True):
-        self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
-
-        scene = ParsedWavefront(obj_filepath, verbose=verbose)
+    def load_vertex_arrays(self, obj_filepath: str, attributes_layout: str, verbose=True):
+        if self.vertex_data is not None:
+            # prepared in background
+            vertex_data, self.vertex_data = self.vertex_data, None
+            return vertex_data.result()
+        # parsed only once, next loads memory-map the arrays from the disk cache
+        return default_mesh_cache.load(obj_filepath, attributes_layout, self.use_index_buffer, verbose=verbose)
 
+    def load_vertex_data(self, obj_filepath: str, verbose=True):
         attributes_layout = f'P{self.position_n_coords}_T{self.texcoord_n_coords}'
-        if self.use_index_buffer:
-            attributes, index_array = scene.as_numpy_indexed(attributes_layout)
-            self.n_elements = len(index_array)
-        else:
-            attributes = scene.as_numpy(attributes_layout)
-            self.n_elements = attributes.shape[0]
-
-        # send data to GPU
-        self.gpu_attributes = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, self.gpu_attributes)
-        glBufferData(GL_ARRAY_BUFFER, attributes.nbytes, attributes, GL_STATIC_DRAW)
-        if self.use_index_buffer:
-            self.gpu_index_array = glGenBuffers(1)
-            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.gpu_index_array)
-            glBufferData(GL_ELEMENT_ARRAY_BUFFER, index_array.nbytes, index_array, GL_STATIC_DRAW)
+        # shared with other meshes of the same file and layout, uploaded only once
+        self.mesh_key = make_mesh_key(obj_filepath, attributes_layout, self.use_index_buffer)
+        self.buffers = default_mesh_registry.acquire(self.mesh_key,
+            lambda: GpuMeshBuffers(*self.load_vertex_arrays(obj_filepath, attributes_layout, verbose=verbose)))
+        self.n_elements = self.buffers.n_elements
+
+        self.vao = glGenVertexArrays(1)
+        default_gl_state.bind_vertex_array(self.vao)
+        self.buffers.bind()
 
         # connect a shader variable and vertex data
-        float_nbytes = attributes.itemsize
+        float_nbytes = self.buffers.attributes_itemsize
         attributes_stride = (self.position_n_coords + self.texcoord_n_coords) * float_nbytes
 
         glEnableVertexAttribArray(self.position_location)
@@ -100,59 +112,68 @@ class GpuMesh:
             ctypes.c_void_p(self.position_n_coords*float_nbytes))
 
         # unbind for safety
-        glBindVertexArray(0)
+        default_gl_state.bind_vertex_array(0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def load_texture(self, texture_filepath):
         if texture_filepath is not None:
-            cpu_image = Image.open(texture_filepath).transpose(Image.FLIP_TOP_BOTTOM)
-            self.texture = GpuTexture(cpu_image)
+            self.texture = default_texture_cache.load(texture_filepath, flip_y=True)
         else:
             self.texture = None
 
     def __del__(self):
-        glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
-        if self.use_index_buffer:
-            glDeleteBuffers(2, np.asarray([self.gpu_attributes, self.gpu_index_array], dtype=np.uint32))
-        else:
-            glDeleteBuffers(1, np.asarray([self.gpu_attributes], dtype=np.uint32))
-        del self.texture
+        if self.buffers is not None:
+            glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
+            default_gl_state.forget_vertex_array(self.vao)
+            default_mesh_registry.release(self.mesh_key)
+        self.texture = None
 
 class Lecture02_MeshDemo(BaseDemo):
     def __init__(self):
         super().__init__(ui_defaults=None)
         self.meshes = []
 
+    def load_assets(self, asset_loader):
+        position_n_coords, texcoord_n_coords = 3, 2
+        self.head_mesh = GpuMesh(
+            obj_filepath='../../assets/human_head/head.obj',
+            texture_filepath='human_head/lambertian.jpg',
+            texture_unit=0, # bound once to GL_TEXTURE0, used later for all the frames
+            use_index_buffer=True)
+        self.head_mesh.with_attributes_size(position_n_coords, texcoord_n_coords)
+
+        self.cow_mesh = GpuMesh(
+            obj_filepath='../../assets/spot_cow/spot_triangulated.obj',
+            texture_filepath='spot_cow/spot_texture.png',
+            texture_unit=1, # bound once to GL_TEXTURE0, used later for all the frames
+            use_index_buffer=True)
+        self.cow_mesh.with_attributes_size(position_n_coords, texcoord_n_coords)
+        return self.head_mesh.prepare(asset_loader, verbose=False) + self.cow_mesh.prepare(asset_loader)
+
+    def load_programs(self, shader_pool):
+        self.shader = shader_pool.load('vert.glsl', 'frag.glsl', out_variable=b'out_color', deferred=True)
+        self.texcoords_shader = shader_pool.load('_texcoords_vert.glsl', '_texcoords_frag.glsl', out_variable=b'out_color', deferred=True)
+        # the drawers made in `load` get them from the pool
+        drawer_programs = [TextureDrawer.load_program(shader_pool, deferred=True), AxesGismoDrawer.load_program(shader_pool, deferred=True)]
+        return [self.shader, self.texcoords_shader] + drawer_programs
+
     def load(self, window):
         super().load(window)
 
-        self.shader = GpuShader('vert.glsl', 'frag.glsl', out_variable=b'out_color')
-
         shader_id = self.shader.use()
         position_shader_location = glGetAttribLocation(shader_id, "a_position")
         texcoord_shader_location = glGetAttribLocation(shader_id, "a_texture_coords")
-        if len(self.meshes) == 0:
-            position_n_coords, texcoord_n_coords = 3, 2
-            head_mesh = GpuMesh(
-                obj_filepath='../../assets/human_head/head.obj',
-                texture_filepath='../../assets/human_head/lambertian.jpg',
-                texture_unit=0, # bound once to GL_TEXTURE0, used later for all the frames
-                use_index_buffer=True)
-            head_mesh.with_attributes_size(position_n_coords, texcoord_n_coords)
-            head_mesh.with_attributes_shader_location(position_shader_location, texcoord_shader_location)
-            self.meshes.append(head_mesh.build(verbose=False))
-            print('Loaded head mesh and texture, n_elements:', self.meshes[-1].n_draw_elements)
-
-            cow_mesh = GpuMesh(
-                obj_filepath='../../assets/spot_cow/spot_triangulated.obj',
-                texture_filepath='../../assets/spot_cow/spot_texture.png',
-                texture_unit=1, # bound once to GL_TEXTURE0, used later for all the frames
-                use_index_buffer=True)
-            cow_mesh.with_attributes_size(position_n_coords, texcoord_n_coords)
-            cow_mesh.with_attributes_shader_location(position_shader_location, texcoord_shader_location)
-            self.meshes.append(cow_mesh.build())
-            print('Loaded cow mesh and texture, n_elements:', self.meshes[-1].n_draw_elements)
+        # only uploading to GPU, parsing and decoding are done in `load_assets`,
+        # buffers of meshes loaded before are still on the GPU (see GpuMeshRegistry)
+        self.head_mesh.with_attributes_shader_location(position_shader_location, texcoord_shader_location)
+        self.meshes.append(self.head_mesh.build(verbose=False))
+        print('Loaded head mesh and texture, n_elements:', self.meshes[-1].n_draw_elements)
+
+        self.cow_mesh.with_attributes_shader_location(position_shader_location, texcoord_shader_location)
+        self.meshes.append(self.cow_mesh.build())
+        print('Loaded cow mesh and texture, n_elements:', self.meshes[-1].n_draw_elements)
+        del self.head_mesh, self.cow_mesh
 
         # Draw textures used in this demo, totally unnecessary and for visualization purposes
         self.make_extra_visualizators()
@@ -167,45 +188,42 @@ class Lecture02_MeshDemo(BaseDemo):
         glClearColor(0.0,0.0,0.0,1)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
+        self.shader.use()
         aspect_ratio = width / height
-        glUniform1f(uniform_aspect, aspect_ratio)
-
-        uniform_texture = glGetUniformLocation(shader_id, "u_texture")
+        self.shader.set('u_aspect_ratio', aspect_ratio)
 
         gizmo_transforms = []
-        for i, mesh in enumerate(self.meshes):
-            # make transforms
-            if i == 0:
-                scale = 2.0
-                translation = (0.0, 0.1, 0.3)
-            else:
-                scale = 0.5
-                translation = (0.0, 0.0, -1.0)
-
-            scale = pyrr.Matrix44.from_scale((scale, scale, scale), dtype=np.float32)
-            rotation = pyrr.Matrix44.from_eulers((0.0, 0.0, global_time_sec/2), dtype=np.float32)
-            translation = pyrr.Matrix44.from_translation(translation, dtype=np.float32)
-            transform = translation @ rotation @ scale
-            gizmo_transforms.append(transform)
-
-            # set the appropriate texture for the shader
-            glUniform1i(uniform_texture, i) # we bound head texture to unit 0 and cow's to unit 1
-            uniform_transform = glGetUniformLocation(shader_id, "u_transform")
-            glUniformMatrix4fv(uniform_transform, 1, GL_FALSE, transform)
-
-            mesh.use()
-            if mesh.has_index_buffer:
-                glDrawElements(GL_TRIANGLES, mesh.n_draw_elements, GL_UNSIGNED_INT, None)
-            else:
-                glDrawArrays(GL_TRIANGLES, 0, mesh.n_draw_elements)
+        with default_gpu_profiler.scope('meshes'):
+            for i, mesh in enumerate(self.meshes):
+                # make transforms
+                if i == 0:
+                    scale = 2.0
+                    translation = (0.0, 0.1, 0.3)
+                else:
+                    scale = 0.5
+                    translation = (0.0, 0.0, -1.0)
+
+                scale = pyrr.Matrix44.from_scale((scale, scale, scale), dtype=np.float32)
+                rotation = pyrr.Matrix44.from_eulers((0.0, 0.0, global_time_sec/2), dtype=np.float32)
+                translation = pyrr.Matrix44.from_translation(translation, dtype=np.float32)
+                transform = translation @ rotation @ scale
+                gizmo_transforms.append(transform)
+
+                # set the appropriate texture for the shader
+                self.shader.set('u_texture', i) # we bound head texture to unit 0 and cow's to unit 1
+                self.shader.set('u_transform', transform)
+
+                mesh.use()
+                if mesh.has_index_buffer:
+                    glDrawElements(GL_TRIANGLES, mesh.n_draw_elements, GL_UNSIGNED_INT, None)
+                else:
+                    glDrawArrays(GL_TRIANGLES, 0, mesh.n_draw_elements)
 
         # just for visualization
-        self.draw_extra_visualizations(aspect_ratio, gizmo_transforms)
+        with default_gpu_profiler.scope('extra_visualizations'):
+            self.draw_extra_visualizations(aspect_ratio, gizmo_transforms)
 
     def make_extra_visualizators(self):
-        self.texcoords_shader = GpuShader('_texcoords_vert.glsl', '_texcoords_frag.glsl', out_variable=b'out_color')
         self.draw_textures = False
         self.draw_gizmos = False
         self.draw_uvs = False
@@ -223,17 +241,17 @@ class Lecture02_MeshDemo(BaseDemo):
         self.axes_gismo_drawers = [AxesGismoDrawer(), AxesGismoDrawer()] # one for each mesh
 
     def draw_extra_visualizations(self, aspect_ratio, transforms):
-        current_line_width = glGetInteger(GL_LINE_WIDTH)
+        # answered by the shadow state, glGet may wait for the queued commands
+        current_line_width = default_gl_state.line_width
         if self.draw_textures:
             self.texture_drawers[self.visualize_for_mesh_idx].render(aspect_ratio)
 
         if self.draw_uvs:
-            texcoords_shader_id = self.texcoords_shader.use()
-            uniform_aspect = glGetUniformLocation(texcoords_shader_id, "u_aspect_ratio")
-            glUniform1f(uniform_aspect, aspect_ratio)
-            _, current_polygon_mode = glGetInteger(GL_POLYGON_MODE)
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-            glLineWidth(1)
+            self.texcoords_shader.use()
+            self.texcoords_shader.set('u_aspect_ratio', aspect_ratio)
+            current_polygon_mode = default_gl_state.polygon_mode
+            default_gl_state.set_polygon_mode(GL_LINE)
+            default_gl_state.set_line_width(1)
             mesh = self.meshes[self.visualize_for_mesh_idx]
             mesh.use()
             if mesh.has_index_buffer:
@@ -241,15 +259,15 @@ class Lecture02_MeshDemo(BaseDemo):
                 glDrawElements(GL_TRIANGLES, mesh.n_draw_elements, GL_UNSIGNED_INT, None)
             else:
                 glDrawArrays(GL_TRIANGLES, 0, mesh.n_draw_elements)
-            glPolygonMode(GL_FRONT_AND_BACK, current_polygon_mode)
-            glLineWidth(current_line_width)
+            default_gl_state.set_polygon_mode(current_polygon_mode)
+            default_gl_state.set_line_width(current_line_width)
 
         if self.draw_gizmos:
-            glLineWidth(3)
+            default_gl_state.set_line_width(3)
             for gizmo, transform in zip(self.axes_gismo_drawers, transforms):
                 gizmo.set_transform(transform)
                 gizmo.render(aspect_ratio)
-            glLineWidth(current_line_width)
+            default_gl_state.set_line_width(current_line_width)
 
     def keyboard_callback(self, window, key, scancode, action, mods):
         super().keyboard_callback(window, key, scancode, action, mods)
@@ -270,9 +288,8 @@ class Lecture02_MeshDemo(BaseDemo):
         self.is_loaded = False
         glUseProgram(0)
         glDisable(GL_DEPTH_TEST)
-        # not deleting, for faster reload (parsing huge OBJ files takes long time)
-        # for mesh in self.meshes:
-        #     del mesh
+        # mesh buffers stay on the GPU for faster reload, until the registry needs the memory
+        self.meshes = []
         del self.shader
         del self.texcoords_shader
         del self.texture_drawers
@@ -1,5 +1,5 @@
 from ..common.gpu_texture import GpuTexture
-from ..common.gpu_shader import GpuShader
+from ..common.texture_cache import default_texture_cache
 from ..common.gpu_mesh import GpuMesh
 from ..base_demo import BaseDemo
 from ..common.defines import *
@@ -23,7 +23,7 @@ def convert_to_srgb(img):
 
 class Lecture02_ProjectionDemo(BaseDemo):
     def __init__(self):
-        super().__init__(ui_defaults=None)
+        super().__init__(ui_defaults=None, is_animated=False)
         self.reset_camera()
         self.ui_width_height_proportional = True
         self.is_perspective = False # orthogonal by default
@@ -34,20 +34,26 @@ class Lecture02_ProjectionDemo(BaseDemo):
         self.proj_left, self.proj_right = -1, 1
         self.proj_near, self.proj_far = -1, 1
 
+    def load_assets(self, asset_loader):
+        self.scene = GpuMesh(obj_filepath='../../assets/monkeys_grid.obj', use_index_buffer=True)
+        self.scene.with_attributes_size(position_n_coords=3, texcoord_n_coords=2, normals_n_coords=0)
+        return self.scene.prepare(asset_loader, verbose=False) + default_texture_cache.prepare('palette_contrast.png', flip_y=True)
+
+    def load_programs(self, shader_pool):
+        self.shader = shader_pool.load('vert.glsl', 'frag.glsl', out_variable=b'out_color', deferred=True)
+        return [self.shader]
+
     def load(self, window):
         super().load(window)
 
-        self.shader = GpuShader('vert.glsl', 'frag.glsl', out_variable=b'out_color')
         shader_id = self.shader.use()
         position_shader_location = glGetAttribLocation(shader_id, "a_position")
         texcoord_shader_location = glGetAttribLocation(shader_id, "a_texture_coords")
 
-        self.scene = GpuMesh(obj_filepath='../../assets/monkeys_grid.obj', use_index_buffer=True)
-        self.scene.with_attributes_size(position_n_coords=3, texcoord_n_coords=2, normals_n_coords=0)
         self.scene.with_attributes_shader_location(position_shader_location, texcoord_shader_location, normals_location=None)
         self.scene.build(verbose=False)
 
-        self.texture = GpuTexture(cpu_image=Image.open('../../assets/palette_contrast.png'), flip_y=True)
+        self.texture = default_texture_cache.load('palette_contrast.png', flip_y=True)
         self.texture.use(texture_unit=0)
 
         self.make_extra_visualizations()
@@ -97,10 +103,9 @@ class Lecture02_ProjectionDemo(BaseDemo):
         glClearColor(0.0,0.0,0.0,1)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
+        self.shader.use()
         aspect_ratio = width / height
-        glUniform1f(uniform_aspect, aspect_ratio)
+        self.shader.set('u_aspect_ratio', aspect_ratio)
 
         if not self.is_extra_visualization_enabled:
             if self.is_perspective:
@@ -115,8 +120,7 @@ class Lecture02_ProjectionDemo(BaseDemo):
         else:
             projection = self.side_view_transform
 
-        uniform_transform = glGetUniformLocation(shader_id, "u_transform")
-        glUniformMatrix4fv(uniform_transform, 1, GL_FALSE, projection)
+        self.shader.set('u_transform', projection)
 
         self.scene.use()
         glDrawElements(GL_TRIANGLES, self.scene.n_draw_elements, GL_UNSIGNED_INT, None)
@@ -147,7 +151,8 @@ class Lecture02_ProjectionDemo(BaseDemo):
         imgui.set_next_window_collapsed(True, imgui.FIRST_USE_EVER)
         imgui.set_next_window_position(0, 0, condition=imgui.FIRST_USE_EVER)
         imgui.begin("Info", closable=True, flags=imgui.WINDOW_NO_FOCUS_ON_APPEARING)
-        imgui.text('FPS: %.2f' % imgui.get_io().framerate)
+        # the demo isn't animated, frames are drawn only after input (or while measuring)
+        imgui.text('FPS of the last redraws: %.2f' % imgui.get_io().framerate)
         imgui.end()
 
         min_range, max_range = -10, 10
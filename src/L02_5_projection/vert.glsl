@@ -5,14 +5,11 @@ in vec2 a_texture_coords;
 
 out vec2 v_texture_coords;
 
-uniform float u_aspect_ratio;
-
-uniform mat4 u_transform;
+#include <transform.glsl>
 
 void main()
 {
    v_texture_coords = a_texture_coords;
 
-   gl_Position = u_transform * vec4(a_position, 1.0);
-   gl_Position.y *= u_aspect_ratio;
+   gl_Position = transform_position(vec4(a_position, 1.0));
 }
\ No newline at end of file
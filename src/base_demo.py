@@ -5,9 +5,13 @@ import imgui.integrations.glfw
 
 # Base class for lecture and homework demos
 class BaseDemo:
-    def __init__(self, ui_defaults):
+    def __init__(self, ui_defaults, is_animated=True):
         self.ui_defaults = ui_defaults
         self.is_loaded = False
+        # a demo that isn't animated draws the same frame until something changes, it's redrawn only
+        # after input and window events, or after `invalidate` (see DemosLoader.render_loop)
+        self.is_animated = is_animated
+        self.needs_redraw = False
 
     @property
     def demo_id(self) -> str:
@@ -15,6 +19,10 @@ class BaseDemo:
         folder_name = os.path.normpath(path).split(os.path.sep)[-2]
         return folder_name
 
+    def invalidate(self):
+        """Requests a redraw of a demo that isn't animated, when its frame changes without an input event"""
+        self.needs_redraw = True
+
     def keyboard_callback(self, window, key, scancode, action, mods):
         pass
 
@@ -33,6 +41,19 @@ class BaseDemo:
     def render_ui(self):
         pass
 
+    def load_assets(self, asset_loader):
+        """Called before `load`, may submit CPU-side loading (OBJ parsing, image decoding)
+           to the `asset_loader` (AssetLoader). Returns a list of the submitted futures,
+           `load` is called on the render thread once all of them are done"""
+        return []
+
+    def load_programs(self, shader_pool):
+        """Called on the render thread after `load_assets`, may submit the programs of the demo
+           with `shader_pool.load(..., deferred=True)` (ShaderPool). Returns a list of them,
+           they compile together (in parallel, if the driver supports it) while the loading screen is drawn,
+           and `load` is called once all of them are ready"""
+        return []
+
     def load(self, window):
         pass
 
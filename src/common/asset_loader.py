@@ -0,0 +1,189 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import OrderedDict
+from contextlib import contextmanager
+from .mesh_cache import MeshCache, default_mesh_cache
+from .frame_tracer import default_frame_tracer
+from PIL import Image
+from typing import List
+import numpy as np
+import threading
+import os
+
+DEFAULT_BUDGET_BYTES = 512 * 2**20 # 512 MiB
+
+class LoadedAsset:
+    def __init__(self, future: Future, is_prefetched: bool):
+        self.future = future
+        self.is_prefetched = is_prefetched # requested ahead and not used yet
+        self.size_bytes = 0 # known once the future is done
+
+class AssetLoader:
+    """
+    Runs CPU-side loading of demo assets (OBJ parsing, attributes interleaving, image decoding,
+    reading shader sources) in background threads, so that the render thread only uploads ready
+    data to the GPU. NumPy and PIL release the GIL for the heavy parts, so threads don't block the render loop.
+
+    Relative paths are resolved when a job is submitted, since the working directory
+    may change (on the next demo switch) before the job runs.
+
+    Loaded assets are remembered by their path, modification time and loading options,
+    so a repeated request returns the same future. Assets can be requested ahead (see `prefetching`),
+    then the real request is served by a finished job. The least recently used assets are forgotten
+    when the total size of the loaded data exceeds `budget_bytes`, and prefetching should
+    stop when `is_over_budget`.
+
+    Example Usage:
+
+    > loader = AssetLoader()
+    > mesh_arrays = loader.load_mesh('path/to/scene.obj', 'P3_T2', use_index_buffer=True)
+    > image = loader.load_image('path/to/texture.png', flip_y=True)
+    > # later, on the render thread
+    > if mesh_arrays.done() and image.done():
+    >     attributes, indices = mesh_arrays.result()
+    >     texture = GpuTexture(image.result())
+    """
+
+    def __init__(self, max_workers: int = None, mesh_cache: MeshCache = default_mesh_cache, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.mesh_cache = mesh_cache
+        self.budget_bytes = budget_bytes
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='AssetLoader')
+        self.loaded = OrderedDict() # key -> LoadedAsset, in order of the last use
+        self.lock = threading.Lock()
+        self.is_prefetching = False
+        # requests (outside of prefetching) served by prefetched assets, by assets loaded before, and loaded anew
+        self.prefetch_hits, self.cache_hits, self.misses = 0, 0, 0
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.pool.submit(fn, *args, **kwargs)
+
+    def load(self, key, fn, *args, **kwargs) -> Future:
+        """Future of `fn(*args, **kwargs)`, submitted only if there is no asset with the same key yet"""
+        with self.lock:
+            asset = self.loaded.get(key)
+            if asset is not None:
+                self.loaded.move_to_end(key)
+                if not self.is_prefetching:
+                    if asset.is_prefetched:
+                        self.prefetch_hits += 1
+                    else:
+                        self.cache_hits += 1
+                    asset.is_prefetched = False
+                return asset.future
+            if not self.is_prefetching:
+                self.misses += 1
+            asset = self.loaded[key] = LoadedAsset(None, self.is_prefetching)
+            asset.future = self.submit(self.run_job, asset, fn, *args, **kwargs)
+        asset.future.add_done_callback(lambda future: self.on_failed(key, asset))
+        return asset.future
+
+    def load_mesh(self, obj_filepath: str, attributes_layout: str, use_index_buffer: bool, verbose=True) -> Future:
+        """Future of (attributes, indices or None), same as MeshCache.load"""
+        obj_filepath = os.path.abspath(obj_filepath)
+        key = ('mesh', obj_filepath, modification_time(obj_filepath), attributes_layout.upper(), use_index_buffer)
+        return self.load(key, self.mesh_cache.load, obj_filepath, attributes_layout, use_index_buffer, verbose=verbose)
+
+    def load_image(self, image_filepath: str, flip_y=False) -> Future:
+        """Future of a decoded PIL image"""
+        image_filepath = os.path.abspath(image_filepath)
+        key = ('image', image_filepath, modification_time(image_filepath), flip_y)
+        return self.load(key, decode_image, image_filepath, flip_y)
+
+    def load_text(self, text_filepath: str) -> Future:
+        """Future of the file content as a string"""
+        text_filepath = os.path.abspath(text_filepath)
+        key = ('text', text_filepath, modification_time(text_filepath))
+        return self.load(key, read_text, text_filepath)
+
+    @contextmanager
+    def prefetching(self):
+        """Requests inside the context are counted as prefetched, not as the real ones"""
+        self.is_prefetching = True
+        try:
+            yield self
+        finally:
+            self.is_prefetching = False
+
+    @property
+    def size_bytes(self):
+        with self.lock:
+            return sum(asset.size_bytes for asset in self.loaded.values())
+
+    @property
+    def is_over_budget(self):
+        return self.size_bytes >= self.budget_bytes
+
+    @property
+    def prefetch_hit_rate(self):
+        n_requests = self.prefetch_hits + self.cache_hits + self.misses
+        return self.prefetch_hits / n_requests if n_requests else 0.0
+
+    def run_job(self, asset, fn, *args, **kwargs):
+        result = fn(*args, **kwargs)
+        # accounted before the future is done, so the size is known to anyone who waited for it
+        asset.size_bytes = estimate_size_bytes(result)
+        self.evict()
+        return result
+
+    def on_failed(self, key, asset):
+        if asset.future.cancelled() or asset.future.exception() is not None:
+            # failed jobs aren't remembered, the next request retries
+            with self.lock:
+                if self.loaded.get(key) is asset:
+                    del self.loaded[key]
+
+    def evict(self):
+        """Forgets the least recently used finished assets until the loaded data fits into the budget"""
+        with self.lock:
+            total_size = sum(asset.size_bytes for asset in self.loaded.values())
+            for key, asset in list(self.loaded.items()):
+                if total_size <= self.budget_bytes:
+                    break
+                if asset.future.done():
+                    del self.loaded[key]
+                    total_size -= asset.size_bytes
+
+    def clear(self):
+        with self.lock:
+            self.loaded.clear()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+def modification_time(filepath: str):
+    try:
+        return os.stat(filepath).st_mtime_ns
+    except OSError:
+        return None # the job reports the missing file
+
+def decode_image(image_filepath: str, flip_y=False) -> Image.Image:
+    with default_frame_tracer.scope('decode_image'):
+        cpu_image = Image.open(image_filepath)
+        # Image.open only reads the header, the pixels are decoded lazily
+        cpu_image.load()
+        if flip_y:
+            cpu_image = cpu_image.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        return cpu_image
+
+def read_text(text_filepath: str) -> str:
+    with open(text_filepath, 'r') as f:
+        return f.read()
+
+def estimate_size_bytes(value) -> int:
+    """Memory taken by loaded data: arrays, images, strings, and tuples of them"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(map(estimate_size_bytes, value))
+    return 0
+
+def loading_progress(futures: List[Future]) -> float:
+    """Fraction of finished jobs, 1.0 if there are no jobs"""
+    if len(futures) == 0:
+        return 1.0
+    return sum(future.done() for future in futures) / len(futures)
+
+default_asset_loader = AssetLoader()
@@ -1,4 +1,5 @@
-from .gpu_shader import GpuShader
+from .shader_pool import default_shader_pool
+from .gl_state import default_gl_state
 from ..common.defines import *
 from OpenGL.GL import *
 from typing import Tuple
@@ -11,16 +12,22 @@ class AxesGismoDrawer:
     """
     Coords = Tuple[float, float]
     def __init__(self):
-        self.shader = GpuShader(
-            '../common/shaders/transform_vert.glsl',
-            '../common/shaders/color_frag.glsl',
-            out_variable=b'out_color')
+        self.shader = self.load_program()
+        self.transform = np.eye(4, dtype=np.float32)
 
         self.make_vertex_attributes()
 
+    @staticmethod
+    def load_program(shader_pool=default_shader_pool, deferred=False):
+        """The program shared by all drawers, demos may submit it in `load_programs`"""
+        return shader_pool.load(
+            '../common/shaders/transform_vert.glsl',
+            '../common/shaders/color_frag.glsl',
+            out_variable=b'out_color', deferred=deferred)
+
     def make_vertex_attributes(self):
         self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
 
         # interleaved attributes
         attributes = np.array((
@@ -101,26 +108,24 @@ class AxesGismoDrawer:
         self.n_elements = lines_indices.size
         glBufferData(GL_ELEMENT_ARRAY_BUFFER, lines_indices.nbytes, lines_indices, GL_STATIC_DRAW)
 
-        glBindVertexArray(0)
+        default_gl_state.bind_vertex_array(0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def set_transform(self, transform):
         assert isinstance(transform, np.ndarray) and transform.size == 16
         self.transform = transform
-        self.shader.use()
-        uniform_transform = glGetUniformLocation(self.shader.shader_program, "u_transform")
-        glUniformMatrix4fv(uniform_transform, 1, GL_FALSE, self.transform)
 
     def render(self, aspect_ratio):
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
-        glUniform1f(uniform_aspect, aspect_ratio)
-        glBindVertexArray(self.vao)
+        self.shader.use()
+        # the program is shared with other drawers
+        self.shader.set_many({'u_aspect_ratio': aspect_ratio, 'u_transform': self.transform})
+        default_gl_state.bind_vertex_array(self.vao)
         glDrawElements(GL_LINES, self.n_elements, GL_UNSIGNED_INT, None)
 
     def __del__(self):
         glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
+        default_gl_state.forget_vertex_array(self.vao)
         glDeleteBuffers(2, np.asarray([self.gl_attributes, self.gl_index_buffer], dtype=np.uint32))
         del self.shader
         del self.vao, self.gl_attributes, self.gl_index_buffer
\ No newline at end of file
@@ -1,6 +1,49 @@
 from pickle import FALSE
 import OpenGL
-OpenGL.ERROR_CHECKING = True
-OpenGL.ERROR_LOGGING = True
-OpenGL.ERROR_ON_COPY = True
-OpenGL.FULL_LOGGING = False
\ No newline at end of file
+import sys, os
+
+# PyOpenGL reads its flags once, when OpenGL.GL is imported, so the profile is applied before that:
+# run.py applies --gl-profile, everything else gets COURSE_GL_PROFILE (debug by default) on the import of this module.
+# Flags given as PYOPENGL_* environment variables (e.g. PYOPENGL_ERROR_CHECKING=1) take precedence over the profile
+GL_PROFILES = {
+    # errors are reported by the driver through the GL_KHR_debug callback (see GlDebugOutput), which turns off
+    # the glGetError after every call, the calls are still checked that way if the driver doesn't support it
+    'debug': dict(ERROR_CHECKING=True, ERROR_LOGGING=False),
+    # calls go straight to the driver
+    'release': dict(ERROR_CHECKING=False, ERROR_LOGGING=False),
+}
+DEFAULT_GL_PROFILE = os.environ.get('COURSE_GL_PROFILE', 'debug')
+# filters of the debug profile messages, from the most severe (see GlDebugOutput)
+GL_DEBUG_SEVERITIES = ('high', 'medium', 'low', 'notification')
+GL_DEBUG_SOURCES = ('api', 'window_system', 'shader_compiler', 'third_party', 'application', 'other')
+
+def apply_gl_profile(profile: str, error_on_copy=False):
+    """`error_on_copy` makes PyOpenGL raise when an array has to be copied (e.g. a list or a non-contiguous array
+       passed to a GL call), a diagnostic that doesn't depend on the profile"""
+    if profile not in GL_PROFILES:
+        raise Exception(f'Unknown GL profile {profile}, expected one of {", ".join(GL_PROFILES)}')
+    if 'OpenGL.GL' in sys.modules:
+        raise Exception('GL profile should be applied before OpenGL.GL is imported')
+    flags = dict(GL_PROFILES[profile], ERROR_ON_COPY=error_on_copy, FULL_LOGGING=False)
+    for name, value in flags.items():
+        if f'PYOPENGL_{name}' not in os.environ:
+            setattr(OpenGL, name, value)
+    os.environ['COURSE_GL_PROFILE'] = profile # for the child processes
+
+# contexts without a window (see HeadlessContext), PyOpenGL loads the functions of the platform's library
+HEADLESS_BACKENDS = ('egl', 'osmesa')
+
+def apply_headless_backend(backend: str):
+    """Makes PyOpenGL load GL from EGL or OSMesa instead of the window system's library (GLX/WGL),
+       like the profile it should be applied before OpenGL.GL is imported"""
+    if backend not in HEADLESS_BACKENDS:
+        raise Exception(f'Unknown headless backend {backend}, expected one of {", ".join(HEADLESS_BACKENDS)}')
+    if 'OpenGL.GL' in sys.modules:
+        raise Exception('Headless backend should be applied before OpenGL.GL is imported')
+    os.environ['PYOPENGL_PLATFORM'] = backend
+    if backend == 'egl':
+        # Mesa's EGL without a display server or a GPU (llvmpipe), also works on render nodes
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+if 'OpenGL.GL' not in sys.modules:
+    apply_gl_profile(DEFAULT_GL_PROFILE)
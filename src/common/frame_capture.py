@@ -0,0 +1,251 @@
+import logging
+logger = logging.getLogger(__file__)
+
+from OpenGL.GL import *
+from PIL import Image
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple
+import numpy as np
+import multiprocessing
+import subprocess
+import threading
+import ctypes
+import queue
+import shlex
+import os
+
+DEFAULT_CAPTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'captures'))
+
+class CapturedFrame(NamedTuple):
+    index: int
+    width: int
+    height: int
+    pixels: bytes # RGBA rows, from the bottom one as GL reads them
+
+    def as_array(self) -> np.array:
+        """(height, width, 4) uint8 array, top row first"""
+        return np.frombuffer(self.pixels, dtype=np.uint8).reshape(self.height, self.width, 4)[::-1]
+
+def write_png(directory: str, frame: CapturedFrame):
+    Image.fromarray(frame.as_array()).save(os.path.join(directory, f'frame_{frame.index:06d}.png'))
+
+class PngSequenceSink:
+    """Writes the frames as `frame_000000.png`, ... into the directory"""
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame: CapturedFrame):
+        write_png(self.directory, frame)
+
+    def close(self):
+        pass
+
+class ProcessPoolPngSink:
+    """
+    Writes the frames as PNG files like PngSequenceSink, encoding them in `max_workers` processes
+    (zlib compression of a 4K frame takes longer than rendering it, and holds the GIL for a part of the time).
+    At most 2 frames per process are in flight, `write` waits for the oldest one beyond that.
+    """
+    def __init__(self, directory: str, max_workers: int = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        max_workers = max_workers or os.cpu_count()
+        # not forked, the parent has a GL context and threads
+        self.pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'))
+        self.max_in_flight = 2 * max_workers
+        self.futures = deque()
+
+    def write(self, frame: CapturedFrame):
+        while len(self.futures) >= self.max_in_flight:
+            self.futures.popleft().result()
+        self.futures.append(self.pool.submit(write_png, self.directory, frame))
+
+    def close(self):
+        while self.futures:
+            self.futures.popleft().result()
+        self.pool.shutdown()
+
+class EncoderPipeSink:
+    """
+    Pipes raw RGBA frames to the stdin of an encoder process, started on the first frame when the size is known.
+    `command` may use {width}, {height} and {fps}, e.g. the default writes an H.264 video with ffmpeg.
+    Frames of another size (after the window was resized) are skipped, the encoder can't change the size.
+    """
+    DEFAULT_COMMAND = ('ffmpeg -loglevel error -y -f rawvideo -pix_fmt rgba -s {width}x{height} -r {fps} -i - '
+                       '-vf vflip -pix_fmt yuv420p {output}')
+
+    def __init__(self, output: str, command: str = DEFAULT_COMMAND, fps: float = 60):
+        self.output = output
+        self.command = command
+        self.fps = fps
+        self.process = None
+        self.size = None
+        self.n_skipped = 0
+
+    def write(self, frame: CapturedFrame):
+        if self.process is None:
+            self.size = (frame.width, frame.height)
+            command = self.command.format(width=frame.width, height=frame.height, fps=self.fps, output=shlex.quote(self.output))
+            self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+        if (frame.width, frame.height) != self.size:
+            self.n_skipped += 1
+            return
+        # GL rows go from the bottom, the encoder flips them
+        self.process.stdin.write(frame.pixels)
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+        if self.n_skipped:
+            logger.warning(f'{self.n_skipped} frames of another size than {self.size} were not encoded')
+
+def map_pixels(buffer: int, size_bytes: int) -> bytes:
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+    pointer = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, size_bytes, GL_MAP_READ_BIT)
+    pixels = ctypes.string_at(pointer, size_bytes) # copied, the buffer is reused
+    glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    return pixels
+
+class PendingReadback(NamedTuple):
+    buffer: int
+    fence: object
+    index: int
+    width: int
+    height: int
+
+class FrameCapture:
+    """
+    Records the rendered frames without waiting for them: `capture` copies the frame into a pixel buffer object
+    (the copy is queued on the GPU like a draw call) and puts a fence after it. A few frames later, when the fence
+    has signaled, the buffer is mapped and the pixels are handed to a worker thread, which writes them to the sink
+    (PNG files, an encoder process). The render thread never waits for the GPU or for the encoding:
+    when all `n_buffers` pixel buffers are still in flight, or `max_queued` frames wait for the worker,
+    the frame is dropped and counted in `n_dropped`. Without `drop_frames` (offline rendering) it waits instead.
+
+    Example Usage:
+
+    > capture = FrameCapture()
+    > capture.start(PngSequenceSink('path/to/frames'))
+    > # every frame, after drawing and before the swap
+    > capture.capture(width, height)
+    > ...
+    > capture.stop() # waits for the frames in flight and for the worker
+    """
+
+    def __init__(self, n_buffers: int = 3, max_queued: int = 8, drop_frames=True):
+        self.n_buffers = n_buffers
+        self.max_queued = max_queued
+        self.drop_frames = drop_frames
+        self.free_buffers = [] # pixel buffer objects with their sizes in bytes
+        self.pending = [] # PendingReadback, the oldest first
+        self.sink = None
+        self.worker = None
+        self.frames = None
+        self.n_captured, self.n_written, self.n_dropped = 0, 0, 0
+
+    @property
+    def is_capturing(self) -> bool:
+        return self.sink is not None
+
+    @property
+    def n_waiting(self) -> int:
+        """Frames read back and not written yet"""
+        return self.frames.qsize() if self.frames is not None else 0
+
+    def start(self, sink):
+        if self.is_capturing:
+            raise Exception('Capture is already started')
+        self.sink = sink
+        self.n_captured, self.n_written, self.n_dropped = 0, 0, 0
+        self.frames = queue.Queue(maxsize=self.max_queued)
+        self.worker = threading.Thread(target=self.write_frames, name='FrameCapture', daemon=True)
+        self.worker.start()
+
+    def capture(self, width: int, height: int, frame_idx: int = None):
+        """Reads the frame from the bound read framebuffer (the back buffer of a window),
+           `frame_idx` numbers the frame for the sink, the number of captured frames by default"""
+        if not self.is_capturing:
+            return
+        self.read_finished()
+        if frame_idx is None:
+            frame_idx = self.n_captured
+        self.n_captured += 1
+        if len(self.pending) == self.n_buffers:
+            # the GPU is behind by all the buffers
+            if self.drop_frames:
+                self.n_dropped += 1
+                return
+            self.read_finished(n_waited=1)
+        buffer = self.take_buffer(width * height * 4)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, width, height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0)) # into the bound buffer
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        glFlush() # the fence signals only after the commands are submitted, without waiting for the swap to do it
+        self.pending.append(PendingReadback(buffer, fence, frame_idx, width, height))
+
+    def take_buffer(self, size_bytes: int) -> int:
+        buffer, buffer_size = self.free_buffers.pop() if self.free_buffers else (int(glGenBuffers(1)), None)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+        if buffer_size != size_bytes:
+            # new or resized
+            glBufferData(GL_PIXEL_PACK_BUFFER, size_bytes, None, GL_STREAM_READ)
+        return buffer
+
+    def read_finished(self, n_waited: int = 0):
+        """Hands the frames whose fences have signaled to the worker, in order, waiting for the first `n_waited` frames"""
+        while self.pending:
+            readback = self.pending[0]
+            is_waited = n_waited > 0
+            status = glClientWaitSync(readback.fence, GL_SYNC_FLUSH_COMMANDS_BIT, 10**10 if is_waited else 0)
+            if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                break
+            n_waited -= 1
+            self.pending.pop(0)
+            glDeleteSync(readback.fence)
+            size_bytes = readback.width * readback.height * 4
+            pixels = map_pixels(readback.buffer, size_bytes)
+            self.free_buffers.append((readback.buffer, size_bytes))
+            try:
+                self.frames.put(CapturedFrame(readback.index, readback.width, readback.height, pixels),
+                                block=is_waited or not self.drop_frames)
+            except queue.Full:
+                self.n_dropped += 1 # the worker is behind
+
+    def write_frames(self):
+        # worker thread
+        is_failed = False
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            if is_failed:
+                continue # the sink would fail again, e.g. the encoder isn't installed
+            try:
+                self.sink.write(frame)
+                self.n_written += 1
+            except Exception:
+                logger.exception(f'Writing captured frame {frame.index} failed, the next frames are discarded')
+                is_failed = True
+
+    def stop(self):
+        """Writes the frames in flight, waits for the worker and closes the sink"""
+        if not self.is_capturing:
+            return
+        self.read_finished(n_waited=len(self.pending))
+        self.frames.put(None)
+        self.worker.join()
+        self.sink.close()
+        self.sink, self.worker = None, None
+
+    def counters(self) -> Dict[str, int]:
+        return dict(captured=self.n_captured, written=self.n_written, queued=self.n_waiting, dropped=self.n_dropped)
+
+    def __del__(self):
+        buffers = [buffer for buffer, _ in self.free_buffers] + [readback.buffer for readback in self.pending]
+        if buffers:
+            glDeleteBuffers(len(buffers), np.asarray(buffers, dtype=np.uint32))
@@ -0,0 +1,93 @@
+from itertools import count
+from time import perf_counter_ns
+from typing import Dict, List
+import json
+import os
+import threading
+
+DEFAULT_EXPORT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'traces'))
+
+class TraceScope:
+    # a class rather than a @contextmanager generator, it's entered a few hundred times per frame
+    __slots__ = ('tracer', 'name', 'start_ns')
+
+    def __init__(self, tracer, name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start_ns = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.start_ns, perf_counter_ns())
+        return False
+
+class FrameTracer:
+    """
+    Records CPU time of the phases of a frame (rendering, UI, swap, events) and of any scopes inside them,
+    e.g. OBJ parsing, image decoding, shader compiling and uploads while a demo is loading.
+    Scopes may be nested and may be entered from any thread (the asset loader threads too).
+
+    Events are stored in a preallocated ring of `capacity` entries, the oldest are overwritten,
+    so recording doesn't allocate beyond the event tuple and never grows. The recent events can be exported
+    to the Chrome trace_event format, opened by chrome://tracing or https://ui.perfetto.dev,
+    where nested scopes are shown under each other, per thread.
+
+    Example Usage:
+
+    > tracer = FrameTracer()
+    > with tracer.scope('load'):
+    >     with tracer.scope('parse_obj'):
+    >         ...
+    > tracer.export_chrome_trace(last_sec=10) # path of the written JSON
+    """
+
+    def __init__(self, capacity: int = 2**16):
+        self.capacity = capacity
+        self.events = [None] * capacity # (name, thread id, start ns, end ns)
+        self.event_indices = count() # next() is atomic, threads record without a lock
+        self.thread_names = {} # thread id -> name
+        self.origin_ns = perf_counter_ns()
+        self.is_enabled = True
+
+    def scope(self, name: str) -> TraceScope:
+        return TraceScope(self, name)
+
+    def record(self, name: str, start_ns: int, end_ns: int):
+        if not self.is_enabled:
+            return
+        thread_id = threading.get_ident()
+        if thread_id not in self.thread_names:
+            self.thread_names[thread_id] = threading.current_thread().name
+        event_idx = next(self.event_indices)
+        self.events[event_idx % self.capacity] = (name, thread_id, start_ns, end_ns)
+
+    def recent_events(self, last_sec: float = None) -> List[tuple]:
+        """Events in the ring that ended in the last `last_sec` seconds (all of them if None), ordered by start"""
+        events = [event for event in self.events if event is not None]
+        if last_sec is not None:
+            min_end_ns = perf_counter_ns() - int(last_sec * 1e9)
+            events = [event for event in events if event[3] >= min_end_ns]
+        return sorted(events, key=lambda event: event[2])
+
+    def to_chrome_trace(self, last_sec: float = None) -> Dict:
+        pid = os.getpid()
+        # complete events, timestamps are microseconds since the tracer was created
+        trace_events = [dict(name=name, ph='X', pid=pid, tid=thread_id, ts=(start_ns - self.origin_ns) / 1e3,
+                             dur=(end_ns - start_ns) / 1e3)
+                        for name, thread_id, start_ns, end_ns in self.recent_events(last_sec)]
+        thread_names = [dict(name='thread_name', ph='M', pid=pid, tid=thread_id, args=dict(name=thread_name))
+                        for thread_id, thread_name in self.thread_names.items()]
+        return dict(traceEvents=thread_names + trace_events, displayTimeUnit='ms')
+
+    def export_chrome_trace(self, path: str = None, last_sec: float = None) -> str:
+        """Writes the events of the last `last_sec` seconds (a new file in .cache/traces by default), returns its path"""
+        if path is None:
+            os.makedirs(DEFAULT_EXPORT_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_EXPORT_DIR, f'trace_{perf_counter_ns() // 1_000_000}.json')
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(last_sec), f)
+        return path
+
+default_frame_tracer = FrameTracer()
@@ -0,0 +1,113 @@
+import logging
+logger = logging.getLogger(__file__)
+
+from .defines import GL_DEBUG_SEVERITIES, GL_DEBUG_SOURCES
+from OpenGL.GL import *
+from OpenGL.raw.GL import _errors
+from collections import Counter
+from typing import Iterable
+import traceback
+
+SEVERITIES = dict(zip(GL_DEBUG_SEVERITIES, (GL_DEBUG_SEVERITY_HIGH, GL_DEBUG_SEVERITY_MEDIUM,
+                                             GL_DEBUG_SEVERITY_LOW, GL_DEBUG_SEVERITY_NOTIFICATION)))
+SOURCES = dict(zip(GL_DEBUG_SOURCES, (GL_DEBUG_SOURCE_API, GL_DEBUG_SOURCE_WINDOW_SYSTEM, GL_DEBUG_SOURCE_SHADER_COMPILER,
+                                      GL_DEBUG_SOURCE_THIRD_PARTY, GL_DEBUG_SOURCE_APPLICATION, GL_DEBUG_SOURCE_OTHER)))
+DEBUG_TYPE_NAMES = {
+    GL_DEBUG_TYPE_ERROR: 'error',
+    GL_DEBUG_TYPE_DEPRECATED_BEHAVIOR: 'deprecated_behavior',
+    GL_DEBUG_TYPE_UNDEFINED_BEHAVIOR: 'undefined_behavior',
+    GL_DEBUG_TYPE_PORTABILITY: 'portability',
+    GL_DEBUG_TYPE_PERFORMANCE: 'performance',
+    GL_DEBUG_TYPE_MARKER: 'marker',
+    GL_DEBUG_TYPE_OTHER: 'other',
+}
+LOG_LEVELS = {GL_DEBUG_SEVERITY_HIGH: logging.ERROR, GL_DEBUG_SEVERITY_MEDIUM: logging.WARNING,
+              GL_DEBUG_SEVERITY_LOW: logging.INFO, GL_DEBUG_SEVERITY_NOTIFICATION: logging.DEBUG}
+
+class GlDebugOutput:
+    """
+    Logs the messages of the driver (errors, undefined behavior, performance warnings) with the GL_KHR_debug
+    callback (core since GL 4.3), used by the debug GL profile in place of PyOpenGL's glGetError after every call:
+    `enable` turns that off, unless the driver doesn't support the callback (e.g. macOS, GL 4.1).
+    Messages less severe than `min_severity` or from other `sources` are filtered out by the driver,
+    the logger of this module lets the rest through.
+    With `synchronous` output the callback runs inside the GL call that caused the message,
+    so errors are logged with the Python stack of that call.
+
+    Example Usage:
+
+    > debug_output = GlDebugOutput(min_severity='medium', sources=['api', 'shader_compiler'])
+    > debug_output.enable() # with a current context, False if the driver doesn't support it
+    > ...
+    > debug_output.counts # message type name -> number of messages
+    """
+
+    def __init__(self, min_severity: str = 'medium', sources: Iterable[str] = None, synchronous=True):
+        if min_severity not in SEVERITIES:
+            raise Exception(f'Unknown severity {min_severity}, expected one of {", ".join(SEVERITIES)}')
+        self.min_severity = min_severity
+        self.sources = list(SOURCES) if sources is None else list(sources)
+        self.synchronous = synchronous
+        self.counts = Counter()
+        self.gl_callback = None # referenced while it's set, the driver calls it
+
+    @staticmethod
+    def is_supported() -> bool:
+        version = tuple(glGetIntegerv(name) for name in (GL_MAJOR_VERSION, GL_MINOR_VERSION))
+        if version >= (4, 3):
+            return True
+        return any(glGetStringi(GL_EXTENSIONS, i) == b'GL_KHR_debug' for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
+    def enable(self) -> bool:
+        if not self.is_supported():
+            if _errors._error_checker:
+                logger.warning('GL_KHR_debug is not supported, GL errors are checked after every call instead')
+            else:
+                logger.warning('GL_KHR_debug is not supported, GL errors are not reported '
+                               '(PYOPENGL_ERROR_CHECKING=1 checks them after every call)')
+            return False
+        # the messages of `min_severity` are logged at lower levels than warnings
+        logger.setLevel(min(LOG_LEVELS[SEVERITIES[self.min_severity]], logging.WARNING))
+        self.gl_callback = GLDEBUGPROC(self.callback)
+        glDebugMessageCallback(self.gl_callback, None)
+        glEnable(GL_DEBUG_OUTPUT)
+        if self.synchronous:
+            glEnable(GL_DEBUG_OUTPUT_SYNCHRONOUS)
+
+        # everything off, then the wanted sources with the wanted severities on
+        glDebugMessageControl(GL_DONT_CARE, GL_DONT_CARE, GL_DONT_CARE, 0, None, GL_FALSE)
+        severities = list(SEVERITIES.values())
+        enabled_severities = severities[:severities.index(SEVERITIES[self.min_severity]) + 1]
+        for source in self.sources:
+            for severity in enabled_severities:
+                glDebugMessageControl(SOURCES[source], GL_DONT_CARE, severity, 0, None, GL_TRUE)
+        set_per_call_error_checking(False)
+        return True
+
+    def disable(self):
+        glDisable(GL_DEBUG_OUTPUT)
+        glDebugMessageCallback(GLDEBUGPROC(), None)
+        self.gl_callback = None
+        set_per_call_error_checking(True)
+
+    def callback(self, source, message_type, message_id, severity, length, message, user_param):
+        # must not raise, the exception can't get through the driver
+        try:
+            text = message[:length].decode(errors='replace') if isinstance(message, bytes) else str(message)
+            type_name = DEBUG_TYPE_NAMES.get(message_type, 'other')
+            self.counts[type_name] += 1
+            source_name = next((name for name, value in SOURCES.items() if value == source), 'other')
+            log_text = f'GL {type_name} ({source_name}, id {message_id}): {text}'
+            if message_type == GL_DEBUG_TYPE_ERROR and self.synchronous:
+                # without the frames of this callback
+                log_text += '\n' + ''.join(traceback.format_stack()[:-1])
+            logger.log(LOG_LEVELS.get(severity, logging.WARNING), log_text)
+        except Exception:
+            logger.exception('GL debug message callback failed')
+
+def set_per_call_error_checking(is_enabled: bool):
+    # PyOpenGL checks glGetError after every call only if ERROR_CHECKING was on when OpenGL.GL was imported,
+    # then the check can be skipped, like it is between glBegin and glEnd
+    checker = _errors._error_checker
+    if checker:
+        checker._currentChecker = checker._registeredChecker if is_enabled else checker.nullGetError
@@ -0,0 +1,128 @@
+from OpenGL.GL import *
+from collections import Counter
+from typing import Dict
+
+class GlState:
+    """
+    Shadow copy of the GL state that is changed on every frame: the program in use, the bound vertex array,
+    the active texture unit and the textures bound to the units, the polygon mode and the line width.
+    Calls that would set the value the state already has are skipped, and the values are read
+    from the copy instead of glGet (which may wait for the queued commands).
+
+    The copy is valid only while the state is changed through it. Code that changes the bindings directly
+    (e.g. the imgui renderer, or a demo that creates its objects in `load`) should be followed by `invalidate`,
+    then the next call of each kind is issued. The polygon mode and the line width aren't expected to be changed
+    directly, they are queried from GL once.
+
+    Example Usage:
+
+    > gl_state = GlState()
+    > gl_state.use_program(shader_program)
+    > gl_state.use_program(shader_program) # skipped
+    > gl_state.bind_texture(GL_TEXTURE_2D, texture_id, texture_unit=1)
+    > mode = gl_state.polygon_mode # no glGetIntegerv
+    > gl_state.end_frame() # counts of the frame are in `frame_issued` and `frame_skipped`
+    """
+
+    def __init__(self):
+        self.invalidate()
+        self.polygon_mode_value, self.line_width_value = None, None # unknown until set or queried
+        self.issued, self.skipped = Counter(), Counter() # call kind -> count in the current frame
+        self.frame_issued, self.frame_skipped = Counter(), Counter() # in the last finished frame
+        self.total_issued, self.total_skipped, self.n_frames = Counter(), Counter(), 0
+
+    def invalidate(self):
+        """Forgets the bindings, after they were changed bypassing GlState"""
+        self.program = None
+        self.vertex_array = None
+        self.active_texture_unit = None
+        self.textures = {} # (texture unit, target) -> texture
+
+    def use_program(self, program: int):
+        if self.is_redundant('program', self.program == program):
+            return
+        glUseProgram(program)
+        self.program = program
+
+    def bind_vertex_array(self, vertex_array: int):
+        if self.is_redundant('vertex_array', self.vertex_array == vertex_array):
+            return
+        glBindVertexArray(vertex_array)
+        self.vertex_array = vertex_array
+
+    def active_texture(self, texture_unit: int):
+        """`texture_unit` is the index of the unit, not GL_TEXTUREi"""
+        if self.is_redundant('active_texture', self.active_texture_unit == texture_unit):
+            return
+        glActiveTexture(GL_TEXTURE0 + texture_unit)
+        self.active_texture_unit = texture_unit
+
+    def bind_texture(self, target, texture: int, texture_unit: int = None):
+        """Binds to the unit, activating it first, or to the active one if `texture_unit` is None"""
+        if texture_unit is not None:
+            self.active_texture(texture_unit)
+        # with the active unit unknown, the binding can't be checked
+        key = (self.active_texture_unit, target)
+        if self.is_redundant('texture', self.active_texture_unit is not None and self.textures.get(key) == texture):
+            return
+        glBindTexture(target, texture)
+        if self.active_texture_unit is not None:
+            self.textures[key] = texture
+
+    @property
+    def polygon_mode(self):
+        if self.polygon_mode_value is None:
+            # GL_FRONT and GL_BACK modes, they are always set together in the core profile
+            self.polygon_mode_value = int(glGetIntegerv(GL_POLYGON_MODE)[0])
+        return self.polygon_mode_value
+
+    def set_polygon_mode(self, mode):
+        if self.is_redundant('polygon_mode', self.polygon_mode_value == mode):
+            return
+        glPolygonMode(GL_FRONT_AND_BACK, mode)
+        self.polygon_mode_value = mode
+
+    @property
+    def line_width(self) -> float:
+        if self.line_width_value is None:
+            self.line_width_value = float(glGetFloatv(GL_LINE_WIDTH))
+        return self.line_width_value
+
+    def set_line_width(self, width: float):
+        if self.is_redundant('line_width', self.line_width_value == width):
+            return
+        glLineWidth(width)
+        self.line_width_value = width
+
+    def forget_program(self, program: int):
+        # a deleted name may be reused by a new object, which then must be bound
+        if self.program == program:
+            self.program = None
+
+    def forget_vertex_array(self, vertex_array: int):
+        if self.vertex_array == vertex_array:
+            self.vertex_array = None
+
+    def forget_texture(self, texture: int):
+        self.textures = {key: bound for key, bound in self.textures.items() if bound != texture}
+
+    def is_redundant(self, kind: str, is_current: bool) -> bool:
+        if is_current:
+            self.skipped[kind] += 1
+        else:
+            self.issued[kind] += 1
+        return is_current
+
+    def end_frame(self):
+        self.frame_issued, self.frame_skipped = self.issued, self.skipped
+        self.total_issued.update(self.issued)
+        self.total_skipped.update(self.skipped)
+        self.n_frames += 1
+        self.issued, self.skipped = Counter(), Counter()
+
+    def frame_counts(self) -> Dict[str, tuple]:
+        """Call kind -> (issued, skipped) in the last finished frame"""
+        kinds = sorted(set(self.frame_issued) | set(self.frame_skipped))
+        return {kind: (self.frame_issued[kind], self.frame_skipped[kind]) for kind in kinds}
+
+default_gl_state = GlState()
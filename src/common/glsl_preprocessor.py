@@ -0,0 +1,177 @@
+from .asset_loader import default_asset_loader
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Set, Tuple
+import re
+import os
+
+SHADERS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'shaders'))
+CODE_STRING_NAME = '<string>' # in place of the main file, when the code isn't read from a file
+
+INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s+(?:"([^"]+)"|<([^>]+)>)\s*(?://.*)?$')
+VERSION_PATTERN = re.compile(r'^\s*#\s*version\b\s*(\d*)')
+LINE_PATTERN = re.compile(r'^\s*#\s*line\s+(\d+)(?:\s+(\d+))?')
+
+class ShaderSource(NamedTuple):
+    code: str
+    # absolute paths of the main file (CODE_STRING_NAME if the code isn't read from a file) and all included files,
+    # the index of a file is its source string number in #line directives and in driver errors
+    source_files: List[str]
+
+    @property
+    def filepaths(self) -> List[str]:
+        return [path for path in self.source_files if path != CODE_STRING_NAME]
+
+    def describe_sources(self) -> str:
+        return ', '.join(f'{index} = {path}' for index, path in enumerate(self.source_files))
+
+    def without_line_directives(self) -> str:
+        """The code with the #line directives commented out, its line numbers are the ones `locate` takes"""
+        return '\n'.join(f'// {line}' if LINE_PATTERN.match(line) else line for line in self.code.split('\n'))
+
+    def locate(self, line_number: int) -> Tuple[str, int]:
+        """File and line in it of the line `line_number` of the code, following its #line directives"""
+        version = glsl_version(self.code)
+        source_index, line_offset = 0, 0
+        for directive_line_number, line in enumerate(self.code.split('\n')[:line_number - 1], start=1):
+            match = LINE_PATTERN.match(line)
+            if match:
+                next_line_number = int(match.group(1)) + (1 if version < 330 else 0)
+                line_offset = next_line_number - (directive_line_number + 1)
+                if match.group(2):
+                    source_index = int(match.group(2))
+        return self.source_files[source_index], line_number + line_offset
+
+class DependencyGraph:
+    """Which shader files include which, to find the shaders affected by a changed file"""
+    def __init__(self):
+        self.includes = defaultdict(set) # file -> files it includes directly
+        self.included_by = defaultdict(set) # file -> files that include it directly
+
+    def set_includes(self, filepath: str, included_filepaths: Set[str]):
+        for included in self.includes.pop(filepath, set()):
+            self.included_by[included].discard(filepath)
+        self.includes[filepath] = set(included_filepaths)
+        for included in included_filepaths:
+            self.included_by[included].add(filepath)
+
+    def dependencies(self, filepath: str) -> Set[str]:
+        """Files included by the file, directly or through other includes"""
+        return self.reachable(filepath, self.includes)
+
+    def dependents(self, filepath: str) -> Set[str]:
+        """Files that include the file, directly or through other includes"""
+        return self.reachable(filepath, self.included_by)
+
+    @staticmethod
+    def reachable(filepath, edges) -> Set[str]:
+        found, stack = set(), [filepath]
+        while stack:
+            for next_filepath in edges.get(stack.pop(), ()):
+                if next_filepath not in found:
+                    found.add(next_filepath)
+                    stack.append(next_filepath)
+        return found
+
+class GlslPreprocessor:
+    """
+    Resolves `#include "file.glsl"` (relative to the including file, then the search paths)
+    and `#include <file.glsl>` (the search paths only), every file is included once per shader.
+    Included code is surrounded with `#line` directives, so the line numbers of driver errors
+    are the ones in the included file, and the source string number is the index
+    in `ShaderSource.source_files`. Before GLSL 3.30 `#line N` numbers the next line N+1,
+    the directives follow the #version of the main file. Some drivers (e.g. Mesa) report
+    the source string 0 for every error, `ShaderSource.locate` finds the file anyway.
+    Included files shouldn't have a #version line.
+
+    Includes of every processed file are recorded in `graph`, to find the shaders to rebuild
+    when an included file changes.
+
+    Example Usage:
+
+    > preprocessor = GlslPreprocessor()
+    > source = preprocessor.process_file('vert.glsl') # includes <transform.glsl> from src/common/shaders
+    > source.source_files
+    ['/path/to/demo/vert.glsl', '/path/to/src/common/shaders/transform.glsl']
+    """
+
+    def __init__(self, search_paths: List[str] = None, read_text: Callable[[str], str] = None):
+        self.search_paths = [SHADERS_DIR] if search_paths is None else search_paths
+        self.read_text = read_text or read_text_file
+        self.graph = DependencyGraph()
+
+    def process_file(self, filepath: str) -> ShaderSource:
+        filepath = os.path.abspath(filepath)
+        return self.process(self.read_text(filepath), filepath)
+
+    def process(self, code: str, filepath: str = None) -> ShaderSource:
+        """`filepath` of the code (if it was read from a file) resolves relative includes,
+           without it they are resolved relative to the working directory"""
+        source_files = [filepath or CODE_STRING_NAME]
+        if '#include' not in code:
+            if filepath:
+                self.graph.set_includes(filepath, set())
+            return ShaderSource(code, source_files)
+        lines = self.expand(code, filepath, 0, source_files, include_stack=[filepath], version=glsl_version(code))
+        return ShaderSource('\n'.join(lines), source_files)
+
+    def expand(self, code: str, filepath: str, source_index: int, source_files: List[str], include_stack: List[str],
+               version: int) -> List[str]:
+        base_dir = os.path.dirname(filepath) if filepath else os.getcwd()
+        lines, includes = [], set()
+        for line_number, line in enumerate(code.split('\n'), start=1):
+            match = INCLUDE_PATTERN.match(line)
+            if match is None:
+                if len(include_stack) > 1 and VERSION_PATTERN.match(line):
+                    line = f'// {line}' # the including shader has the #version
+                lines.append(line)
+                continue
+
+            quoted_path, search_path = match.groups()
+            included_filepath = self.resolve(quoted_path or search_path, base_dir if quoted_path else None)
+            if included_filepath is None:
+                raise Exception(f'{filepath or "Shader"}:{line_number}: included file {quoted_path or search_path} is not found')
+            if included_filepath in include_stack:
+                raise Exception(f'{filepath or "Shader"}:{line_number}: {included_filepath} includes itself')
+            includes.add(included_filepath)
+            if included_filepath in source_files:
+                lines.append(f'// {line.strip()} (already included)')
+                continue
+
+            source_files.append(included_filepath)
+            included_code = self.read_text(included_filepath)
+            lines.append(line_directive(1, len(source_files) - 1, version))
+            lines.extend(self.expand(included_code, included_filepath, len(source_files) - 1, source_files,
+                                     include_stack + [included_filepath], version))
+            # back to the next line of the including file
+            lines.append(line_directive(line_number + 1, source_index, version))
+        if filepath:
+            self.graph.set_includes(filepath, includes)
+        return lines
+
+    def resolve(self, include_path: str, base_dir: str = None) -> str:
+        directories = ([base_dir] if base_dir else []) + self.search_paths
+        for directory in directories:
+            candidate = os.path.abspath(os.path.join(directory, include_path))
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+def glsl_version(code: str) -> int:
+    """Number of the #version line, 110 without one"""
+    for line in code.split('\n'):
+        match = VERSION_PATTERN.match(line)
+        if match:
+            return int(match.group(1) or 110)
+    return 110
+
+def line_directive(line_number: int, source_index: int = None, version: int = 330) -> str:
+    """Directive that numbers the next line `line_number`"""
+    # before GLSL 3.30 the next line is the directive's number + 1
+    line_number = line_number if version >= 330 else line_number - 1
+    return f'#line {line_number}' if source_index is None else f'#line {line_number} {source_index}'
+
+def read_text_file(filepath: str) -> str:
+    # the asset loader may have already read the file ahead, when the demo was prefetched
+    return default_asset_loader.load_text(filepath).result()
+
+default_glsl_preprocessor = GlslPreprocessor()
@@ -1,5 +1,7 @@
 from .gpu_texture import GpuTexture
-from ..common.obj_loader import ParsedWavefront
+from .gl_state import default_gl_state
+from ..common.mesh_cache import default_mesh_cache
+from ..common.mesh_registry import GpuMeshBuffers, default_mesh_registry, make_mesh_key
 from ..base_demo import BaseDemo
 from ..common.defines import *
 from OpenGL.GL import *
@@ -16,6 +18,8 @@ class GpuMesh:
         self.normals_location  = None
         self.obj_filepath = obj_filepath
         self.use_index_buffer = use_index_buffer
+        self.vertex_data = None
+        self.mesh_key, self.buffers = None, None
         self.is_built = False
 
     def with_attributes_size(self, position_n_coords: int, texcoord_n_coords: int, normals_n_coords: int):
@@ -30,6 +34,15 @@ class GpuMesh:
         self.normals_location = normals_location
         return self
 
+    def prepare(self, asset_loader, verbose=True):
+        """Starts parsing the OBJ file in background with an AssetLoader, `build` waits for it.
+           Attributes sizes should be set before. Returns the list of the submitted futures"""
+        if make_mesh_key(self.obj_filepath, self.make_wavefront_layout_pattern(), self.use_index_buffer) in default_mesh_registry:
+            return [] # already on the GPU
+        self.vertex_data = asset_loader.load_mesh(
+            self.obj_filepath, self.make_wavefront_layout_pattern(), self.use_index_buffer, verbose=verbose)
+        return [self.vertex_data]
+
     def build(self, verbose=True):
         assert self.position_location is not None and self.position_n_coords > 0
         assert (self.texcoord_location is None) == (self.texcoord_n_coords == 0)
@@ -48,7 +61,7 @@ class GpuMesh:
 
     def use(self):
         assert self.is_built
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
         return self.vao
 
     def make_wavefront_layout_pattern(self):
@@ -57,31 +70,30 @@ class GpuMesh:
         normals = f'N{self.normals_n_coords}' if self.normals_n_coords else ''
         return '_'.join( filter(bool, [pos, tex, normals]) )
 
-    def load_vertex_data(self, obj_filepath: str, verbose=True):
-        self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
-
-        scene = ParsedWavefront(obj_filepath, verbose=verbose)
+    def load_vertex_arrays(self, obj_filepath: str, attributes_layout: str, verbose=True):
+        if self.vertex_data is not None:
+            # prepared in background
+            vertex_data, self.vertex_data = self.vertex_data, None
+            return vertex_data.result()
+        # parsed only once, next loads memory-map the arrays from the disk cache
+        return default_mesh_cache.load(obj_filepath, attributes_layout, self.use_index_buffer, verbose=verbose)
 
+    def load_vertex_data(self, obj_filepath: str, verbose=True):
         attributes_layout = self.make_wavefront_layout_pattern()
-        if self.use_index_buffer:
-            attributes, index_array = scene.as_numpy_indexed(attributes_layout)
-            self.n_elements = len(index_array)
-        else:
-            attributes = scene.as_numpy(attributes_layout)
-            self.n_elements = attributes.shape[0]
-
-        # send data to GPU
-        self.gpu_attributes = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, self.gpu_attributes)
-        glBufferData(GL_ARRAY_BUFFER, attributes.nbytes, attributes, GL_STATIC_DRAW)
-        if self.use_index_buffer:
-            self.gpu_index_array = glGenBuffers(1)
-            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.gpu_index_array)
-            glBufferData(GL_ELEMENT_ARRAY_BUFFER, index_array.nbytes, index_array, GL_STATIC_DRAW)
+        # buffers are shared by all meshes of the same file, layout and index mode,
+        # the file is parsed and uploaded only if no one has done it yet
+        self.mesh_key = make_mesh_key(obj_filepath, attributes_layout, self.use_index_buffer)
+        self.buffers = default_mesh_registry.acquire(self.mesh_key,
+            lambda: GpuMeshBuffers(*self.load_vertex_arrays(obj_filepath, attributes_layout, verbose=verbose)))
+        self.n_elements = self.buffers.n_elements
+
+        # the vertex array object is per mesh, since shader locations may differ
+        self.vao = glGenVertexArrays(1)
+        default_gl_state.bind_vertex_array(self.vao)
+        self.buffers.bind()
 
         # connect a shader variable and vertex data
-        float_nbytes = attributes.itemsize
+        float_nbytes = self.buffers.attributes_itemsize
         attributes_stride = (self.position_n_coords + self.texcoord_n_coords + self.normals_n_coords) * float_nbytes
 
         if self.position_location is not None:
@@ -113,13 +125,12 @@ class GpuMesh:
                 ctypes.c_void_p((self.position_n_coords+self.texcoord_n_coords)*float_nbytes))
 
         # unbind for safety
-        glBindVertexArray(0)
+        default_gl_state.bind_vertex_array(0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def __del__(self):
-        glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
-        if self.use_index_buffer:
-            glDeleteBuffers(2, np.asarray([self.gpu_attributes, self.gpu_index_array], dtype=np.uint32))
-        else:
-            glDeleteBuffers(1, np.asarray([self.gpu_attributes], dtype=np.uint32))
\ No newline at end of file
+        if self.buffers is not None:
+            glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
+            default_gl_state.forget_vertex_array(self.vao)
+            default_mesh_registry.release(self.mesh_key)
\ No newline at end of file
@@ -0,0 +1,139 @@
+from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as raw_glGetQueryObjectui64v
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple
+import json
+import os
+
+DEFAULT_EXPORT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'profiles'))
+
+class ScopeStats(NamedTuple):
+    min_ms: float
+    avg_ms: float
+    max_ms: float
+    n_samples: int
+
+class GpuProfiler:
+    """
+    Measures the GPU time of sections of a frame with timer queries, e.g. the draw calls of the meshes.
+
+    Timestamps (glQueryCounter) are written before and after a scope, so scopes may be nested
+    (GL_TIME_ELAPSED queries can't be). Results are read back a few frames later, when the GPU has got to them:
+    `end_frame` only checks whether the queries of the older frames are available, so the CPU never waits,
+    unless `max_frames_in_flight` frames are still pending. Query objects are reused in a ring.
+    The last `history_size` results of each scope are kept for the min/avg/max and the JSON export.
+
+    Scope names are paths: a scope inside "render_frame" named "meshes" is "render_frame/meshes".
+
+    Example Usage:
+
+    > profiler = GpuProfiler()
+    > with profiler.scope('meshes'):
+    >     ... # draw calls
+    > profiler.end_frame()
+    > ...
+    > profiler.stats('meshes')
+    ScopeStats(min_ms=0.41, avg_ms=0.52, max_ms=0.97, n_samples=120)
+    """
+
+    def __init__(self, history_size: int = 120, max_frames_in_flight: int = 4):
+        self.history_size = history_size
+        self.max_frames_in_flight = max_frames_in_flight
+        self.is_enabled = True
+        self.free_queries = []
+        self.pending_frames = deque() # (frame index, [(scope path, begin query, end query)])
+        self.frame_scopes = [] # of the current frame
+        self.scope_stack = []
+        self.frame_index = 0
+        self.history = defaultdict(lambda: deque(maxlen=self.history_size)) # scope path -> (frame index, ms)
+        self.n_stalls = 0 # frames that waited for the GPU, because too many results were pending
+
+    @contextmanager
+    def scope(self, name: str):
+        if not self.is_enabled:
+            yield
+            return
+        path = '/'.join(self.scope_stack + [name])
+        begin_query, end_query = self.take_query(), self.take_query()
+        glQueryCounter(begin_query, GL_TIMESTAMP)
+        self.scope_stack.append(name)
+        try:
+            yield
+        finally:
+            self.scope_stack.pop()
+            glQueryCounter(end_query, GL_TIMESTAMP)
+            self.frame_scopes.append((path, begin_query, end_query))
+
+    def take_query(self) -> int:
+        if not self.free_queries:
+            self.free_queries.extend(int(query) for query in glGenQueries(8))
+        return self.free_queries.pop()
+
+    def end_frame(self):
+        if self.frame_scopes:
+            self.pending_frames.append((self.frame_index, self.frame_scopes))
+            self.frame_scopes = []
+        self.frame_index += 1
+
+        while self.pending_frames:
+            frame_index, scopes = self.pending_frames[0]
+            # commands complete in order, so the frame is done if its last query is
+            is_available = glGetQueryObjectiv(scopes[-1][2], GL_QUERY_RESULT_AVAILABLE)
+            if not is_available:
+                if len(self.pending_frames) <= self.max_frames_in_flight:
+                    break
+                self.n_stalls += 1 # the result is waited for below
+            self.read_oldest_frame()
+
+    def flush(self):
+        """Waits for the results of all frames in flight, e.g. before the history is read at the end of a benchmark"""
+        while self.pending_frames:
+            self.read_oldest_frame()
+
+    def read_oldest_frame(self):
+        frame_index, scopes = self.pending_frames.popleft()
+        for path, begin_query, end_query in scopes:
+            elapsed_ms = (query_result(end_query) - query_result(begin_query)) / 1e6
+            self.history[path].append((frame_index, elapsed_ms))
+            self.free_queries.extend((begin_query, end_query))
+
+    def clear_history(self):
+        # results of the frames still in flight land in the new history
+        self.history.clear()
+
+    def stats(self, path: str) -> ScopeStats:
+        """Over the last `history_size` results of the scope"""
+        times_ms = [elapsed_ms for _, elapsed_ms in self.history.get(path, ())]
+        if not times_ms:
+            return ScopeStats(0.0, 0.0, 0.0, 0)
+        return ScopeStats(min(times_ms), sum(times_ms) / len(times_ms), max(times_ms), len(times_ms))
+
+    @property
+    def scope_paths(self) -> List[str]:
+        # parents before their children
+        return sorted(self.history)
+
+    def to_json_dict(self) -> Dict:
+        return dict(
+            history_size=self.history_size,
+            scopes={path: dict(stats=self.stats(path)._asdict(),
+                               samples=[dict(frame=frame_index, ms=elapsed_ms) for frame_index, elapsed_ms in samples])
+                    for path, samples in sorted(self.history.items())})
+
+    def export_json(self, path: str = None) -> str:
+        """Writes the rolling history to the file (a new file in .cache/profiles by default), returns its path"""
+        if path is None:
+            os.makedirs(DEFAULT_EXPORT_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_EXPORT_DIR, f'gpu_profile_{self.frame_index}.json')
+        with open(path, 'w') as f:
+            json.dump(self.to_json_dict(), f, indent=2)
+        return path
+
+def query_result(query) -> int:
+    # the wrapped glGetQueryObjectui64v doesn't know the type of its output
+    result = GLuint64(0)
+    raw_glGetQueryObjectui64v(query, GL_QUERY_RESULT, result)
+    return result.value
+
+default_gpu_profiler = GpuProfiler()
@@ -1,55 +1,345 @@
+from .glsl_preprocessor import ShaderSource, LINE_PATTERN, default_glsl_preprocessor, glsl_version, line_directive
+from .gl_state import default_gl_state
 from OpenGL.GL import *
+from OpenGL.GL.KHR.parallel_shader_compile import glMaxShaderCompilerThreadsKHR, GL_COMPLETION_STATUS_KHR
+from OpenGL.GL.ARB.parallel_shader_compile import glMaxShaderCompilerThreadsARB
+from OpenGL.raw.GL.VERSION.GL_2_0 import glGetProgramiv as raw_glGetProgramiv
+from typing import NamedTuple, Dict
+import numpy as np
+import time
+import re
 import os
 
+class GpuShaderStage:
+    """Compiled shader object, may be attached to several programs (see ShaderPool).
+       Compiling is only submitted, `check` waits for it and raises on errors"""
+    def __init__(self, shader_type, shader_source: ShaderSource):
+        start_sec = time.perf_counter()
+        self.shader_type = shader_type
+        self.shader_source = shader_source
+        self.gl_id = glCreateShader(shader_type)
+        glShaderSource(self.gl_id, shader_source.code)
+        glCompileShader(self.gl_id)
+        self.is_checked = False
+        # submitting, plus waiting in `check`
+        self.compile_time_sec = time.perf_counter() - start_sec
+
+    def check(self):
+        if self.is_checked:
+            return
+        start_sec = time.perf_counter()
+        if not glGetShaderiv(self.gl_id, GL_COMPILE_STATUS):
+            error = glGetShaderInfoLog(self.gl_id)
+            # errors are reported as `source string number:line`
+            if any(LINE_PATTERN.match(line) for line in self.shader_source.code.split('\n')):
+                error = self.locate_errors()
+            raise Exception(f"{SHADER_STAGE_NAMES[self.shader_type]} shader didn't compile with error: {error}\n"
+                            f"Source strings: {self.shader_source.describe_sources()}")
+        self.is_checked = True
+        self.compile_time_sec += time.perf_counter() - start_sec
+
+    def locate_errors(self) -> str:
+        """Errors with the file and the line in it. Not every driver reports the source string of #line
+           (Mesa mostly has 0), so the code is compiled again without the directives and the lines are mapped"""
+        gl_id = glCreateShader(self.shader_type)
+        try:
+            glShaderSource(gl_id, self.shader_source.without_line_directives())
+            glCompileShader(gl_id)
+            error = glGetShaderInfoLog(gl_id).decode(errors='replace')
+        finally:
+            glDeleteShader(gl_id)
+        def with_file(match):
+            filepath, line_number = self.shader_source.locate(int(match.group(2)))
+            return f'{match.group(1)}{filepath}:{line_number}'
+        return ERROR_LOCATION_PATTERN.sub(with_file, error)
+
+    def __del__(self):
+        if getattr(self, 'gl_id', None):
+            glDeleteShader(self.gl_id)
+
 class GpuShader:
-    def __init__(self, vertex_shader_code: str, fragment_shader_code: str, out_variable: bytes):
-        if os.path.isfile(vertex_shader_code):
-            vertex_shader_code = read_text_file(vertex_shader_code)
-        elif not vertex_shader_code.startswith('#version'):
-            raise ArgumentError(f'Given vertex shader is neither a filepath nor a valid GLSL code: {vertex_shader_code}')
+    def __init__(self, vertex_shader_code: str, fragment_shader_code: str, out_variable: bytes,
+                 defines: Dict[str, object] = None, compile_stage=GpuShaderStage, binary_cache=None, deferred=False):
+        """Shader codes are GLSL sources or paths to them (#include is resolved, see GlslPreprocessor),
+           `defines` are added to both of them.
+           `compile_stage(shader_type, shader_source)` makes GpuShaderStage, ShaderPool passes its cached ones.
+           With `binary_cache` (ProgramBinaryCache) the program is loaded from the stored binary, if it's valid.
+           A `deferred` program is only submitted for compiling and linking, see `is_ready` and `finish`"""
+        start_sec = time.perf_counter()
+        vertex_shader_code = with_defines(load_shader_code(vertex_shader_code, 'vertex'), defines)
+        fragment_shader_code = with_defines(load_shader_code(fragment_shader_code, 'fragment'), defines)
+        # the main files and the included ones, with their modification times when the program was built
+        self.source_mtimes = {filepath: modification_time(filepath)
+                              for filepath in vertex_shader_code.filepaths + fragment_shader_code.filepaths}
+
+        self.vertex_shader, self.fragment_shader = None, None # not compiled, if loaded from the binary
+        self.shader_program = None
+        self.binary_cache, self.binary_key = binary_cache, None
+        if binary_cache is not None:
+            self.binary_key = binary_cache.make_key(vertex_shader_code.code, fragment_shader_code.code, out_variable)
+            self.shader_program = binary_cache.load_program(self.binary_key)
+        self.is_from_binary = self.shader_program is not None
+
+        if not self.is_from_binary:
+            enable_parallel_compile()
+            self.vertex_shader = compile_stage(GL_VERTEX_SHADER, vertex_shader_code)
+            self.fragment_shader = compile_stage(GL_FRAGMENT_SHADER, fragment_shader_code)
+
+            self.shader_program = glCreateProgram()
+            glAttachShader(self.shader_program, self.vertex_shader.gl_id)
+            glAttachShader(self.shader_program, self.fragment_shader.gl_id)
 
-        self.vertex_shader = glCreateShader(GL_VERTEX_SHADER)
-        glShaderSource(self.vertex_shader, vertex_shader_code)
-        glCompileShader(self.vertex_shader)
+            glBindFragDataLocation(self.shader_program, 0, out_variable)
+            if binary_cache is not None:
+                binary_cache.prepare_program(self.shader_program)
+            glLinkProgram(self.shader_program)
+        # compiling (of the shader objects that weren't cached) and linking, or loading the binary,
+        # the time spent waiting in `finish` is added to it
+        self.build_time_sec = time.perf_counter() - start_sec
 
-        if os.path.isfile(fragment_shader_code):
-            fragment_shader_code = read_text_file(fragment_shader_code)
-        elif not vertex_shader_code.startswith('#version'):
-            raise ArgumentError(f'Given fragment shader is neither a filepath nor a valid GLSL code: {fragment_shader_code}')
+        self.is_finished = False
+        if not deferred:
+            self.finish()
 
-        self.fragment_shader = glCreateShader(GL_FRAGMENT_SHADER)
-        glShaderSource(self.fragment_shader, fragment_shader_code)
-        glCompileShader(self.fragment_shader)
+    @property
+    def is_ready(self) -> bool:
+        """Whether `finish` won't wait for the driver. Doesn't block itself: with GL_KHR_parallel_shader_compile
+           the completion status is queried, without it a submitted program is always reported as ready,
+           and `finish` waits for it (status queries of all submitted programs still go after all submits)"""
+        if self.is_finished or self.is_from_binary or not enable_parallel_compile():
+            return True
+        # the wrapped glGetProgramiv doesn't know the output size of this query
+        status = GLint(0)
+        raw_glGetProgramiv(self.shader_program, GL_COMPLETION_STATUS_KHR, status)
+        return bool(status.value)
 
-        self.shader_program = glCreateProgram()
-        glAttachShader(self.shader_program, self.vertex_shader)
-        glAttachShader(self.shader_program, self.fragment_shader)
+    def done(self) -> bool:
+        # same as `Future.done`, so the loading progress counts programs along with the asset futures
+        return self.is_ready
 
-        glBindFragDataLocation(self.shader_program, 0, out_variable)
-        glLinkProgram(self.shader_program)
+    def finish(self):
+        """Waits for compiling and linking, raises on errors and looks up the uniforms and attributes.
+           Called by `use`, if it wasn't called before"""
+        if self.is_finished:
+            return
+        start_sec = time.perf_counter()
+        if not self.is_from_binary:
+            self.vertex_shader.check()
+            self.fragment_shader.check()
+            self.check_shader_compilation()
+            if self.binary_cache is not None:
+                self.binary_cache.store_program(self.binary_key, self.shader_program)
 
-        self.check_shader_compilation()
+        # locations are looked up once, not on every frame
+        self.uniforms = reflect_uniforms(self.shader_program)
+        self.attributes = reflect_attributes(self.shader_program)
+        # uniform values are stored in the program object, so the uploaded ones are valid until it's deleted
+        self.uniform_values = {}
+        self.uniform_stats = default_uniform_stats
+        self.is_finished = True
+        self.build_time_sec += time.perf_counter() - start_sec
 
     def __del__(self):
-        glDeleteProgram(self.shader_program)
-        glDeleteShader(self.vertex_shader)
-        glDeleteShader(self.fragment_shader)
+        # shader objects are deleted with the last program that uses them
+        if getattr(self, 'shader_program', None):
+            glDeleteProgram(self.shader_program)
+            default_gl_state.forget_program(self.shader_program)
 
     def use(self) -> int:
-        glUseProgram(self.shader_program)
+        if not self.is_finished:
+            self.finish()
+        default_gl_state.use_program(self.shader_program) # skipped if it's already in use
         return self.shader_program
 
+    @property
+    def is_stale(self) -> bool:
+        """Whether any of the source files (including the included ones) changed since the program was built"""
+        return any(modification_time(filepath) != mtime for filepath, mtime in self.source_mtimes.items())
+
+    def set(self, name: str, value, transpose=False) -> bool:
+        """Uploads the uniform value, unless the uniform already has it. The shader should be in use.
+           Uniforms that aren't active (not declared or optimized out) are ignored, like location -1.
+           Returns whether the value was uploaded
+
+           Example Usage:
+
+           > shader.use()
+           > shader.set('u_aspect_ratio', width / height)
+           > shader.set('u_transform', transform)
+        """
+        uniform = self.uniforms.get(name)
+        if uniform is None:
+            return False
+        if not isinstance(value, (int, float)):
+            # a copy, so that the caller can modify its array in place
+            value = np.array(value, dtype=uniform_setter(uniform).dtype)
+        uploaded = self.uniform_values.get(name)
+        if uploaded is not None and uploaded[0] == transpose and values_equal(uploaded[1], value):
+            self.uniform_stats.skipped += 1
+            return False
+        upload_uniform(uniform, value, transpose)
+        self.uniform_values[name] = (transpose, value)
+        self.uniform_stats.issued += 1
+        return True
+
+    def set_many(self, values: Dict[str, object], transpose=False) -> int:
+        """Same as `set` for every item of the dict, returns the number of uploaded values"""
+        return sum(self.set(name, value, transpose) for name, value in values.items())
+
+    def attribute_location(self, name: str) -> int:
+        """Same as glGetAttribLocation, -1 if the attribute isn't active"""
+        self.finish()
+        return self.attributes.get(name, -1)
+
     def check_shader_compilation(self):
-        if not glGetShaderiv(self.vertex_shader, GL_COMPILE_STATUS):
-            error = glGetShaderInfoLog(self.vertex_shader)
-            raise Exception(f"Vertex shader didn't compile with error: {error}")
-        if not glGetShaderiv(self.fragment_shader, GL_COMPILE_STATUS):
-            error = glGetShaderInfoLog(self.fragment_shader)
-            raise Exception(f"Fragment shader didn't compile with error: {error}")
         if not glGetProgramiv(self.shader_program, GL_LINK_STATUS):
             error = glGetProgramInfoLog(self.shader_program)
             raise Exception(f"Shader program didn't compile with error: {error}")
 
-def read_text_file(filepath):
-    with open(filepath, 'r') as f:
-        return f.read()
\ No newline at end of file
+SHADER_STAGE_NAMES = {GL_VERTEX_SHADER: 'Vertex', GL_FRAGMENT_SHADER: 'Fragment'}
+# line of an error in source string 0: `0:12(5)` (Mesa), `0(12)` (NVIDIA), `ERROR: 0:12:` (AMD, Intel)
+ERROR_LOCATION_PATTERN = re.compile(r'^((?:ERROR: )?)0[:(](\d+)\)?', re.MULTILINE)
+
+# GL_COMPLETION_STATUS_KHR is the same for both
+PARALLEL_COMPILE_EXTENSIONS = {
+    'GL_KHR_parallel_shader_compile': glMaxShaderCompilerThreadsKHR,
+    'GL_ARB_parallel_shader_compile': glMaxShaderCompilerThreadsARB,
+}
+parallel_compile_state = {} # 'is_supported' once the extensions were queried, there is one GL context
+
+def enable_parallel_compile() -> bool:
+    """Lets the driver compile and link on its own threads, if it supports GL_KHR_parallel_shader_compile
+       (or the ARB one), returns whether it does. Needs a current GL context, queried once"""
+    if 'is_supported' not in parallel_compile_state:
+        extensions = {glGetStringi(GL_EXTENSIONS, i).decode() for i in range(glGetIntegerv(GL_NUM_EXTENSIONS))}
+        parallel_compile_state['is_supported'] = False
+        for extension, max_shader_compiler_threads in PARALLEL_COMPILE_EXTENSIONS.items():
+            if extension in extensions:
+                # the default number of threads is implementation dependent, 0xFFFFFFFF asks for the maximum
+                max_shader_compiler_threads(0xFFFFFFFF)
+                parallel_compile_state['is_supported'] = True
+                break
+    return parallel_compile_state['is_supported']
+
+class UniformInfo(NamedTuple):
+    name: str
+    location: int
+    gl_type: int
+    size: int # number of elements of an array uniform, 1 otherwise
+
+class UniformSetter(NamedTuple):
+    function: object
+    n_components: int
+    dtype: type
+    is_matrix: bool
+
+UNIFORM_SETTERS = {
+    GL_FLOAT:        UniformSetter(glUniform1fv, 1, np.float32, False),
+    GL_FLOAT_VEC2:   UniformSetter(glUniform2fv, 2, np.float32, False),
+    GL_FLOAT_VEC3:   UniformSetter(glUniform3fv, 3, np.float32, False),
+    GL_FLOAT_VEC4:   UniformSetter(glUniform4fv, 4, np.float32, False),
+    GL_DOUBLE:       UniformSetter(glUniform1dv, 1, np.float64, False),
+    GL_DOUBLE_VEC2:  UniformSetter(glUniform2dv, 2, np.float64, False),
+    GL_DOUBLE_VEC3:  UniformSetter(glUniform3dv, 3, np.float64, False),
+    GL_DOUBLE_VEC4:  UniformSetter(glUniform4dv, 4, np.float64, False),
+    GL_INT:          UniformSetter(glUniform1iv, 1, np.int32, False),
+    GL_INT_VEC2:     UniformSetter(glUniform2iv, 2, np.int32, False),
+    GL_INT_VEC3:     UniformSetter(glUniform3iv, 3, np.int32, False),
+    GL_INT_VEC4:     UniformSetter(glUniform4iv, 4, np.int32, False),
+    GL_UNSIGNED_INT: UniformSetter(glUniform1uiv, 1, np.uint32, False),
+    GL_BOOL:         UniformSetter(glUniform1iv, 1, np.int32, False),
+    GL_FLOAT_MAT2:   UniformSetter(glUniformMatrix2fv, 4, np.float32, True),
+    GL_FLOAT_MAT3:   UniformSetter(glUniformMatrix3fv, 9, np.float32, True),
+    GL_FLOAT_MAT4:   UniformSetter(glUniformMatrix4fv, 16, np.float32, True),
+}
+# samplers are set to the texture unit
+for sampler_type in [GL_SAMPLER_1D, GL_SAMPLER_2D, GL_SAMPLER_3D, GL_SAMPLER_CUBE,
+                     GL_SAMPLER_1D_ARRAY, GL_SAMPLER_2D_ARRAY, GL_SAMPLER_2D_SHADOW, GL_SAMPLER_BUFFER,
+                     GL_INT_SAMPLER_2D, GL_UNSIGNED_INT_SAMPLER_2D]:
+    UNIFORM_SETTERS[sampler_type] = UNIFORM_SETTERS[GL_INT]
+
+class UniformStats:
+    """Counts uniform uploads issued to the driver and skipped because the uniform already had the value"""
+    def __init__(self):
+        self.issued, self.skipped = 0, 0 # in the current frame
+        self.frame_issued, self.frame_skipped = 0, 0 # in the last finished frame
+        self.total_issued, self.total_skipped, self.n_frames = 0, 0, 0
+
+    def end_frame(self):
+        self.frame_issued, self.frame_skipped = self.issued, self.skipped
+        self.total_issued += self.issued
+        self.total_skipped += self.skipped
+        self.n_frames += 1
+        self.issued, self.skipped = 0, 0
+
+default_uniform_stats = UniformStats()
+
+def reflect_uniforms(shader_program) -> Dict[str, UniformInfo]:
+    uniforms = {}
+    for index in range(glGetProgramiv(shader_program, GL_ACTIVE_UNIFORMS)):
+        name, size, gl_type = glGetActiveUniform(shader_program, index)
+        name = name.decode() if isinstance(name, bytes) else name
+        location = glGetUniformLocation(shader_program, name)
+        if location == -1:
+            continue # a member of a uniform block, it doesn't have a location
+        # arrays are reported as `name[0]`, but set by the plain name
+        if name.endswith('[0]'):
+            name = name[:-len('[0]')]
+        uniforms[name] = UniformInfo(name, location, int(gl_type), size)
+    return uniforms
+
+def reflect_attributes(shader_program) -> Dict[str, int]:
+    attributes = {}
+    for index in range(glGetProgramiv(shader_program, GL_ACTIVE_ATTRIBUTES)):
+        name, _, _ = glGetActiveAttrib(shader_program, index)
+        name = name.decode() if isinstance(name, bytes) else name
+        attributes[name] = glGetAttribLocation(shader_program, name)
+    return attributes
+
+def uniform_setter(uniform: UniformInfo) -> UniformSetter:
+    setter = UNIFORM_SETTERS.get(uniform.gl_type)
+    if setter is None:
+        raise Exception(f'Uniform {uniform.name} has unsupported type {uniform.gl_type}')
+    return setter
+
+def upload_uniform(uniform: UniformInfo, value, transpose=False):
+    setter = uniform_setter(uniform)
+    array = np.ascontiguousarray(value, dtype=setter.dtype)
+    count = max(array.size // setter.n_components, 1)
+    if setter.is_matrix:
+        setter.function(uniform.location, count, GL_TRUE if transpose else GL_FALSE, array)
+    else:
+        setter.function(uniform.location, count, array)
+
+def values_equal(a, b) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    return np.array_equal(a, b)
+
+def load_shader_code(shader_code, stage_name: str) -> ShaderSource:
+    """Reads the shader file, if a path is given instead of GLSL code, and resolves includes"""
+    if isinstance(shader_code, ShaderSource):
+        return shader_code
+    if os.path.isfile(shader_code):
+        return default_glsl_preprocessor.process_file(shader_code)
+    if not shader_code.startswith('#version'):
+        raise Exception(f'Given {stage_name} shader is neither a filepath nor a valid GLSL code: {shader_code}')
+    return default_glsl_preprocessor.process(shader_code)
+
+def with_defines(shader_source: ShaderSource, defines: Dict[str, object] = None) -> ShaderSource:
+    return ShaderSource(inject_defines(shader_source.code, defines), shader_source.source_files)
+
+def inject_defines(shader_code: str, defines: Dict[str, object] = None) -> str:
+    """Adds `#define NAME VALUE` lines after the #version line, which must be the first one"""
+    if not defines:
+        return shader_code
+    version_line, _, body = shader_code.partition('\n')
+    define_lines = [f'#define {name} {"" if value is None else value}'.rstrip() for name, value in sorted(defines.items())]
+    # the line numbers of compilation errors stay the same as in the file
+    return '\n'.join([version_line, *define_lines, line_directive(2, version=glsl_version(version_line)), body])
+
+def modification_time(filepath: str):
+    try:
+        return os.stat(filepath).st_mtime_ns
+    except OSError:
+        return None
\ No newline at end of file
@@ -1,4 +1,5 @@
 from . import defines
+from .gl_state import default_gl_state
 from OpenGL.GL import *
 from PIL.Image import Image
 import PIL
@@ -9,7 +10,7 @@ import numpy as np
 class GpuTexture:
     # All next configuring commands will affect this newly created texture object
     def bind(self):
-        glBindTexture(self.target, self.gpu_id)
+        default_gl_state.bind_texture(self.target, self.gpu_id)
 
     @property
     def gl_id(self):
@@ -24,8 +25,7 @@ class GpuTexture:
         return (self.width, self.height)
 
     def use(self, texture_unit=0):
-        glActiveTexture(GL_TEXTURE0 + texture_unit)
-        glBindTexture(GL_TEXTURE_2D, self.gpu_id)
+        default_gl_state.bind_texture(self.target, self.gpu_id, texture_unit)
 
     def __init__(self, cpu_image: Image, is_1d=False, flip_y=False, store_srgb=False):
         assert isinstance(cpu_image, Image)
@@ -51,7 +51,7 @@ class GpuTexture:
         self.gpu_id = glGenTextures(1)
 
         # All next configuring commands will affect this newly created texture object
-        glBindTexture(self.target, self.gpu_id)
+        self.bind()
 
         if flip_y:
             cpu_image = cpu_image.transpose(PIL.Image.Transpose.FLIP_TOP_BOTTOM)
@@ -100,4 +100,5 @@ class GpuTexture:
 
     def __del__(self):
         if getattr(self, 'gpu_id', None):
-            glDeleteTextures(np.array([self.gpu_id], dtype=np.uint32))
\ No newline at end of file
+            glDeleteTextures(np.array([self.gpu_id], dtype=np.uint32))
+            default_gl_state.forget_texture(self.gpu_id)
\ No newline at end of file
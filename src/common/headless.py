@@ -0,0 +1,119 @@
+from OpenGL.GL import *
+from typing import Tuple
+import numpy as np
+import ctypes
+import os
+
+class HeadlessContext:
+    """
+    GL 3.3 core context without a window, for rendering on machines without a display
+    (CI, render nodes, Mesa's llvmpipe). EGL creates a context without any surface (GL_EXT_surfaceless_context),
+    OSMesa renders into a buffer in memory. Either way frames are drawn into an OffscreenFramebuffer.
+
+    PyOpenGL should be loading the functions of the backend, see `defines.apply_headless_backend`.
+
+    Example Usage:
+
+    > defines.apply_headless_backend('egl') # before OpenGL.GL is imported
+    > context = HeadlessContext('egl')
+    > framebuffer = OffscreenFramebuffer(800, 600)
+    > ... # draw calls
+    > pixels = framebuffer.read_pixels()
+    """
+
+    def __init__(self, backend: str = 'egl', size: Tuple[int, int] = (1, 1)):
+        platform = os.environ.get('PYOPENGL_PLATFORM')
+        if platform != backend:
+            raise Exception(f'PyOpenGL uses platform {platform}, {backend} should be applied before OpenGL.GL is imported')
+        self.backend = backend
+        if backend == 'egl':
+            self.create_egl_context()
+        else:
+            self.create_osmesa_context(size)
+
+    def create_egl_context(self):
+        # PyOpenGL 3.1 doesn't define the EGL error checker when ERROR_CHECKING is off (the release GL profile)
+        from OpenGL.raw.EGL import _errors
+        if not hasattr(_errors, '_error_checker'):
+            _errors._error_checker = None
+        from OpenGL import EGL
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise Exception("Can't initialize EGL display")
+        config, n_configs = EGL.EGLConfig(), EGL.EGLint()
+        config_attributes = (EGL.EGLint * 5)(EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_NONE)
+        EGL.eglChooseConfig(self.display, config_attributes, ctypes.pointer(config), 1, ctypes.pointer(n_configs))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3, EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT, EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+        if not self.context or not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise Exception("Can't create EGL context")
+
+    def create_osmesa_context(self, size):
+        from OpenGL import osmesa
+        context_attributes = (ctypes.c_int * 11)(
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA, osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3, osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3, 0)
+        self.context = osmesa.OSMesaCreateContextAttribs(context_attributes, None)
+        if not self.context:
+            raise Exception("Can't create OSMesa context")
+        # OSMesa needs a buffer to make the context current, frames go to the framebuffer object anyway
+        width, height = size
+        self.osmesa_buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        if not osmesa.OSMesaMakeCurrent(self.context, self.osmesa_buffer, GL_UNSIGNED_BYTE, width, height):
+            raise Exception("Can't make OSMesa context current")
+
+    def destroy(self):
+        if self.backend == 'egl':
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
+        self.context = None
+
+class OffscreenFramebuffer:
+    """Framebuffer object with RGBA8 color and 24 bit depth renderbuffers, frames are drawn into it
+       in place of the window's default framebuffer"""
+    def __init__(self, width: int, height: int):
+        self.width, self.height = width, height
+        self.gl_id = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.gl_id)
+        self.renderbuffers = []
+        for attachment, internal_format in [(GL_COLOR_ATTACHMENT0, GL_RGBA8), (GL_DEPTH_ATTACHMENT, GL_DEPTH_COMPONENT24)]:
+            renderbuffer = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, internal_format, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+            self.renderbuffers.append(renderbuffer)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise Exception(f'Framebuffer {width}x{height} is incomplete, status {status:#x}')
+        glViewport(0, 0, width, height)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.width, self.height)
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.gl_id)
+
+    def read_pixels(self) -> np.array:
+        """Waits for the frame, returns (height, width, 4) uint8 RGBA array, top row first"""
+        self.bind()
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        # GL rows go from the bottom
+        return np.frombuffer(pixels, dtype=np.uint8).reshape(self.height, self.width, 4)[::-1]
+
+    def __del__(self):
+        if getattr(self, 'gl_id', None):
+            glDeleteRenderbuffers(len(self.renderbuffers), np.asarray(self.renderbuffers, dtype=np.uint32))
+            glDeleteFramebuffers(1, np.asarray([self.gl_id], dtype=np.uint32))
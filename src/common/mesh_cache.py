@@ -0,0 +1,148 @@
+import logging
+logger = logging.getLogger(__file__)
+
+from .obj_loader import ParsedWavefront
+from .frame_tracer import default_frame_tracer
+from typing import Tuple, Optional
+import numpy as np
+import hashlib
+import os
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'meshes'))
+DEFAULT_MAX_SIZE_BYTES = 1024 * 2**20 # 1 GiB
+
+class MeshCache:
+    """
+    Persistent on-disk cache of the arrays that ParsedWavefront produces, so that an OBJ file
+    is parsed only once, and next loads read the binary arrays back.
+
+    An entry is keyed by the OBJ content hash, the attributes layout, indexed/non-indexed mode
+    and the dtypes. Entries are stored as .npy files, which are memory-mapped on load,
+    so they can be passed directly to glBufferData.
+    When the total size of the cache exceeds `max_size_bytes`, the least recently used entries
+    are deleted.
+
+    Example Usage:
+
+    > cache = MeshCache()
+    > attributes, indices = cache.load('path/to/scene.obj', 'P3_T2', use_index_buffer=True)
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.hits, self.misses = 0, 0
+
+    def load(self, obj_filepath: str, attributes_layout: str, use_index_buffer: bool,
+             attrib_dtype=np.float32, indices_dtype=np.uint32, verbose=True) -> Tuple[np.array, Optional[np.array]]:
+        """Returns interleaved attributes and index array (None if `use_index_buffer` is False),
+           same as ParsedWavefront.as_numpy_indexed / ParsedWavefront.as_numpy.
+           The OBJ file is parsed only if the cache doesn't have the arrays yet"""
+        key = self.make_key(obj_filepath, attributes_layout, use_index_buffer, attrib_dtype, indices_dtype)
+        with default_frame_tracer.scope('read_mesh_cache'):
+            cached = self.read_entry(key, use_index_buffer)
+        if cached is not None:
+            self.hits += 1
+            if verbose: logger.info(f'Mesh cache hit for {obj_filepath} ({attributes_layout})')
+            return cached
+
+        self.misses += 1
+        with default_frame_tracer.scope('parse_obj'):
+            scene = ParsedWavefront(obj_filepath, verbose=verbose)
+        with default_frame_tracer.scope('interleave_attributes'):
+            if use_index_buffer:
+                attributes, indices = scene.as_numpy_indexed(attributes_layout, attrib_dtype=attrib_dtype, indices_dtype=indices_dtype)
+            else:
+                attributes, indices = scene.as_numpy(attributes_layout, dtype=attrib_dtype), None
+
+        try:
+            self.write_entry(key, attributes, indices)
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Can't write mesh cache entry for {obj_filepath}: {e}")
+        return attributes, indices
+
+    def make_key(self, obj_filepath, attributes_layout, use_index_buffer, attrib_dtype, indices_dtype) -> str:
+        content_hash = hashlib.blake2b(digest_size=16)
+        with open(obj_filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                content_hash.update(chunk)
+        key = '|'.join([
+            content_hash.hexdigest(),
+            attributes_layout.upper(),
+            'indexed' if use_index_buffer else 'arrays',
+            np.dtype(attrib_dtype).str,
+            np.dtype(indices_dtype).str if use_index_buffer else '',
+        ])
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def entry_paths(self, key):
+        return (os.path.join(self.cache_dir, f'{key}.attributes.npy'),
+                os.path.join(self.cache_dir, f'{key}.indices.npy'))
+
+    def read_entry(self, key, use_index_buffer):
+        attributes_path, indices_path = self.entry_paths(key)
+        try:
+            attributes = np.load(attributes_path, mmap_mode='r')
+            indices = np.load(indices_path, mmap_mode='r') if use_index_buffer else None
+        except (OSError, ValueError):
+            # missing or corrupted entry, will be overwritten
+            return None
+        # mark as recently used
+        for path in (attributes_path, indices_path):
+            if os.path.exists(path):
+                os.utime(path)
+        return attributes, indices
+
+    def write_entry(self, key, attributes, indices):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        attributes_path, indices_path = self.entry_paths(key)
+        # write the index array first, an entry is valid once its attributes file exists
+        for path, array in ((indices_path, indices), (attributes_path, attributes)):
+            if array is None:
+                continue
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temporary_path, path)
+
+    def entries(self):
+        """Returns a list of (key, total size in bytes, last use time) of all cached entries"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = {}
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.npy'):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, filename))
+            key = filename.split('.', 1)[0]
+            size, last_use = entries.get(key, (0, 0.0))
+            entries[key] = (size + stat.st_size, max(last_use, stat.st_mtime))
+        return [(key, size, last_use) for key, (size, last_use) in entries.items()]
+
+    @property
+    def size_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits into `max_size_bytes`"""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            self.remove_entry(key)
+            total_size -= size
+
+    def remove_entry(self, key):
+        for path in self.entry_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            self.remove_entry(key)
+
+default_mesh_cache = MeshCache()
@@ -0,0 +1,106 @@
+from .frame_tracer import default_frame_tracer
+from OpenGL.GL import *
+from collections import OrderedDict
+from typing import Callable, Tuple
+import numpy as np
+import os
+
+DEFAULT_IDLE_BUDGET_BYTES = 256 * 2**20 # 256 MiB of video memory
+
+class GpuMeshBuffers:
+    """Vertex attributes buffer and (optional) index buffer of a mesh uploaded to the GPU"""
+    def __init__(self, attributes: np.array, index_array: np.array = None):
+        self.n_elements = len(index_array) if index_array is not None else attributes.shape[0]
+        self.attributes_itemsize = attributes.itemsize
+        self.nbytes = attributes.nbytes + (index_array.nbytes if index_array is not None else 0)
+
+        with default_frame_tracer.scope('upload_mesh'):
+            self.gpu_attributes = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.gpu_attributes)
+            glBufferData(GL_ARRAY_BUFFER, attributes.nbytes, attributes, GL_STATIC_DRAW)
+            self.gpu_index_array = None
+            if index_array is not None:
+                self.gpu_index_array = glGenBuffers(1)
+                glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.gpu_index_array)
+                glBufferData(GL_ELEMENT_ARRAY_BUFFER, index_array.nbytes, index_array, GL_STATIC_DRAW)
+
+    def bind(self):
+        """Binds the buffers, while a VAO is bound they are attached to it"""
+        glBindBuffer(GL_ARRAY_BUFFER, self.gpu_attributes)
+        if self.gpu_index_array is not None:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.gpu_index_array)
+
+    def __del__(self):
+        if self.gpu_index_array is not None:
+            glDeleteBuffers(2, np.asarray([self.gpu_attributes, self.gpu_index_array], dtype=np.uint32))
+        elif getattr(self, 'gpu_attributes', None):
+            glDeleteBuffers(1, np.asarray([self.gpu_attributes], dtype=np.uint32))
+
+class GpuMeshRegistry:
+    """
+    Process-wide registry of mesh buffers uploaded to the GPU, shared by all meshes (and demos)
+    that use the same OBJ file with the same attributes layout and index mode.
+
+    Buffers are reference counted: `acquire` uploads them only if they aren't registered yet,
+    `release` is called when a user is deleted. Buffers without users stay on the GPU,
+    so switching back to a demo costs neither parsing nor uploading, until their total size
+    exceeds `idle_budget_bytes`, then the least recently used ones are deleted.
+
+    Example Usage:
+
+    > key = make_mesh_key('path/to/scene.obj', 'P3_T2', use_index_buffer=True)
+    > buffers = default_mesh_registry.acquire(key, lambda: GpuMeshBuffers(attributes, indices))
+    > ...
+    > default_mesh_registry.release(key)
+    """
+
+    def __init__(self, idle_budget_bytes: int = DEFAULT_IDLE_BUDGET_BYTES):
+        self.idle_budget_bytes = idle_budget_bytes
+        self.buffers = {}
+        self.refcounts = {}
+        self.idle = OrderedDict() # keys of buffers without users, in order of release
+        self.hits, self.misses = 0, 0
+
+    def __contains__(self, key):
+        return key in self.buffers
+
+    def acquire(self, key, make_buffers: Callable[[], GpuMeshBuffers]) -> GpuMeshBuffers:
+        if key in self.buffers:
+            self.hits += 1
+            self.idle.pop(key, None)
+        else:
+            self.misses += 1
+            self.buffers[key] = make_buffers()
+            self.refcounts[key] = 0
+        self.refcounts[key] += 1
+        return self.buffers[key]
+
+    def release(self, key):
+        self.refcounts[key] -= 1
+        if self.refcounts[key] == 0:
+            self.idle[key] = True
+            self.evict()
+
+    @property
+    def idle_bytes(self):
+        return sum(self.buffers[key].nbytes for key in self.idle)
+
+    def evict(self):
+        """Deletes the least recently released buffers without users until they fit into the budget"""
+        idle_bytes = self.idle_bytes
+        while idle_bytes > self.idle_budget_bytes:
+            key, _ = self.idle.popitem(last=False)
+            idle_bytes -= self.buffers[key].nbytes
+            del self.buffers[key], self.refcounts[key]
+
+    def clear_idle(self):
+        for key in list(self.idle):
+            del self.buffers[key], self.refcounts[key]
+        self.idle.clear()
+
+def make_mesh_key(obj_filepath: str, attributes_layout: str, use_index_buffer: bool) -> Tuple:
+    obj_filepath = os.path.abspath(obj_filepath)
+    # a changed file is registered anew
+    return (obj_filepath, os.stat(obj_filepath).st_mtime_ns, attributes_layout.upper(), bool(use_index_buffer))
+
+default_mesh_registry = GpuMeshRegistry()
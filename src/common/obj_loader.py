@@ -1,15 +1,32 @@
 import logging
 logger = logging.getLogger(__file__)
 
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
 import numpy as np
+import os
 import re
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, Union
 
 COMMENT_REGEXP = re.compile(r'#[^\n]*\n')
 FLOAT_REGEXP  = re.compile(r'(?:\s+(-?\d*\.?\d*(?:[Ee][+-]?\d+)?))')
 FACE_REGEXP = re.compile(
     r'^f\s+(\d+)(?:/(\d+)?)?(?:/(\d+))?\s+(\d+)(?:/(\d+)?)?(?:/(\d+))?\s+(\d+)(?:/(\d+)?)?(?:/(\d+))?(?:\s+(\d+)(?:/(\d+)?)?(?:/(\d+))?)?$')
 
+# kinds of lines recognized by the bulk parser
+LINE_OTHER, LINE_POSITION, LINE_TEXCOORD, LINE_NORMAL, LINE_FACE = range(5)
+LEADING_WHITESPACE_REGEXP = re.compile(rb'^[ \t]+', re.MULTILINE)
+SPACE, TAB, NEWLINE, CARRIAGE_RETURN, HASH, SLASH = map(ord, ' \t\n\r#/')
+IS_WHITESPACE = np.zeros(256, dtype=bool)
+IS_WHITESPACE[[SPACE, TAB, NEWLINE, CARRIAGE_RETURN]] = True
+
+# corners of a triangle or a quad that form output triangles (quads are split into two triangles)
+TRIANGLE_CORNERS = np.array([0, 1, 2], dtype=np.int64)
+QUAD_CORNERS     = np.array([0, 1, 2, 0, 2, 3], dtype=np.int64)
+
+# number of vertices gathered at once into a small contiguous buffer before copying into interleaved slots
+GATHER_BLOCK_ROWS = 2**16
+
 class ParsedWavefront:
     """
     Parses basic data from Wavefront data format (also known as .OBJ file):
@@ -23,6 +40,10 @@ class ParsedWavefront:
 
     Allows to comprise this data as interleaved NumPy arrays ready for OpenGL rendering\
 
+    Parsed data is kept as compact float32 / int32 NumPy arrays, and the interleaved arrays
+    are built once per layout and dtype, next calls with the same arguments return the same
+    (read-only) arrays
+
     Example Usage:
 
     > import obj_loader
@@ -30,26 +51,88 @@ class ParsedWavefront:
     > attributes = scene.as_numpy('P3_T2')
     > # or
     > attributes, face_indices = scene.as_numpy_indexed('N2_P2_T1')
+    > # or directly into an existing buffer (e.g. a mapped OpenGL buffer)
+    > n_bytes = len(scene.parsed['positions_indices']) * make_interleaved_dtype('P3_T2').itemsize
+    > attributes, face_indices = scene.as_numpy_indexed('P3_T2', out=bytearray(n_bytes))
 
     """
 
-    def __init__(self, wavefront_filepath: str, parse=True, verbose=True):
+    def __init__(self, wavefront_filepath: str, parse=True, verbose=True, workers=1):
         """wavefront_filepath: should be an existing file path to a Wavefront file
            parse: if True the long parsing operation will be run immediately
-           verbose: if False, nothing will be logged in console"""
+           verbose: if False, nothing will be logged in console
+           workers: if more than 1, the file is split into this many byte ranges,
+                    which are parsed in parallel processes"""
         self.filepath = wavefront_filepath
         self.verbose = verbose
+        self.workers = workers
+        self.materialized = {}
         if parse:
             self.parse()
 
     def parse(self):
         """Run the long executing parsing operation"""
-        with open(self.filepath, 'r') as f:
+        self.materialized = {}
+        if self.workers > 1:
+            self.parsed = ParsedWavefront.parse_file_parallel(self.filepath, self.workers, self.verbose)
+            return
+        with open(self.filepath, 'rb') as f:
             self.parsed = ParsedWavefront.parse_string(f.read(), self.verbose)
 
     @staticmethod
-    def parse_string(wavefront_str: str, verbose:bool = True) -> Dict[str, Any]:
-        """Extracts data from a multiline string that follows Wavefront (OBJ) file format"""
+    def parse_string(wavefront_str: Union[str, bytes], verbose:bool = True) -> Dict[str, Any]:
+        """Extracts data from a multiline string that follows Wavefront (OBJ) file format.
+           Instead of walking the lines one by one, the lines are classified by their prefix
+           all at once, and all lines of one kind ('v', 'vt', 'vn', 'f') are converted to NumPy
+           as one block"""
+        blocks = parse_blocks(wavefront_str, verbose=verbose)
+        blocks['unique_vertices'], blocks['face_vertex_indices'] = deduplicate_vertices(blocks['corners'])
+        return make_parse_result(**blocks)
+
+    @staticmethod
+    def parse_file_parallel(wavefront_filepath: str, workers: int, verbose:bool = True) -> Dict[str, Any]:
+        """Same as `parse_string` for the file content, but the file is split on line boundaries
+           into `workers` byte ranges, which are parsed in a pool of processes.
+           Parsed arrays are passed back through shared memory, then they are concatenated,
+           and vertices deduplicated by each process are merged in order of the byte ranges,
+           so the result is identical to the serial parsing"""
+        byte_ranges = split_file_into_line_ranges(wavefront_filepath, workers)
+        first_lines_indices = count_lines_before_ranges(wavefront_filepath, byte_ranges) if verbose else [0] * len(byte_ranges)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(parse_byte_range,
+                [wavefront_filepath] * len(byte_ranges), byte_ranges, first_lines_indices, [verbose] * len(byte_ranges))
+            chunks = [receive_shared_arrays(chunk) for chunk in chunks]
+
+        faces_forms = {(chunk['has_texcoords'], chunk['has_normals']) for chunk in chunks if chunk['corners'].size > 0}
+        if len(faces_forms) > 1:
+            raise Exception('Inconsistent faces definition')
+        has_texcoords, has_normals = faces_forms.pop() if faces_forms else (False, False)
+
+        # each chunk numbered its vertices from 0, number them globally in order of the first occurrence
+        n_corner_columns = 1 + has_texcoords + has_normals
+        unique_vertices, chunks_vertex_indices = deduplicate_vertices(
+            concatenate_rows([chunk['unique_vertices'] for chunk in chunks], dtype=np.int32, min_columns=n_corner_columns))
+        chunks_vertex_offsets = np.cumsum([0] + [len(chunk['unique_vertices']) for chunk in chunks])
+        face_vertex_indices = np.concatenate([
+            chunks_vertex_indices[offset + chunk['face_vertex_indices']]
+            for offset, chunk in zip(chunks_vertex_offsets, chunks)])
+
+        return make_parse_result(
+            positions     = concatenate_rows([chunk['positions'] for chunk in chunks], dtype=np.float32),
+            texcoords     = concatenate_rows([chunk['texcoords'] for chunk in chunks], dtype=np.float32),
+            normals       = concatenate_rows([chunk['normals'] for chunk in chunks], dtype=np.float32),
+            corners       = concatenate_rows([chunk['corners'] for chunk in chunks], dtype=np.int32, min_columns=n_corner_columns),
+            has_texcoords = has_texcoords,
+            has_normals   = has_normals,
+            unique_vertices     = unique_vertices,
+            face_vertex_indices = face_vertex_indices,
+        )
+
+    @staticmethod
+    def parse_string_per_line(wavefront_str: str, verbose:bool = True) -> Dict[str, Any]:
+        """Extracts data from a multiline string that follows Wavefront (OBJ) file format,
+           line by line. It's a slow reference implementation of `parse_string`,
+           kept to validate and benchmark the bulk parser"""
 
         # data for glDrawArrays
         positions_parsed, positions_array_indices = [], []
@@ -93,7 +176,7 @@ class ParsedWavefront:
                         n = int(n) - 1
                         normals_array_indices.append(n)
                     vertex_index = vertex_index_cache.get((v,t,n))
-                    if not vertex_index:
+                    if vertex_index is None:
                         nonlocal current_vertex_index
                         vertex_index_cache[(v,t,n)] = vertex_index = current_vertex_index
                         current_vertex_index += 1
@@ -124,7 +207,7 @@ class ParsedWavefront:
         # or for all faces the attribute is undifined (missing)
         if len(texcoords_array_indices) not in [0, len(positions_array_indices)] or \
            len(normals_array_indices)   not in [0, len(positions_array_indices)]:
-            raise Exception(f'Inconsistent faces definition"')
+            raise Exception('Inconsistent faces definition')
 
         parse_result = dict(
             positions_parsed        = positions_parsed,
@@ -140,33 +223,47 @@ class ParsedWavefront:
         )
         return parse_result
 
-    def as_numpy(self, attributes_layout: str, dtype=np.float32) -> np.array:
-        """Returns an interleaved NumPy array of attributes (OpenGL ARRAY_BUFFER used with glDrawArrays) """
+    def as_numpy(self, attributes_layout: str, dtype=np.float32, out=None) -> np.array:
+        """Returns an interleaved NumPy array of attributes (OpenGL ARRAY_BUFFER used with glDrawArrays)
+           out: optional writable buffer (NumPy array, bytearray, memoryview, ctypes array, ...),
+                the attributes are written into its beginning and the returned array is its view"""
+        key = ('arrays', attributes_layout.upper(), np.dtype(dtype).str)
+        if out is None and key in self.materialized:
+            return self.materialized[key]
+
         p = self.parsed['positions_array_indices']
         t = self.parsed['texcoords_array_indices']
         n = self.parsed['normals_array_indices']
         interleaved_data = self.__make_interleaved_attributes(
             attributes_layout, dtype=dtype,
-            positions_indices=p, texcoords_indices=t, normals_indices=n)
+            positions_indices=p, texcoords_indices=t, normals_indices=n, out=out)
 
+        if out is None:
+            self.materialized[key] = make_read_only(interleaved_data)
         return interleaved_data
 
-    def as_numpy_indexed(self, attributes_layout: str, attrib_dtype=np.float32, indices_dtype=np.uint32) -> Tuple[np.array, np.array]:
+    def as_numpy_indexed(self, attributes_layout: str, attrib_dtype=np.float32, indices_dtype=np.uint32, out=None) -> Tuple[np.array, np.array]:
         """Returns an interleaved NumPy array of attributes (OpenGL ARRAY_BUFFER) and respective
            index array which indexes the attributes array to define triangles (OpenGL ELEMENT_ARRAY_BUFFER)
-           This pair can be used for OpenGL glDrawElements call"""
+           This pair can be used for OpenGL glDrawElements call
+           out: optional writable buffer for the attributes, same as in `as_numpy`"""
+        key = ('indexed', attributes_layout.upper(), np.dtype(attrib_dtype).str, np.dtype(indices_dtype).str)
+        if out is None and key in self.materialized:
+            return self.materialized[key]
+
         p = self.parsed['positions_indices']
         t = self.parsed['texcoords_indices']
         n = self.parsed['normals_indices']
         interleaved_data = self.__make_interleaved_attributes(
             attributes_layout, dtype=attrib_dtype,
-            positions_indices=p, texcoords_indices=t, normals_indices=n)
-
-        face_vertex_indices = np.array(self.parsed['face_vertex_indices'], dtype=indices_dtype)
+            positions_indices=p, texcoords_indices=t, normals_indices=n, out=out)
 
+        face_vertex_indices = np.asarray(self.parsed['face_vertex_indices'], dtype=indices_dtype)
+        if out is None:
+            self.materialized[key] = make_read_only(interleaved_data), make_read_only(face_vertex_indices)
         return interleaved_data, face_vertex_indices
 
-    def __make_interleaved_attributes(self, attributes_layout, positions_indices, texcoords_indices, normals_indices, dtype) -> np.array:
+    def __make_interleaved_attributes(self, attributes_layout, positions_indices, texcoords_indices, normals_indices, dtype, out=None) -> np.array:
         """
         Parsed vertex attributes arrays may contain a different number of entries
         Given `positions_indices`, `texcoords_indices`, `normals_indices` of the same length,
@@ -190,28 +287,368 @@ class ParsedWavefront:
                     P2       N1        T1
                     P3       N0        T1
                     P0       N1        T0
+
+        The array is allocated once (or `out` is used) as a structured array of `make_interleaved_dtype`,
+        and each attribute is gathered directly into its slot of the vertices,
+        missing coordinates are filled with zeros. Returns a 2D view of it, one row per vertex
         """
         parts = parse_interleaved_layout(attributes_layout)
 
-        attributes = {}
-        if positions_indices:
-            attributes['P'] = np.array(self.parsed['positions_parsed'])[np.array(positions_indices)]
-        if texcoords_indices:
-            attributes['T'] = np.array(self.parsed['texcoords_parsed'])[np.array(texcoords_indices)]
-        if normals_indices:
-            attributes['N'] = np.array(self.parsed['normals_parsed'])[np.array(normals_indices)]
-
-        arrays_to_stack = []
+        attributes = {
+            'P': (self.parsed['positions_parsed'], positions_indices),
+            'T': (self.parsed['texcoords_parsed'], texcoords_indices),
+            'N': (self.parsed['normals_parsed'], normals_indices),
+        }
+        for key, _ in parts:
+            assert len(attributes[key][1]) > 0, f"OBJ file doesn't include data for part '{key}'"
+
+        vertex_dtype = make_interleaved_dtype(attributes_layout, dtype)
+        n_vertices = len(attributes[parts[0][0]][1])
+        interleaved_data = make_interleaved_buffer(vertex_dtype, n_vertices, out)
         for key, used_coordinates in parts:
-            assert key in attributes, f"OBJ file doesn't include data for part '{key}'"
-            extension_width = max(0,used_coordinates-attributes[key].shape[1])
-            if extension_width:
-                attributes[key] = np.pad(attributes[key], ((0,0),(0,extension_width)))
-            arrays_to_stack.append(attributes[key][:, :used_coordinates])
-
-        interleaved_data = np.ascontiguousarray(
-            np.hstack(arrays_to_stack), dtype=dtype)
-        return interleaved_data
+            values, indices = attributes[key]
+            values = np.asarray(values, dtype=dtype)
+            n_copied_coordinates = min(used_coordinates, values.shape[1])
+            gather_rows(values[:, :n_copied_coordinates], np.asarray(indices), interleaved_data[key][:, :n_copied_coordinates])
+            interleaved_data[key][:, n_copied_coordinates:] = 0
+
+        return interleaved_data.view(dtype).reshape(n_vertices, -1)
+
+def parse_blocks(wavefront_str: Union[str, bytes], first_line_idx: int = 0, verbose: bool = True) -> Dict[str, Any]:
+    """Parses vertex attributes and faces of a Wavefront string into NumPy arrays:
+       positions, texcoords, normals - 2D float32 arrays with one row per 'v'/'vt'/'vn' line
+       corners - 2D int32 array with zero-based (position, [texcoord], [normal]) indices for each
+                 corner of triangulated faces, the present columns are given by has_texcoords, has_normals
+       first_line_idx: index of the first line in the whole file, used for logging"""
+    if isinstance(wavefront_str, str):
+        wavefront_str = wavefront_str.encode()
+    if wavefront_str.startswith((b' ', b'\t')) or b'\n ' in wavefront_str or b'\n\t' in wavefront_str:
+        wavefront_str = LEADING_WHITESPACE_REGEXP.sub(b'', wavefront_str)
+
+    # a writable copy, prefixes of lines and comments are replaced with spaces in-place
+    chars = np.frombuffer(wavefront_str, dtype=np.uint8).copy()
+    line_starts, line_lengths, line_kinds = classify_lines(chars)
+    blank_out_comments(chars, line_starts, line_kinds)
+    chars[line_starts[line_kinds != LINE_OTHER]] = SPACE
+    chars[line_starts[(line_kinds == LINE_TEXCOORD) | (line_kinds == LINE_NORMAL)] + 1] = SPACE
+
+    if verbose:
+        first_chars = np.append(chars, np.uint8(NEWLINE))[line_starts]
+        is_unsupported = (line_kinds == LINE_OTHER) & (first_chars != HASH) & \
+            (first_chars != NEWLINE) & (first_chars != CARRIAGE_RETURN)
+        for line_idx in np.flatnonzero(is_unsupported):
+            logger.warning(f'Unsupported line {first_line_idx+line_idx+1}:"{line_text(chars, line_starts, line_lengths, line_idx)}"')
+
+    chars_line_kinds = np.repeat(line_kinds, line_lengths)
+    def lines_block(kind):
+        return chars[chars_line_kinds == kind], first_line_idx + np.flatnonzero(line_kinds == kind)
+
+    corners, has_texcoords, has_normals = parse_face_block(*lines_block(LINE_FACE), verbose=verbose)
+    return dict(
+        positions     = parse_float_block(*lines_block(LINE_POSITION), verbose=verbose),
+        texcoords     = parse_float_block(*lines_block(LINE_TEXCOORD), verbose=verbose),
+        normals       = parse_float_block(*lines_block(LINE_NORMAL), verbose=verbose),
+        corners       = corners,
+        has_texcoords = has_texcoords,
+        has_normals   = has_normals,
+    )
+
+def deduplicate_vertices(corners: np.array) -> Tuple[np.array, np.array]:
+    """A vertex is unique per (position, texcoord, normal) triplet, given a 2D array with such
+       triplets for all faces corners, returns an array of unique vertices, numbered in order of
+       their first occurrence in faces, and index of the unique vertex for each corner"""
+    if corners.shape[0] == 0:
+        return corners.copy(), np.zeros(0, dtype=np.int32)
+
+    # pack each triplet into one 64-bit integer if it fits, it's much faster to sort than rows
+    corners_offsets = corners.min(axis=0).astype(np.int64)
+    columns_extents = corners.max(axis=0) - corners_offsets + 1
+    if np.prod(columns_extents.astype(np.float64)) < 2**63:
+        columns_strides = np.cumprod(np.append(columns_extents[1:], 1)[::-1])[::-1]
+        keys = np.zeros(corners.shape[0], dtype=np.int64)
+        for column_idx in range(corners.shape[1]):
+            keys += (corners[:, column_idx] - corners_offsets[column_idx]) * columns_strides[column_idx]
+        _, first_occurrence, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        _, first_occurrence, inverse = np.unique(corners, axis=0, return_index=True, return_inverse=True)
+
+    # np.unique numbers vertices in sorted order, renumber them in order of the first occurrence
+    occurrence_order = np.argsort(first_occurrence)
+    vertex_index = np.empty(occurrence_order.size, dtype=np.int32 if occurrence_order.size < 2**31 else np.int64)
+    vertex_index[occurrence_order] = np.arange(occurrence_order.size)
+    return corners[first_occurrence[occurrence_order]], vertex_index[inverse.ravel()]
+
+def make_parse_result(positions, texcoords, normals, corners, has_texcoords, has_normals,
+                      unique_vertices, face_vertex_indices) -> Dict[str, Any]:
+    """Converts parsed arrays into the dictionary returned by `ParsedWavefront.parse_string`.
+       Attributes are 2D float32 arrays, indices are 1D int32 arrays (views of columns of
+       `corners` and `unique_vertices`, absent attributes have empty index arrays)"""
+    def column(array, is_present, column_idx):
+        return array[:, column_idx] if is_present else np.zeros(0, dtype=array.dtype)
+
+    parse_result = dict(
+        # data for glDrawArrays
+        positions_parsed        = positions,
+        positions_array_indices = column(corners, True, 0),
+        texcoords_parsed        = texcoords,
+        texcoords_array_indices = column(corners, has_texcoords, 1),
+        normals_parsed          = normals,
+        normals_array_indices   = column(corners, has_normals, -1),
+        # data for glDrawElements
+        positions_indices       = column(unique_vertices, True, 0),
+        texcoords_indices       = column(unique_vertices, has_texcoords, 1),
+        normals_indices         = column(unique_vertices, has_normals, -1),
+        face_vertex_indices     = face_vertex_indices,
+    )
+    return parse_result
+
+def make_interleaved_dtype(attributes_layout: str, dtype=np.float32) -> np.dtype:
+    """Structured dtype of one interleaved vertex, with a field per part of the layout
+       Example: 'P3_T2' -> [('P', float32, (3,)), ('T', float32, (2,))], itemsize is the stride in bytes"""
+    return np.dtype([(key, dtype, (used_coordinates,)) for key, used_coordinates in parse_interleaved_layout(attributes_layout)])
+
+def make_interleaved_buffer(vertex_dtype: np.dtype, n_vertices: int, out=None) -> np.array:
+    """Allocates a structured array of `n_vertices`, or views the beginning of the writable buffer `out` as one"""
+    if out is None:
+        return np.empty(n_vertices, dtype=vertex_dtype)
+    out_bytes = np.frombuffer(out, dtype=np.uint8)
+    n_bytes = n_vertices * vertex_dtype.itemsize
+    if not out_bytes.flags.writeable:
+        raise Exception('Output buffer is read-only')
+    if out_bytes.size < n_bytes:
+        raise Exception(f'Output buffer of {out_bytes.size} bytes is too small for {n_vertices} vertices of {vertex_dtype.itemsize} bytes')
+    return out_bytes[:n_bytes].view(vertex_dtype)
+
+def gather_rows(source: np.array, indices: np.array, out: np.array):
+    """out[i] = source[indices[i]] for a strided `out` (a field of interleaved vertices).
+       np.take into a non-contiguous `out` makes a temporary copy of the whole output,
+       so rows are gathered in blocks into a small contiguous buffer that stays in cache"""
+    if indices.size > 0 and (indices.max() >= len(source) or indices.min() < 0):
+        raise IndexError(f'Vertex attribute index is out of bounds for {len(source)} values')
+    block = np.empty((min(indices.size, GATHER_BLOCK_ROWS),) + out.shape[1:], dtype=out.dtype)
+    for start in range(0, indices.size, GATHER_BLOCK_ROWS):
+        block_indices = indices[start:start + GATHER_BLOCK_ROWS]
+        # bounds are checked above, a mode other than 'raise' avoids buffering
+        np.take(source, block_indices, axis=0, out=block[:block_indices.size], mode='wrap')
+        out[start:start + block_indices.size] = block[:block_indices.size]
+
+def make_read_only(array: np.array) -> np.array:
+    array.flags.writeable = False
+    return array
+
+def concatenate_rows(arrays: List[np.array], dtype, min_columns: int = 0) -> np.array:
+    """Concatenates 2D arrays along rows, arrays with less columns are padded with zeros"""
+    arrays = [array for array in arrays if array.size > 0]
+    n_columns = max([min_columns] + [array.shape[1] for array in arrays])
+    if len(arrays) == 0:
+        return np.zeros((0, n_columns), dtype=dtype)
+    return np.concatenate([np.pad(array, ((0, 0), (0, n_columns - array.shape[1]))) for array in arrays]).astype(dtype, copy=False)
+
+def split_file_into_line_ranges(filepath: str, n_ranges: int) -> List[Tuple[int, int]]:
+    """Splits a file into at most `n_ranges` byte ranges of similar size,
+       each range starts at the beginning of a line"""
+    file_size = os.path.getsize(filepath)
+    boundaries = [0]
+    with open(filepath, 'rb') as f:
+        for range_idx in range(1, n_ranges):
+            f.seek(max(boundaries[-1], file_size * range_idx // n_ranges))
+            f.readline()
+            boundaries.append(min(f.tell(), file_size))
+    boundaries.append(file_size)
+    return [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+
+def count_lines_before_ranges(filepath: str, byte_ranges: List[Tuple[int, int]]) -> List[int]:
+    counts, n_lines = [], 0
+    with open(filepath, 'rb') as f:
+        for start, end in byte_ranges:
+            counts.append(n_lines)
+            n_lines += f.read(end - start).count(b'\n')
+    return counts
+
+def parse_byte_range(filepath: str, byte_range: Tuple[int, int], first_line_idx: int, verbose: bool) -> Dict[str, Any]:
+    """Runs in a worker process: parses a range of the file and deduplicates its vertices,
+       the arrays are returned as shared memory blocks"""
+    start, end = byte_range
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        wavefront_str = f.read(end - start)
+    blocks = parse_blocks(wavefront_str, first_line_idx=first_line_idx, verbose=verbose)
+    blocks['unique_vertices'], blocks['face_vertex_indices'] = deduplicate_vertices(blocks['corners'])
+    return {key: share_array(value) if isinstance(value, np.ndarray) else value for key, value in blocks.items()}
+
+def share_array(array: np.array) -> Tuple[str, Tuple[int, ...], str]:
+    """Copies an array into a new shared memory block, returns a (name, shape, dtype) descriptor.
+       The receiver is responsible for releasing the block with `receive_shared_arrays`"""
+    if array.nbytes == 0:
+        return None, array.shape, array.dtype.str
+    memory = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+    memory.close()
+    # the block outlives this process, otherwise the process' resource tracker removes it on exit
+    resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory.name, array.shape, array.dtype.str
+
+def receive_shared_arrays(shared: Dict[str, Any]) -> Dict[str, Any]:
+    """Copies arrays out of shared memory blocks created by `share_array`, and releases the blocks"""
+    received = {}
+    for key, value in shared.items():
+        if not isinstance(value, tuple):
+            received[key] = value
+            continue
+        name, shape, dtype = value
+        if name is None:
+            received[key] = np.zeros(shape, dtype=dtype)
+            continue
+        memory = shared_memory.SharedMemory(name=name)
+        received[key] = np.ndarray(shape, dtype=dtype, buffer=memory.buf).copy()
+        memory.close()
+        memory.unlink()
+    return received
+
+def classify_lines(chars: np.array) -> Tuple[np.array, np.array, np.array]:
+    """Splits an array of characters into lines. Returns index of the first character of each line,
+       number of characters in each line (including the trailing '\\n'), and kind of each line (LINE_*)"""
+    line_starts = np.concatenate(([0], np.flatnonzero(chars == NEWLINE) + 1))
+    line_lengths = np.diff(np.append(line_starts, chars.size))
+
+    def chars_at(offset):
+        # characters past the end of the array are treated as newlines
+        positions = line_starts + offset
+        is_inside = positions < chars.size
+        line_chars = np.full(positions.size, NEWLINE, dtype=np.uint8)
+        line_chars[is_inside] = chars[positions[is_inside]]
+        return line_chars
+    first, second, third = (chars_at(i) for i in range(3))
+    is_second_blank = (second == SPACE) | (second == TAB)
+    is_third_blank  = (third == SPACE) | (third == TAB)
+
+    line_kinds = np.full(line_starts.size, LINE_OTHER, dtype=np.uint8)
+    line_kinds[(first == ord('v')) & is_second_blank] = LINE_POSITION
+    line_kinds[(first == ord('v')) & (second == ord('t')) & is_third_blank] = LINE_TEXCOORD
+    line_kinds[(first == ord('v')) & (second == ord('n')) & is_third_blank] = LINE_NORMAL
+    line_kinds[(first == ord('f')) & is_second_blank] = LINE_FACE
+    return line_starts, line_lengths, line_kinds
+
+def blank_out_comments(chars: np.array, line_starts: np.array, line_kinds: np.array):
+    """Replaces with spaces all comments that follow data on the same line, e.g. 'v 1 2 3 # comment'.
+       Lines that are comments entirely are of LINE_OTHER kind, and they are skipped anyway"""
+    hashes = np.flatnonzero(chars == HASH)
+    hashes_lines = np.searchsorted(line_starts, hashes, side='right') - 1
+    hashes, hashes_lines = hashes[line_kinds[hashes_lines] != LINE_OTHER], hashes_lines[line_kinds[hashes_lines] != LINE_OTHER]
+    if hashes.size == 0:
+        return
+    comments_ends = np.append(line_starts[1:] - 1, chars.size)[hashes_lines]
+    is_comment = np.zeros(chars.size + 1, dtype=np.int32)
+    np.add.at(is_comment, hashes, 1)
+    np.add.at(is_comment, comments_ends, -1)
+    chars[np.cumsum(is_comment[:-1]) > 0] = SPACE
+
+def line_text(chars: np.array, line_starts: np.array, line_lengths: np.array, line_idx: int) -> str:
+    line_start = line_starts[line_idx]
+    return chars[line_start:line_start + line_lengths[line_idx]].tobytes().decode(errors='replace').strip()
+
+def count_tokens_per_line(block: np.array, n_lines: int) -> np.array:
+    """Given characters of lines, each ending with '\\n' (except maybe the last one),
+       returns how many whitespace separated tokens each line has"""
+    is_space = IS_WHITESPACE[block]
+    is_token_start = ~is_space
+    is_token_start[1:] &= is_space[:-1]
+    # a token belongs to the line of the number of newlines before it
+    lines_ids = np.searchsorted(np.flatnonzero(block == NEWLINE), np.flatnonzero(is_token_start))
+    return np.bincount(lines_ids, minlength=n_lines)
+
+def parse_float_block(block: np.array, lines_indices: np.array, verbose: bool = True) -> np.array:
+    """Converts characters of vertex attribute lines (with the 'v'/'vt'/'vn' prefix blanked out)
+       into a 2D float32 array. Lines with less values than the longest line are padded with zeros"""
+    if lines_indices.size == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    values = np.fromstring(block.tobytes(), dtype=np.float32, sep=' ')
+    n_values_per_line = count_tokens_per_line(block, lines_indices.size)
+    n_columns = n_values_per_line.max()
+    if values.size == lines_indices.size * n_columns:
+        return values.reshape(-1, n_columns)
+
+    if verbose: logger.warning(f'Vertex attributes on lines {lines_indices[0]+1}-{lines_indices[-1]+1} have different number of values, padding with zeros')
+    attributes = np.zeros((lines_indices.size, n_columns), dtype=np.float32)
+    attributes[np.arange(n_columns) < n_values_per_line[:, None]] = values
+    return attributes
+
+def drop_bad_corner_faces(block: np.array, lines_indices: np.array, verbose: bool = True) -> Tuple[np.array, np.array]:
+    """Removes face lines with a corner that isn't 'a/b/c', 'a//c', 'a/b', 'a/' or 'a' (e.g. 'a/b/' or 'a//'),
+       they are skipped like in `ParsedWavefront.parse_string_per_line`"""
+    is_space = IS_WHITESPACE[block]
+    is_token_start = ~is_space
+    is_token_start[1:] &= is_space[:-1]
+    is_slash = block == SLASH
+    slash_token_ids = np.cumsum(is_token_start)[is_slash] - 1
+    n_slashes_per_token = np.bincount(slash_token_ids, minlength=np.count_nonzero(is_token_start))
+    # more than two slashes, or the second one ends the token
+    is_token_bad = n_slashes_per_token > 2
+    is_token_end = np.append(is_space[1:], True)
+    is_token_bad[slash_token_ids[is_token_end[is_slash] & (n_slashes_per_token[slash_token_ids] == 2)]] = True
+    if not is_token_bad.any():
+        return block, lines_indices
+
+    newlines = np.flatnonzero(block == NEWLINE)
+    is_line_bad = np.zeros(lines_indices.size, dtype=bool)
+    is_line_bad[np.searchsorted(newlines, np.flatnonzero(is_token_start)[is_token_bad])] = True
+    if verbose:
+        for line_idx in lines_indices[is_line_bad]:
+            logger.warning(f'Bad face on line {line_idx+1}, corners should be in the form a/b/c, a//c, a/b or a')
+    chars_line_ids = np.searchsorted(newlines, np.arange(block.size))
+    return block[~is_line_bad[chars_line_ids]], lines_indices[~is_line_bad]
+
+def parse_face_block(block: np.array, lines_indices: np.array, verbose: bool = True) -> Tuple[np.array, bool, bool]:
+    """Converts characters of face lines (with the 'f' prefix blanked out) into zero-based indices of
+       positions, texture coordinates and normals for each corner of the triangulated faces.
+       Each vertex of all faces should be in the same form: 'a/b/c', 'a//c', 'a/b', or 'a',
+       returns a 2D array with only present attributes columns, and whether texcoords and normals are present"""
+    if lines_indices.size == 0:
+        return np.zeros((0, 1), dtype=np.int32), False, False
+
+    n_corners_per_face = count_tokens_per_line(block, lines_indices.size)
+    n_corners = n_corners_per_face.sum()
+
+    block_bytes = block.tobytes()
+    first_corner = block_bytes.split(maxsplit=1)[0].decode()
+    corner_parts = first_corner.split('/')
+    has_texcoords = len(corner_parts) > 1 and corner_parts[1] != ''
+    has_normals = len(corner_parts) > 2
+    n_columns = 1 + has_texcoords + has_normals
+    indices = None
+    if block_bytes.count(b'/') == n_corners * first_corner.count('/') and \
+       block_bytes.count(b'//') == n_corners * first_corner.count('//'):
+        indices = np.fromstring(block_bytes.replace(b'/', b' '), dtype=np.int32, sep=' ')
+    if indices is None or indices.size != n_corners * n_columns:
+        # faces with a bad corner (e.g. 'a/b/') are skipped like in the reference parser, the rest should be consistent
+        good_block, good_lines_indices = drop_bad_corner_faces(block, lines_indices, verbose)
+        if good_lines_indices.size == lines_indices.size:
+            raise Exception('Inconsistent faces definition')
+        return parse_face_block(good_block, good_lines_indices, verbose)
+    if indices.size > 0 and indices.min() < 1:
+        # relative indices would have to be resolved against the attributes defined before each face
+        bad_line_idx = lines_indices[np.searchsorted(np.cumsum(n_corners_per_face * n_columns), np.argmax(indices < 1), side='right')]
+        raise Exception(f'Face on line {bad_line_idx+1} has a negative or zero index, only absolute indices are supported')
+    indices = indices.reshape(-1, n_columns) - 1
+
+    # only triangles and quads are supported
+    is_valid_face = (n_corners_per_face == 3) | (n_corners_per_face == 4)
+    if not is_valid_face.all():
+        if verbose:
+            for line_idx in lines_indices[~is_valid_face]:
+                logger.warning(f'Bad face on line {line_idx+1}, only triangles and quads are supported')
+        indices = indices[np.repeat(is_valid_face, n_corners_per_face)]
+        n_corners_per_face = n_corners_per_face[is_valid_face]
+
+    # split quads into two triangles, keeping the order of faces
+    is_quad = n_corners_per_face == 4
+    face_first_corner = np.cumsum(n_corners_per_face) - n_corners_per_face
+    n_output_corners = np.where(is_quad, QUAD_CORNERS.size, TRIANGLE_CORNERS.size)
+    output_face = np.repeat(np.arange(n_corners_per_face.size), n_output_corners)
+    output_corner_in_face = np.arange(output_face.size) - np.repeat(np.cumsum(n_output_corners) - n_output_corners, n_output_corners)
+    output_corner_in_face = QUAD_CORNERS[output_corner_in_face] # triangles corners are a prefix of quad corners
+    indices = indices[face_first_corner[output_face] + output_corner_in_face]
+    return indices, has_texcoords, has_normals
 
 def parse_interleaved_layout(layout_str: str) -> List[Tuple[str, int]]:
     """ Parses the layout string into an array of tokens
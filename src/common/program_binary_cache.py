@@ -0,0 +1,159 @@
+import logging
+logger = logging.getLogger(__file__)
+
+from OpenGL.GL import *
+from OpenGL.error import GLError
+from typing import Optional
+import numpy as np
+import hashlib
+import os
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'programs'))
+DEFAULT_MAX_SIZE_BYTES = 64 * 2**20 # 64 MiB
+
+class ProgramBinaryCache:
+    """
+    Persistent on-disk cache of linked program binaries (glGetProgramBinary / glProgramBinary),
+    so that a program is compiled and linked from GLSL once, and next loads only upload the binary.
+
+    An entry is keyed by the hash of the sources (with the injected defines), the fragment output variable
+    and the GL vendor, renderer and version strings, since a binary is valid only for the driver that made it.
+    The driver may still reject a binary (e.g. after an update that kept the version string),
+    then the entry is deleted and the program is compiled from sources.
+    Without driver support (GL_NUM_PROGRAM_BINARY_FORMATS is 0, e.g. Mesa with MESA_SHADER_CACHE_DISABLE)
+    the cache does nothing.
+    When the total size of the cache exceeds `max_size_bytes`, the least recently used entries are deleted.
+
+    Example Usage:
+
+    > cache = ProgramBinaryCache()
+    > key = cache.make_key(vertex_shader_code, fragment_shader_code, b'out_color')
+    > shader_program = cache.load_program(key)
+    > if shader_program is None:
+    >     shader_program = glCreateProgram()
+    >     ... # attach shaders
+    >     cache.prepare_program(shader_program)
+    >     glLinkProgram(shader_program)
+    >     cache.store_program(key, shader_program)
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.driver_id = None # needs a current GL context, queried on the first use
+        self.is_supported = None
+        self.hits, self.misses, self.rejected = 0, 0, 0
+
+    def query_driver(self):
+        if self.driver_id is None:
+            self.driver_id = '|'.join(glGetString(name).decode(errors='replace') for name in (GL_VENDOR, GL_RENDERER, GL_VERSION))
+            self.is_supported = bool(glGetProgramBinary) and glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+    def make_key(self, vertex_shader_code: str, fragment_shader_code: str, out_variable: bytes) -> str:
+        self.query_driver()
+        key = hashlib.blake2b(digest_size=16)
+        for part in (vertex_shader_code, fragment_shader_code, out_variable.decode(), self.driver_id):
+            key.update(part.encode())
+            key.update(b'\0')
+        return key.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.bin')
+
+    def load_program(self, key) -> Optional[int]:
+        """Returns a linked program made from the cached binary, None if there is no valid entry"""
+        if not self.is_supported:
+            return None
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                binary_format = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+                binary = np.frombuffer(f.read(), dtype=np.uint8)
+        except (OSError, IndexError):
+            self.misses += 1
+            return None
+
+        shader_program = glCreateProgram()
+        try:
+            glProgramBinary(shader_program, binary_format, binary, binary.size)
+            is_linked = glGetProgramiv(shader_program, GL_LINK_STATUS)
+        except GLError:
+            is_linked = False
+        if not is_linked:
+            # made by another driver build or corrupted, will be overwritten
+            logger.info(f'Program binary {key} was rejected by the driver, compiling from sources')
+            glDeleteProgram(shader_program)
+            self.remove_entry(key)
+            self.rejected += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        os.utime(path) # mark as recently used
+        return shader_program
+
+    def prepare_program(self, shader_program):
+        """Should be called before linking a program that will be stored"""
+        if self.is_supported:
+            glProgramParameteri(shader_program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+
+    def store_program(self, key, shader_program):
+        if not self.is_supported:
+            return
+        length = glGetProgramiv(shader_program, GL_PROGRAM_BINARY_LENGTH)
+        if length <= 0:
+            return
+        binary = np.empty(length, dtype=np.uint8)
+        written_length = np.zeros(1, dtype=np.int32)
+        binary_format = np.zeros(1, dtype=np.uint32)
+        glGetProgramBinary(shader_program, length, written_length, binary_format, binary)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.entry_path(key)
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'wb') as f:
+                f.write(binary_format.astype('<u4').tobytes())
+                f.write(binary[:written_length[0]].tobytes())
+            os.replace(temporary_path, path)
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Can't write program binary {key}: {e}")
+
+    def entries(self):
+        """Returns a list of (key, size in bytes, last use time) of all cached entries"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.bin'):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, filename))
+            entries.append((filename[:-len('.bin')], stat.st_size, stat.st_mtime))
+        return entries
+
+    @property
+    def size_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits into `max_size_bytes`"""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            self.remove_entry(key)
+            total_size -= size
+
+    def remove_entry(self, key):
+        try:
+            os.remove(self.entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            self.remove_entry(key)
+
+default_program_binary_cache = ProgramBinaryCache()
@@ -0,0 +1,102 @@
+from .gpu_shader import GpuShader, GpuShaderStage, load_shader_code
+from .glsl_preprocessor import ShaderSource
+from .program_binary_cache import ProgramBinaryCache, default_program_binary_cache
+from typing import Dict, List
+import weakref
+import os
+
+class ShaderPool:
+    """
+    Shares linked programs and compiled shader objects among all users.
+
+    A program is keyed by its GLSL sources with the includes resolved (files are read, so different paths
+    to the same code match), the defines and the fragment output variable.
+    Users of the same key get the same GpuShader, a shader object (e.g. a vertex shader of several programs)
+    is compiled once. Both are reference counted by Python: a program is deleted once the last user drops it,
+    and a shader object once the last program that uses it is deleted.
+    With `binary_cache` (ProgramBinaryCache), programs that aren't alive are loaded from the binaries
+    stored on disk before, and only the ones without a valid binary are compiled.
+
+    As the key has the resolved sources, a program is built anew exactly when its files or the files
+    they include change. `stale_programs` lists the alive programs whose files changed after they were built.
+
+    Programs loaded with `deferred=True` are submitted to the driver without waiting for the result,
+    so that all programs of a demo compile at once (in parallel with GL_KHR_parallel_shader_compile)
+    while the loading screen is drawn, see `BaseDemo.load_programs`.
+
+    As programs are shared, users should set the uniforms they depend on before drawing,
+    `GpuShader.set` skips the values that the program already has.
+
+    Example Usage:
+
+    > pool = ShaderPool()
+    > shader = pool.load('../common/shaders/transform_vert.glsl', '../common/shaders/color_frag.glsl', out_variable=b'out_color')
+    > pool.load('../common/shaders/transform_vert.glsl', '../common/shaders/color_frag.glsl', out_variable=b'out_color') is shader
+    True
+    """
+
+    def __init__(self, binary_cache: ProgramBinaryCache = None):
+        self.binary_cache = binary_cache
+        self.programs = weakref.WeakValueDictionary() # (sources, defines, out variable) -> GpuShader
+        self.stages = weakref.WeakValueDictionary() # (shader type, source) -> GpuShaderStage
+        self.compiles, self.links, self.binary_loads = 0, 0, 0
+        self.program_hits, self.stage_hits = 0, 0
+        self.time_saved_sec = 0.0 # compiling and linking that reused programs and shader objects didn't repeat
+
+    def load(self, vertex_shader_code: str, fragment_shader_code: str, out_variable: bytes,
+             defines: Dict[str, object] = None, deferred=False) -> GpuShader:
+        """Same arguments as GpuShader, returns the shared program.
+           A `deferred` program may still be compiling (see `GpuShader.is_ready`),
+           a program submitted as deferred before is finished, if this load isn't deferred"""
+        vertex_shader_code = load_shader_code(vertex_shader_code, 'vertex')
+        fragment_shader_code = load_shader_code(fragment_shader_code, 'fragment')
+        key = (vertex_shader_code.code, fragment_shader_code.code, defines_key(defines), out_variable)
+        shader = self.programs.get(key)
+        if shader is not None:
+            self.program_hits += 1
+            self.time_saved_sec += shader.build_time_sec
+            if not deferred:
+                shader.finish()
+            return shader
+
+        shader = GpuShader(vertex_shader_code, fragment_shader_code, out_variable, defines,
+                           compile_stage=self.load_stage, binary_cache=self.binary_cache, deferred=deferred)
+        if shader.is_from_binary:
+            self.binary_loads += 1
+        else:
+            self.links += 1
+        self.programs[key] = shader
+        return shader
+
+    def load_stage(self, shader_type, shader_source: ShaderSource) -> GpuShaderStage:
+        key = (shader_type, shader_source.code)
+        stage = self.stages.get(key)
+        if stage is not None:
+            self.stage_hits += 1
+            self.time_saved_sec += stage.compile_time_sec
+            return stage
+
+        self.compiles += 1
+        stage = GpuShaderStage(shader_type, shader_source)
+        self.stages[key] = stage
+        return stage
+
+    def programs_using(self, filepath: str) -> List[GpuShader]:
+        """Alive programs built from the file, directly or through includes"""
+        filepath = os.path.abspath(filepath)
+        return [shader for shader in list(self.programs.values()) if filepath in shader.source_mtimes]
+
+    def stale_programs(self) -> List[GpuShader]:
+        """Alive programs with a changed source file, their users should load them again to get the new code
+           (the old program stays in use until then, the new one gets a different key)"""
+        return [shader for shader in list(self.programs.values()) if shader.is_stale]
+
+    def counters(self) -> Dict[str, float]:
+        """Current values of the counters, to report the difference over some period (e.g. a demo load)"""
+        return dict(compiles=self.compiles, links=self.links, binary_loads=self.binary_loads, program_hits=self.program_hits,
+                    stage_hits=self.stage_hits, time_saved_sec=self.time_saved_sec)
+
+def defines_key(defines: Dict[str, object] = None):
+    return tuple(sorted((name, str(value)) for name, value in (defines or {}).items()))
+
+default_shader_pool = ShaderPool(binary_cache=default_program_binary_cache)
@@ -0,0 +1,68 @@
+from .gpu_shader import GpuShader
+from .shader_pool import ShaderPool, default_shader_pool, defines_key
+from collections import deque
+from typing import Dict, List
+
+class ShaderVariants:
+    """
+    Variants of one program that differ by compile-time defines (e.g. a loop bound the compiler can unroll),
+    injected after the #version line. A shader should define the defaults under `#ifndef NAME`.
+
+    A variant is compiled on the first `get` and kept while the ShaderVariants is alive,
+    so switching back to it doesn't compile again. Variants that are likely to be needed next
+    can be queued with `warm_up`, then `warm_up_next` compiles one of them. It's called once per frame
+    on the render thread (GL objects are made on the thread of the context), so the queue
+    is spread over several frames instead of a hitch on the switch. Warmed up variants are deferred
+    (see `ShaderPool.load`): with GL_KHR_parallel_shader_compile the frame doesn't wait for the compiler,
+    and a variant that isn't finished yet is finished on its first `use`.
+
+    Example Usage:
+
+    > variants = ShaderVariants('vert.glsl', 'frag.glsl', out_variable=b'out_color')
+    > shader = variants.get({'N_CONVERGENCE_STEPS': 80})
+    > variants.warm_up([{'N_CONVERGENCE_STEPS': n} for n in (40, 160)])
+    > ...
+    > variants.warm_up_next() # every frame
+    """
+
+    def __init__(self, vertex_shader_code: str, fragment_shader_code: str, out_variable: bytes,
+                 shader_pool: ShaderPool = default_shader_pool):
+        self.vertex_shader_code = vertex_shader_code
+        self.fragment_shader_code = fragment_shader_code
+        self.out_variable = out_variable
+        self.shader_pool = shader_pool
+        self.variants = {} # defines key -> GpuShader
+        self.pending = deque() # defines to warm up
+        self.compiled_on_demand, self.compiled_ahead = 0, 0
+
+    def __contains__(self, defines: Dict[str, object]):
+        return defines_key(defines) in self.variants
+
+    def get(self, defines: Dict[str, object] = None, deferred=False) -> GpuShader:
+        """Returns the variant, compiles it if it's used for the first time"""
+        key = defines_key(defines)
+        shader = self.variants.get(key)
+        if shader is None:
+            self.compiled_on_demand += 1
+            shader = self.variants[key] = self.load(defines, deferred)
+        return shader
+
+    def warm_up(self, defines_list: List[Dict[str, object]]):
+        """Queues variants to compile ahead of their use"""
+        for defines in defines_list:
+            if defines not in self and defines not in self.pending:
+                self.pending.append(defines)
+
+    def warm_up_next(self) -> bool:
+        """Compiles the next queued variant that isn't compiled yet, returns whether one was compiled"""
+        while self.pending:
+            defines = self.pending.popleft()
+            if defines not in self:
+                self.compiled_ahead += 1
+                self.variants[defines_key(defines)] = self.load(defines, deferred=True)
+                return True
+        return False
+
+    def load(self, defines, deferred=False):
+        return self.shader_pool.load(self.vertex_shader_code, self.fragment_shader_code, self.out_variable,
+                                     defines=defines, deferred=deferred)
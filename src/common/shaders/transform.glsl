@@ -0,0 +1,16 @@
+// Shared by the vertex shaders of the demos: model transform and the window aspect ratio
+
+uniform float u_aspect_ratio;
+uniform mat4 u_transform;
+
+// keeps the proportions when the window isn't square
+vec4 fit_aspect_ratio(vec4 position)
+{
+   position.y *= u_aspect_ratio;
+   return position;
+}
+
+vec4 transform_position(vec4 position)
+{
+   return fit_aspect_ratio(u_transform * position);
+}
@@ -5,12 +5,10 @@ in vec4 a_custom_data;
 
 out vec4 v_custom_data;
 
-uniform float u_aspect_ratio;
-uniform mat4 u_transform;
+#include "transform.glsl"
 
 void main()
 {
    v_custom_data = a_custom_data;
-   gl_Position = u_transform * a_position;
-   gl_Position.y *= u_aspect_ratio;
+   gl_Position = transform_position(a_position);
 }
\ No newline at end of file
@@ -0,0 +1,121 @@
+from .asset_loader import AssetLoader, default_asset_loader
+from .gpu_texture import GpuTexture
+from .frame_tracer import default_frame_tracer
+from concurrent.futures import Future
+from collections import OrderedDict
+from PIL.Image import Image
+from typing import List, Tuple
+import weakref
+import hashlib
+import os
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'assets'))
+DEFAULT_MAX_SIZE_BYTES = 256 * 2**20 # 256 MiB of video memory
+
+def resolve_asset_path(filepath: str) -> str:
+    """Paths are looked up in the assets directory first, so they don't depend on the working directory
+       (which is changed to the demo's directory on every demo switch), then relative to the working directory"""
+    if os.path.isabs(filepath):
+        return filepath
+    asset_filepath = os.path.join(ASSETS_DIR, filepath)
+    if os.path.exists(asset_filepath):
+        return asset_filepath
+    return os.path.abspath(filepath)
+
+class TextureCache:
+    """
+    Shares decoded images and GPU textures among all demos.
+
+    Textures are keyed by the content hash of the image file and the upload options (flip_y, store_srgb, is_1d),
+    so the same image is decoded and uploaded once, even if it's referenced by different paths,
+    and all demos get the same GpuTexture. The cache keeps the least recently used textures alive
+    until their total size exceeds `max_size_bytes`, a texture that is still used by a demo stays
+    alive until the demo releases it.
+
+    Example Usage:
+
+    > cache = TextureCache()
+    > futures = cache.prepare('crate_color.jpeg') # decoded in background, if it's not on the GPU yet
+    > ...
+    > texture = cache.load('crate_color.jpeg')    # on the render thread
+    """
+
+    def __init__(self, asset_loader: AssetLoader = default_asset_loader, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES):
+        self.asset_loader = asset_loader
+        self.max_size_bytes = max_size_bytes
+        self.textures = OrderedDict() # texture key -> GpuTexture, in order of the last use
+        self.images = weakref.WeakValueDictionary() # (content hash, flip_y) -> future of the decoded image
+        self.content_hashes = {} # (path, modification time, size) -> content hash
+        self.hits, self.misses, self.bytes_saved = 0, 0, 0
+
+    def content_hash(self, filepath: str) -> str:
+        stat = os.stat(filepath)
+        stat_key = (filepath, stat.st_mtime_ns, stat.st_size)
+        if stat_key not in self.content_hashes:
+            content_hash = hashlib.blake2b(digest_size=16)
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(2**20), b''):
+                    content_hash.update(chunk)
+            self.content_hashes[stat_key] = content_hash.hexdigest()
+        return self.content_hashes[stat_key]
+
+    def texture_key(self, filepath: str, flip_y=False, store_srgb=False, is_1d=False) -> Tuple:
+        return (self.content_hash(resolve_asset_path(filepath)), flip_y, store_srgb, is_1d)
+
+    def load_image_async(self, filepath: str, flip_y=False) -> Future:
+        """Future of the decoded image, images with the same content are decoded once"""
+        filepath = resolve_asset_path(filepath)
+        image_key = (self.content_hash(filepath), flip_y)
+        future = self.images.get(image_key)
+        if future is None:
+            future = self.images[image_key] = self.asset_loader.load_image(filepath, flip_y=flip_y)
+        return future
+
+    def load_image(self, filepath: str, flip_y=False) -> Image:
+        return self.load_image_async(filepath, flip_y).result()
+
+    def prepare(self, filepath: str, flip_y=False, store_srgb=False, is_1d=False) -> List[Future]:
+        """Starts decoding the image in background if the texture isn't cached yet,
+           returns the list of the submitted futures"""
+        if self.texture_key(filepath, flip_y, store_srgb, is_1d) in self.textures:
+            return []
+        return [self.load_image_async(filepath, flip_y)]
+
+    def load(self, filepath: str, flip_y=False, store_srgb=False, is_1d=False) -> GpuTexture:
+        """Returns the shared texture, decodes and uploads the image only if it isn't cached.
+           Should be called on the render thread"""
+        key = self.texture_key(filepath, flip_y, store_srgb, is_1d)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            self.bytes_saved += texture_size_bytes(texture)
+            self.textures.move_to_end(key)
+            return texture
+
+        self.misses += 1
+        cpu_image = self.load_image(filepath, flip_y)
+        # already flipped while decoding
+        with default_frame_tracer.scope('upload_texture'):
+            texture = self.textures[key] = GpuTexture(cpu_image, is_1d=is_1d, store_srgb=store_srgb)
+        self.evict()
+        return texture
+
+    @property
+    def size_bytes(self):
+        return sum(map(texture_size_bytes, self.textures.values()))
+
+    def evict(self):
+        """Releases the least recently used textures until the cache fits into `max_size_bytes`"""
+        total_size = self.size_bytes
+        while total_size > self.max_size_bytes and len(self.textures) > 1:
+            _, texture = self.textures.popitem(last=False)
+            total_size -= texture_size_bytes(texture)
+
+    def clear(self):
+        self.textures.clear()
+
+def texture_size_bytes(texture: GpuTexture) -> int:
+    # RGBA8 texels and the mipmap chain
+    return texture.width * texture.height * 4 * 4 // 3
+
+default_texture_cache = TextureCache()
@@ -1,4 +1,5 @@
-from .gpu_shader import GpuShader
+from .shader_pool import default_shader_pool
+from .gl_state import default_gl_state
 from ..common.defines import *
 from OpenGL.GL import *
 from typing import Tuple
@@ -25,25 +26,26 @@ class TextureDrawer:
             0], dtype=np.float32)
         scale = pyrr.Matrix44.from_scale([self.width_ndc, -self.height_ndc, 1.0], dtype=np.float32)
         self.transform = scale @ translation
-        self.shader = GpuShader(
-            '../common/shaders/transform_vert.glsl',
-            '../common/shaders/texture_frag.glsl',
-            out_variable=b'out_color')
+        self.shader = self.load_program()
 
         self.make_vertex_attributes()
 
     def attach_texture(self, texture_opengl_id, texture_opengl_unit):
-        glActiveTexture(GL_TEXTURE0 + texture_opengl_unit)
-        glBindTexture(GL_TEXTURE_2D, texture_opengl_id)
-        shader_id = self.shader.use()
-        uniform_texture = glGetUniformLocation(shader_id, "u_texture")
-        glUniform1i(uniform_texture, texture_opengl_unit)
+        default_gl_state.bind_texture(GL_TEXTURE_2D, texture_opengl_id, texture_opengl_unit)
         self.gl_texture = texture_opengl_id
         self.gl_texture_unit = texture_opengl_unit
 
+    @staticmethod
+    def load_program(shader_pool=default_shader_pool, deferred=False):
+        """The program shared by all drawers, demos may submit it in `load_programs`"""
+        return shader_pool.load(
+            '../common/shaders/transform_vert.glsl',
+            '../common/shaders/texture_frag.glsl',
+            out_variable=b'out_color', deferred=deferred)
+
     def make_vertex_attributes(self):
         self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
 
         # interleaved attributes
         attributes = np.array((
@@ -85,24 +87,22 @@ class TextureDrawer:
             stride,
             ctypes.c_void_p(3*float_nbytes))
 
-        glBindVertexArray(0)
+        default_gl_state.bind_vertex_array(0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
 
     def render(self, aspect_ratio):
         assert self.gl_texture is not None
 
-        shader_id = self.shader.use()
-        uniform_aspect = glGetUniformLocation(shader_id, "u_aspect_ratio")
-        glUniform1f(uniform_aspect, aspect_ratio)
-
-        uniform_transform = glGetUniformLocation(shader_id, "u_transform")
-        glUniformMatrix4fv(uniform_transform, 1, GL_FALSE, self.transform)
+        self.shader.use()
+        # the program is shared with other drawers
+        self.shader.set_many({'u_aspect_ratio': aspect_ratio, 'u_transform': self.transform, 'u_texture': self.gl_texture_unit})
 
-        glBindVertexArray(self.vao)
+        default_gl_state.bind_vertex_array(self.vao)
         glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
 
     def __del__(self):
         glDeleteVertexArrays(1, np.asarray([self.vao], dtype=np.uint32))
+        default_gl_state.forget_vertex_array(self.vao)
         glDeleteBuffers(1, np.asarray([self.gl_attributes], dtype=np.uint32))
         del self.shader
         del self.vao, self.gl_attributes
@@ -1,8 +1,10 @@
 import glfw
 import sys
 
-def glfw_create_window(window_name, window_size=(512, 512)):
+def glfw_create_window(window_name, window_size=(512, 512), debug_context=False):
     width, height = window_size
+    # some drivers report GL_KHR_debug messages only in a debug context
+    glfw.window_hint(glfw.OPENGL_DEBUG_CONTEXT, debug_context)
     window = glfw.create_window(width, height, window_name, monitor=None, share=None)
 
     # Configure window to work with OpenGL version 3.3
@@ -70,6 +72,19 @@ def glfw_set_window_callbacks(window, window_size_callback):
     if window_size_callback is not None:
         glfw.set_window_size_callback(window, window_size_callback)
 
+def glfw_add_event_callback(window, event_callback):
+    # calls `event_callback()` on the other events that may change what the window shows: cursor movement,
+    # text input, focus, the window being exposed or its framebuffer resized,
+    # after the callbacks already set for them (e.g. by imgui)
+    for set_callback in [glfw.set_cursor_pos_callback, glfw.set_cursor_enter_callback, glfw.set_char_callback,
+                         glfw.set_window_focus_callback, glfw.set_window_refresh_callback, glfw.set_framebuffer_size_callback]:
+        previous_callback = set_callback(window, None)
+        def chained_callback(*args, previous_callback=previous_callback):
+            if previous_callback is not None:
+                previous_callback(*args)
+            event_callback()
+        set_callback(window, chained_callback)
+
 
 
 
@@ -0,0 +1,112 @@
+from .common.gl_state import default_gl_state
+from .common.gpu_profiler import default_gpu_profiler
+from OpenGL.GL import *
+from typing import Dict, List
+import numpy as np
+import traceback
+import time
+
+PERCENTILES = (50, 95, 99)
+# regressions are looked for in these (timing, statistic) of every demo, the load time depends on
+# the state of the program binary and the mesh caches, so it's reported only
+COMPARED_METRICS = [('frame_ms', 'p50'), ('frame_ms', 'p95'), ('gpu_ms', 'p50'), ('gpu_ms', 'p95')]
+
+class DemosBenchmark:
+    """
+    Measures every demo of a headless DemosLoader (see `DemosLoader.load` with a framebuffer):
+    the load time (from submitting the assets and the programs to the loaded demo), then after `warm_up_frames`
+    the wall time of `n_frames` frames (`render_frame` and the UI, finished with glFinish in place of the swap),
+    and the GPU time of `render_frame` from timer queries.
+    Frames get the time of a 60 fps clock, so every run draws the same frames.
+
+    Example Usage:
+
+    > benchmark = DemosBenchmark(loader, warm_up_frames=20, n_frames=200)
+    > report = benchmark.run()
+    > report['demos']['L01_7_julia']['frame_ms']
+    {'p50': 1.9, 'p95': 2.4, 'p99': 3.1, 'mean': 2.0}
+    > regressions = compare_reports(report, baseline, threshold=0.1)
+    """
+
+    def __init__(self, loader, warm_up_frames: int = 20, n_frames: int = 200, fps: float = 60.0):
+        self.loader = loader
+        self.warm_up_frames = warm_up_frames
+        self.n_frames = n_frames
+        self.fps = fps
+
+    def run(self, demo_ids: List[str] = None) -> Dict:
+        all_demo_ids = [demo_id for demo_id, _ in self.loader.demos]
+        unknown_demo_ids = set(demo_ids or []) - set(all_demo_ids)
+        if unknown_demo_ids:
+            raise Exception(f'Unknown demos: {", ".join(sorted(unknown_demo_ids))}')
+        width, height = self.loader.framebuffer.size
+        report = dict(renderer=glGetString(GL_RENDERER).decode(), size=[width, height],
+                      warm_up_frames=self.warm_up_frames, frames=self.n_frames, demos={})
+        for demo_idx, demo_id in enumerate(all_demo_ids):
+            if demo_ids and demo_id not in demo_ids:
+                continue
+            try:
+                report['demos'][demo_id] = self.measure_demo(demo_idx)
+            except Exception as e:
+                # e.g. missing assets, the other demos are still measured
+                traceback.print_exc()
+                report['demos'][demo_id] = dict(error=f'{type(e).__name__}: {e}')
+            finally:
+                demo = self.loader.demos[demo_idx][1]
+                if demo.is_loaded:
+                    demo.unload()
+                default_gl_state.invalidate()
+        return report
+
+    def measure_demo(self, demo_idx: int) -> Dict:
+        loader = self.loader
+        width, height = loader.framebuffer.size
+        loader.current_demo_idx = demo_idx
+        start_sec = time.perf_counter()
+        loader.load_current_demo(None)
+        loader.finish_loading_current_demo(None)
+        glFinish()
+        load_ms = (time.perf_counter() - start_sec) * 1000
+
+        profiler = default_gpu_profiler
+        profiler.history_size = max(profiler.history_size, self.n_frames)
+        frame_times_ms = []
+        for frame_idx in range(self.warm_up_frames + self.n_frames):
+            if frame_idx == self.warm_up_frames:
+                profiler.flush()
+                profiler.clear_history()
+            start_sec = time.perf_counter()
+            loader.render_demo_frame(width, height, frame_idx / self.fps, 1 / self.fps)
+            glFinish()
+            frame_times_ms.append((time.perf_counter() - start_sec) * 1000)
+        profiler.flush()
+        gpu_times_ms = [elapsed_ms for _, elapsed_ms in profiler.history.get('render_frame', ())]
+        return dict(load_ms=load_ms, frame_ms=percentiles(frame_times_ms[self.warm_up_frames:]),
+                    gpu_ms=percentiles(gpu_times_ms) if gpu_times_ms else None)
+
+def percentiles(times_ms: List[float]) -> Dict[str, float]:
+    values = np.percentile(times_ms, PERCENTILES)
+    return dict({f'p{percentile}': float(value) for percentile, value in zip(PERCENTILES, values)},
+                mean=float(np.mean(times_ms)))
+
+def compare_reports(report: Dict, baseline: Dict, threshold: float, min_difference_ms: float = 0.05) -> List[str]:
+    """Descriptions of the regressions: metrics slower than in the baseline by more than `threshold` (0.1 is 10%)
+       and by more than `min_difference_ms` (timings of a few microseconds, e.g. the GPU time under llvmpipe
+       that draws on flush, would regress by noise), and demos that fail but didn't in the baseline.
+       Demos missing from either report aren't compared"""
+    regressions = []
+    for demo_id, baseline_result in baseline['demos'].items():
+        result = report['demos'].get(demo_id)
+        if result is None or 'error' in baseline_result:
+            continue
+        if 'error' in result:
+            regressions.append(f'{demo_id} fails: {result["error"]}')
+            continue
+        for timing, statistic in COMPARED_METRICS:
+            if not result.get(timing) or not baseline_result.get(timing):
+                continue # no timer queries
+            value_ms, baseline_ms = result[timing][statistic], baseline_result[timing][statistic]
+            if value_ms > baseline_ms * (1 + threshold) and value_ms - baseline_ms > min_difference_ms:
+                regressions.append(f'{demo_id} {timing} {statistic}: {value_ms:.2f} ms, '
+                                   f'baseline {baseline_ms:.2f} ms (+{value_ms - baseline_ms:.2f} ms)')
+    return regressions
@@ -3,12 +3,29 @@ import time
 import sys, os
 from .common.window import *
 from .common.defines import *
+from .common.asset_loader import default_asset_loader, loading_progress, DEFAULT_BUDGET_BYTES
+from .common.texture_cache import default_texture_cache
+from .common.gpu_shader import default_uniform_stats
+from .common.gl_state import default_gl_state
+from .common.gpu_profiler import default_gpu_profiler
+from .common.frame_tracer import default_frame_tracer
+from .common.frame_capture import FrameCapture, PngSequenceSink, EncoderPipeSink, DEFAULT_CAPTURE_DIR
+from .common.shader_pool import default_shader_pool
 from OpenGL.GL import *
 import inspect
+import glob
 
 import imgui
 import imgui.integrations.glfw
 
+# imgui shows the effect of an input a frame or two later (a released button, a moved window),
+# a demo that isn't animated is redrawn this many frames after an event
+N_FRAMES_AFTER_EVENT = 3
+# the progress bar of the loading screen is redrawn this often
+LOADING_REFRESH_SEC = 1 / 60
+# an idle loop wakes up this often without events, e.g. to see a redraw requested from another thread
+IDLE_TIMEOUT_SEC = 0.5
+
 
 class ImguiWrapper:
     def __init__(self, glfw_window, initialize_gui=True):
@@ -20,23 +37,72 @@ class ImguiWrapper:
             io.font_global_scale *= 1.3
         self.gui_initialized = initialize_gui
         self.gui_enabled = True
+        # the GPU profiler panel is expanded and the profiler enabled, its stats need every frame
+        self.is_profiler_shown = False
 
     def toggle_gui(self):
         self.gui_enabled = not self.gui_enabled
+        self.is_profiler_shown = False
 
-    def render_ui(self, other_demo, current_polygon_mode, *args):
+    def render_ui(self, other_demo, current_polygon_mode, *args, frame_capture=None):
         if self.gui_initialized and self.gui_enabled:
             # setting polygon mode to fill, otherwise imgui is rendered 
             # with lines/points as well as the demos
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            default_gl_state.set_polygon_mode(GL_FILL)
 
             imgui.new_frame()
             other_demo.render_ui(*args)
+            self.render_stats_ui(frame_capture)
+            self.render_profiler_ui()
             imgui.render()
-            self.imgui_impl.render(imgui.get_draw_data())
+            with default_gpu_profiler.scope('ui'):
+                self.imgui_impl.render(imgui.get_draw_data())
             imgui.end_frame()
+            # the renderer binds its own program, vertex array and font texture
+            default_gl_state.invalidate()
+
+            default_gl_state.set_polygon_mode(current_polygon_mode)
+
+    def render_stats_ui(self, frame_capture=None):
+        stats = default_uniform_stats
+        imgui.begin('Stats', flags=imgui.WINDOW_NO_COLLAPSE | imgui.WINDOW_ALWAYS_AUTO_RESIZE)
+        imgui.text(f'Uniform uploads: {stats.frame_issued} issued, {stats.frame_skipped} skipped')
+        for kind, (issued, skipped) in default_gl_state.frame_counts().items():
+            imgui.text(f'GL {kind} changes: {issued} issued, {skipped} redundant skipped')
+        if frame_capture is not None and frame_capture.is_capturing:
+            imgui.text('Capturing: ' + ', '.join(f'{value} {name}' for name, value in frame_capture.counters().items()))
+        imgui.end()
+
+    def render_profiler_ui(self):
+        profiler = default_gpu_profiler
+        imgui.set_next_window_collapsed(True, condition=imgui.FIRST_USE_EVER)
+        expanded, _ = imgui.begin('GPU Profiler', flags=imgui.WINDOW_ALWAYS_AUTO_RESIZE)
+        self.is_profiler_shown = expanded and profiler.is_enabled
+        if expanded:
+            _, profiler.is_enabled = imgui.checkbox('Enabled', profiler.is_enabled)
+            imgui.text(f'ms over the last {profiler.history_size} frames, {profiler.n_stalls} frames waited for results')
+            for path in profiler.scope_paths:
+                stats = profiler.stats(path)
+                name = '  ' * path.count('/') + path.rsplit('/', 1)[-1]
+                imgui.text(f'{name:<28} min {stats.min_ms:6.2f}  avg {stats.avg_ms:6.2f}  max {stats.max_ms:6.2f}')
+            if imgui.button('Export JSON'):
+                print('> GPU profile exported to', profiler.export_json())
+        imgui.end()
+
+    def render_loading_ui(self, demo_id, progress):
+        if self.gui_initialized and self.gui_enabled:
+            default_gl_state.set_polygon_mode(GL_FILL)
 
-            glPolygonMode(GL_FRONT_AND_BACK, current_polygon_mode)
+            imgui.new_frame()
+            imgui.set_next_window_position(0, 0, condition=imgui.ALWAYS)
+            imgui.begin('Loading', flags=imgui.WINDOW_NO_COLLAPSE | imgui.WINDOW_ALWAYS_AUTO_RESIZE)
+            imgui.text(f'Loading {demo_id}')
+            imgui.progress_bar(progress, (300, 0), f'{progress*100:.0f}%')
+            imgui.end()
+            imgui.render()
+            self.imgui_impl.render(imgui.get_draw_data())
+            imgui.end_frame()
+            default_gl_state.invalidate()
 
     def process_inputs(self):
         if self.gui_initialized:
@@ -53,12 +119,50 @@ class ImguiWrapper:
 # A wrapper class to import all separate demos
 # and render them in one window with convenient switching between demos
 class DemosLoader:
-    def __init__(self):
+    def __init__(self, prefetch_budget_bytes=DEFAULT_BUDGET_BYTES, use_program_cache=True, trace_dump_sec=10.0,
+                 capture_dir=DEFAULT_CAPTURE_DIR, capture_encoder=None, max_fps=60.0):
         self.register_all_demos()
 
         self.windowed_position = None
         self.windowed_size = None
 
+        # futures of assets being loaded in background for the current demo,
+        # None when the demo isn't waiting for them
+        self.loading_assets = None
+        # programs submitted by the current demo, held until its `load` gets them from the pool
+        self.loading_programs = None
+
+        # CPU-side assets of the previous and the next demos are loaded ahead, while the current demo runs,
+        # until the loaded data exceeds the budget
+        default_asset_loader.budget_bytes = prefetch_budget_bytes
+        self.prefetch_enabled = prefetch_budget_bytes > 0
+        self.prefetched_demo_indices = set()
+        self.neighbours_prefetched = False
+        # demo switch latencies (from the key press to the loaded demo), with and without prefetched assets
+        self.switch_latencies_sec = {True: [], False: []}
+        self.loading_start_sec, self.is_loading_prefetched = None, False
+        # shader pool counters when the demo started loading
+        self.shader_counters_at_load = None
+        if not use_program_cache:
+            default_shader_pool.binary_cache = None
+
+        # drawn into in the headless mode, in place of the window
+        self.framebuffer = None
+        # T collects the CPU trace of the next `trace_dump_sec` seconds and exports it,
+        # the start of the collection while it runs
+        self.trace_dump_sec = trace_dump_sec
+        self.trace_start_sec = None
+        # C starts and stops recording the frames: PNG files, or a video if the encoder command is given
+        # (see EncoderPipeSink.DEFAULT_COMMAND)
+        self.frame_capture = FrameCapture()
+        self.capture_dir = capture_dir
+        self.capture_encoder = capture_encoder
+        # the render loop waits for events instead of spinning: demos that aren't animated are redrawn only
+        # after events and invalidations, animated ones at most `max_fps` times per second (0 for no cap)
+        self.max_fps = max_fps
+        self.n_frames_to_redraw = 0
+        self.last_frame_sec = 0.0
+
         self.draw_modes = [GL_FILL, GL_LINE, GL_POINT]
         self.current_polygon_draw_mode_idx = 0
         self.current_polygon_draw_mode = self.draw_modes[self.current_polygon_draw_mode_idx]
@@ -71,17 +175,122 @@ class DemosLoader:
     def current_demo_id(self):
         return self.demos[self.current_demo_idx][0]
 
+    def demo_directory(self, demo_idx):
+        demo_fp = inspect.getfile(self.demos[demo_idx][1].__class__)
+        return os.path.dirname(demo_fp)
+
     def load_current_demo(self, window):
-        demo_fp = inspect.getfile(self.current_demo.__class__)
-        demo_dp = os.path.dirname(demo_fp)
+        demo_dp = self.demo_directory(self.current_demo_idx)
         print('> Loading demo', demo_dp)
+        self.loading_start_sec = time.perf_counter()
+        self.shader_counters_at_load = default_shader_pool.counters()
+        self.is_loading_prefetched = self.current_demo_idx in self.prefetched_demo_indices
+        self.prefetched_demo_indices.discard(self.current_demo_idx)
+        self.neighbours_prefetched = False
         os.chdir(demo_dp)
-        self.current_demo.load(window)
-        self.windowed_position = glfw.get_window_pos(window)
-        self.windowed_size = glfw.get_window_size(window)
-        self.window_size_callback(window, *self.windowed_size)
+        # CPU-side work runs in background, the render loop finishes loading when it's done
+        with default_frame_tracer.scope('submit_assets'):
+            self.loading_assets = self.current_demo.load_assets(default_asset_loader)
+        # compiling too, status queries go after all programs are submitted
+        with default_frame_tracer.scope('submit_programs'):
+            self.loading_programs = self.current_demo.load_programs(default_shader_pool)
+
+    def finish_loading_current_demo(self, window):
+        with default_frame_tracer.scope('wait_assets'):
+            for future in self.loading_assets:
+                future.result() # re-raises exceptions of the background loading
+        with default_frame_tracer.scope('finish_programs'):
+            for shader in self.loading_programs:
+                shader.finish() # raises compile and link errors
+        self.loading_assets = None
+        with default_frame_tracer.scope('demo_load'):
+            self.current_demo.load(window)
+        self.loading_programs = None
+        # demos create their objects with direct GL calls
+        default_gl_state.invalidate()
+        # scopes of the previous demo
+        default_gpu_profiler.clear_history()
+        if window is not None:
+            self.windowed_position = glfw.get_window_pos(window)
+            self.windowed_size = glfw.get_window_size(window)
+            self.window_size_callback(window, *self.windowed_size)
+        else:
+            self.window_size_callback(None, *self.framebuffer.size)
+
+        latency_sec = time.perf_counter() - self.loading_start_sec
+        self.switch_latencies_sec[self.is_loading_prefetched].append(latency_sec)
+        print(f'> Loaded demo {self.current_demo_id} in {latency_sec*1000:.0f} ms' +
+            (' (prefetched)' if self.is_loading_prefetched else ''))
+        self.print_shader_stats()
+
+    def print_shader_stats(self):
+        counters = {name: value - self.shader_counters_at_load[name] for name, value in default_shader_pool.counters().items()}
+        if counters['links'] or counters['binary_loads'] or counters['program_hits']:
+            print(f'> Shaders: {counters["compiles"]} compiled, {counters["links"]} linked, '
+                  f'{counters["binary_loads"]} loaded from binaries, '
+                  f'{counters["stage_hits"] + counters["program_hits"]} reused, '
+                  f'{counters["time_saved_sec"]*1000:.1f} ms of compiling and linking saved')
+
+    def prefetch_neighbours(self):
+        """Starts loading CPU-side assets (meshes, images, shader sources) of the demos that
+           `[` and `]` switch to, so that the switch only uploads them to the GPU"""
+        self.neighbours_prefetched = True
+        if not self.prefetch_enabled:
+            return
+        current_dp = os.getcwd()
+        try:
+            for offset in [1, -1]:
+                demo_idx = (self.current_demo_idx + offset) % len(self.demos)
+                if demo_idx == self.current_demo_idx or demo_idx in self.prefetched_demo_indices:
+                    continue
+                if default_asset_loader.is_over_budget:
+                    break
+                demo_dp = self.demo_directory(demo_idx)
+                # demos use paths relative to their directory
+                os.chdir(demo_dp)
+                with default_asset_loader.prefetching():
+                    self.demos[demo_idx][1].load_assets(default_asset_loader)
+                    for shader_filepath in glob.glob(os.path.join(demo_dp, '*.glsl')):
+                        default_asset_loader.load_text(shader_filepath)
+                self.prefetched_demo_indices.add(demo_idx)
+        finally:
+            os.chdir(current_dp)
+
+    def print_loading_stats(self):
+        loader = default_asset_loader
+        print(f'> Asset requests: {loader.prefetch_hits} prefetched, {loader.cache_hits} loaded before, '
+              f'{loader.misses} loaded on demand, prefetch hit rate {loader.prefetch_hit_rate*100:.0f}%')
+        textures = default_texture_cache
+        print(f'> Textures: {textures.hits} shared, {textures.misses} uploaded, {textures.bytes_saved / 2**20:.1f} MiB of uploads saved')
+        uniforms = default_uniform_stats
+        if uniforms.n_frames:
+            print(f'> Uniform uploads per frame: {uniforms.total_issued / uniforms.n_frames:.1f} issued, '
+                  f'{uniforms.total_skipped / uniforms.n_frames:.1f} skipped')
+        state = default_gl_state
+        if state.n_frames:
+            print(f'> GL state changes per frame: {sum(state.total_issued.values()) / state.n_frames:.1f} issued, '
+                  f'{sum(state.total_skipped.values()) / state.n_frames:.1f} redundant skipped')
+        for is_prefetched, latencies_sec in self.switch_latencies_sec.items():
+            if latencies_sec:
+                print(f'> Demo switch latency {"with" if is_prefetched else "without"} prefetch: '
+                      f'mean {sum(latencies_sec)/len(latencies_sec)*1000:.0f} ms, max {max(latencies_sec)*1000:.0f} ms, {len(latencies_sec)} switches')
+
+    def invalidate(self):
+        """Redraws a demo that isn't animated, after an input or window event"""
+        self.n_frames_to_redraw = N_FRAMES_AFTER_EVENT
+
+    @property
+    def is_measuring(self) -> bool:
+        """A capture, a trace or the GPU profiler stats need every frame, also of demos that aren't animated"""
+        return self.frame_capture.is_capturing or self.trace_start_sec is not None or self.gui_wrapper.is_profiler_shown
+
+    @property
+    def is_redraw_needed(self) -> bool:
+        demo = self.current_demo
+        return demo.is_loaded and (demo.is_animated or demo.needs_redraw or self.n_frames_to_redraw > 0 or self.is_measuring)
 
     def keyboard_callback(self, window, key, scancode, action, mods):
+        self.invalidate()
         changed_demo = False
         running_demo = self.current_demo
         if (key, action) == (glfw.KEY_LEFT_BRACKET, glfw.PRESS):
@@ -106,28 +315,69 @@ class DemosLoader:
             self.current_polygon_draw_mode_idx += 1
             self.current_polygon_draw_mode_idx %= len(self.draw_modes)
             self.current_polygon_draw_mode = self.draw_modes[self.current_polygon_draw_mode_idx]
-            glLineWidth(2)
+            default_gl_state.set_line_width(2)
             glPointSize(2)
-            glPolygonMode(GL_FRONT_AND_BACK, self.current_polygon_draw_mode)
+            default_gl_state.set_polygon_mode(self.current_polygon_draw_mode)
         if (key, action) == (glfw.KEY_O, glfw.PRESS):
             self.gui_wrapper.toggle_gui()
+        if (key, action) == (glfw.KEY_C, glfw.PRESS):
+            self.toggle_capture()
+        if (key, action) == (glfw.KEY_T, glfw.PRESS):
+            self.toggle_trace()
 
         if changed_demo:
-            running_demo.unload()
+            with default_frame_tracer.scope('demo_unload'):
+                running_demo.unload()
+            default_gl_state.invalidate()
             self.current_demo_idx = (self.current_demo_idx + len(self.demos)) % (len(self.demos))
             self.load_current_demo(window)
-        else:
+        elif self.current_demo.is_loaded:
             self.current_demo.keyboard_callback(window, key, scancode, action, mods)
 
+    def toggle_trace(self):
+        """Starts collecting the trace, every frame is drawn meanwhile, or exports the collected one"""
+        if self.trace_start_sec is None:
+            self.trace_start_sec = time.perf_counter()
+            print(f'> Tracing for {self.trace_dump_sec:.0f} s (T exports it sooner)')
+            return
+        last_sec = time.perf_counter() - self.trace_start_sec
+        self.trace_start_sec = None
+        path = default_frame_tracer.export_chrome_trace(last_sec=last_sec)
+        print(f'> Trace of the last {last_sec:.1f} s exported to {path}')
+
+    def toggle_capture(self):
+        capture = self.frame_capture
+        if capture.is_capturing:
+            capture.stop()
+            print('> Capture stopped: ' + ', '.join(f'{value} {name}' for name, value in capture.counters().items()))
+            return
+        name = f'{self.current_demo_id}_{time.strftime("%Y%m%d_%H%M%S")}'
+        if self.capture_encoder:
+            output = os.path.join(self.capture_dir, name + '.mp4')
+            os.makedirs(self.capture_dir, exist_ok=True)
+            sink = EncoderPipeSink(output, command=self.capture_encoder)
+        else:
+            output = os.path.join(self.capture_dir, name)
+            sink = PngSequenceSink(output)
+        capture.start(sink)
+        print('> Capturing to', output)
+
+    # demos receive input only once they are loaded
     def mouse_button_callback(self, window, button, action, mods):
-        self.current_demo.mouse_button_callback(window, button, action, mods)
+        self.invalidate()
+        if self.current_demo.is_loaded:
+            self.current_demo.mouse_button_callback(window, button, action, mods)
 
     def mouse_scroll_callback(self, window, xoffset, yoffset):
-        self.current_demo.mouse_scroll_callback(window, xoffset, yoffset)
+        self.invalidate()
+        if self.current_demo.is_loaded:
+            self.current_demo.mouse_scroll_callback(window, xoffset, yoffset)
 
     def window_size_callback(self, window, width, height):
+        self.invalidate()
         glViewport(0, 0, width, height)
-        self.current_demo.window_size_callback(window, width, height)
+        if self.current_demo.is_loaded:
+            self.current_demo.window_size_callback(window, width, height)
 
     def register_all_demos(self):
         from .L01_0_clear_color.demo          import Lecture01_ColorDemo
@@ -168,25 +418,127 @@ class DemosLoader:
     def render_loop(self, window):
         last_time_sec = float('inf')
 
+        tracer = default_frame_tracer
         # infinite render loop, until the window is requested to close
         while not glfw.window_should_close(window):
-            width, height = glfw.get_framebuffer_size(window)
-
-            global_time_sec = time.time()
-
-            current_demo = self.current_demo
-            if current_demo.is_loaded:
-                delta_time_sec = max(global_time_sec - last_time_sec, 1e-5)
-                current_demo.render_frame(width, height, global_time_sec, delta_time_sec) # draw to memory
-                self.gui_wrapper.render_ui(current_demo, current_polygon_mode=self.current_polygon_draw_mode)
-                glfw.swap_buffers(window) # flush from memory to the screen pixels
+            with tracer.scope('frame'):
+                width, height = glfw.get_framebuffer_size(window)
+
+                global_time_sec = time.time()
+
+                if self.loading_assets is not None and loading_progress(self.loading_assets + self.loading_programs) == 1.0:
+                    with tracer.scope('finish_loading'):
+                        self.finish_loading_current_demo(window)
+
+                current_demo = self.current_demo
+                if current_demo.is_loaded and not self.neighbours_prefetched:
+                    with tracer.scope('prefetch_neighbours'):
+                        self.prefetch_neighbours()
+
+                if self.is_redraw_needed:
+                    self.last_frame_sec = time.perf_counter()
+                    self.n_frames_to_redraw = max(self.n_frames_to_redraw - 1, 0)
+                    current_demo.needs_redraw = False # may be requested again while drawing
+                    delta_time_sec = max(global_time_sec - last_time_sec, 1e-5)
+                    self.render_demo_frame(width, height, global_time_sec, delta_time_sec) # draw to memory
+                    with tracer.scope('capture'):
+                        self.frame_capture.capture(width, height) # queued, read back a few frames later
+                    with tracer.scope('swap_buffers'):
+                        glfw.swap_buffers(window) # flush from memory to the screen pixels
+                    last_time_sec = global_time_sec
+                elif self.loading_assets is not None:
+                    # keep the window responsive while the assets are loading and the programs are compiling
+                    with tracer.scope('render_loading_ui'):
+                        glClearColor(0.0, 0.0, 0.0, 1.0)
+                        glClear(GL_COLOR_BUFFER_BIT)
+                        self.gui_wrapper.render_loading_ui(self.current_demo_id, loading_progress(self.loading_assets + self.loading_programs))
+                    with tracer.scope('swap_buffers'):
+                        glfw.swap_buffers(window)
+
+                with tracer.scope('wait_events'):
+                    self.wait_events(window) # handle keyboard/mouse/window events (and the demo switch)
+                with tracer.scope('process_inputs'):
+                    self.gui_wrapper.process_inputs()
+
+            if self.trace_start_sec is not None and time.perf_counter() - self.trace_start_sec >= self.trace_dump_sec:
+                self.toggle_trace()
+
+        if self.frame_capture.is_capturing:
+            self.toggle_capture()
+        self.print_loading_stats()
+
+    def wait_events(self, window):
+        """Handles the events until the next frame is due, sleeping in the meantime. While a demo is loading,
+           that's the next update of the loading screen, then the next redraw, at most `max_fps` times per second"""
+        if not self.current_demo.is_loaded:
+            glfw.wait_events_timeout(LOADING_REFRESH_SEC)
+            return
+        min_frame_interval_sec = 1 / self.max_fps if self.max_fps else 0.0
+        # the demo is unloaded when another one is switched to, the loading screen starts right away
+        while self.current_demo.is_loaded and not glfw.window_should_close(window):
+            if self.is_redraw_needed:
+                remaining_sec = self.last_frame_sec + min_frame_interval_sec - time.perf_counter()
+                if remaining_sec <= 0:
+                    glfw.poll_events()
+                    return
+                glfw.wait_events_timeout(remaining_sec) # events before the frame are handled while waiting
+            else:
+                glfw.wait_events_timeout(IDLE_TIMEOUT_SEC) # until an event invalidates the frame
+
+    def render_demo_frame(self, width, height, global_time_sec, delta_time_sec):
+        """Draws a frame of the loaded demo with the UI, into the bound framebuffer"""
+        tracer = default_frame_tracer
+        with tracer.scope('render_frame'), default_gpu_profiler.scope('render_frame'):
+            self.current_demo.render_frame(width, height, global_time_sec, delta_time_sec)
+        default_uniform_stats.end_frame()
+        default_gl_state.end_frame()
+        with tracer.scope('render_ui'):
+            self.gui_wrapper.render_ui(self.current_demo, current_polygon_mode=self.current_polygon_draw_mode,
+                                       frame_capture=self.frame_capture)
+        # reads the results of the frames the GPU has finished
+        with tracer.scope('gpu_profiler'):
+            default_gpu_profiler.end_frame()
+
+    def render_headless(self, frame_indices: range, fps: float = None, frame_capture: FrameCapture = None):
+        """Headless counterpart of `render_loop`: waits for the demo to load, draws the frames into the framebuffer.
+           With `fps` the frames get the time of a virtual clock (frame n is at n / fps seconds), so they are the same
+           on every run and drawn as fast as the GPU can, otherwise the wall time.
+           The frames are captured if `frame_capture` is started, numbered by their indices"""
+        tracer = default_frame_tracer
+        with tracer.scope('finish_loading'):
+            self.finish_loading_current_demo(None)
+        width, height = self.framebuffer.size
+        last_time_sec = float('inf')
+        start_sec = time.perf_counter()
+        for n_rendered, frame_idx in enumerate(frame_indices, start=1):
+            with tracer.scope('frame'):
+                if fps is not None:
+                    global_time_sec, delta_time_sec = frame_idx / fps, 1 / fps
+                else:
+                    global_time_sec = time.time()
+                    delta_time_sec = max(global_time_sec - last_time_sec, 1e-5)
+                self.render_demo_frame(width, height, global_time_sec, delta_time_sec)
+                if frame_capture is not None and frame_capture.is_capturing:
+                    with tracer.scope('capture'):
+                        frame_capture.capture(width, height, frame_idx) # waits only for the frames a few back
+                else:
+                    with tracer.scope('finish'):
+                        glFinish() # in place of the swap, frames don't queue up
                 last_time_sec = global_time_sec
-
-            glfw.poll_events() # handle keyboard/mouse/window events
-            self.gui_wrapper.process_inputs()
-
-
-    def load(self, window, use_gui, startup_demo_id):
+            if fps is not None and n_rendered % round(fps) == 0:
+                print(f'> Rendered {n_rendered}/{len(frame_indices)} frames, '
+                      f'{n_rendered / (time.perf_counter() - start_sec):.1f} frames/s')
+        self.print_loading_stats()
+
+    def use_framebuffer(self, framebuffer):
+        """Headless mode, demos are drawn into the framebuffer (OffscreenFramebuffer) without the UI,
+           the imgui renderer takes its input from a window"""
+        self.framebuffer = framebuffer
+        self.gui_wrapper = ImguiWrapper(None, initialize_gui=False)
+
+    def load(self, window, use_gui, startup_demo_id, framebuffer=None):
+        """`window` is None in the headless mode, then frames are drawn into the `framebuffer` (OffscreenFramebuffer)
+           and there are no input and window events"""
         # select startup demo index
         self.current_demo_idx = -1
         for idx, (demo_id, _) in enumerate(self.demos):
@@ -196,6 +548,10 @@ class DemosLoader:
             print(f'> Failed to find demo: {startup_demo_id}. Loading the first available demo.')
             self.current_demo_idx = 0
 
+        if window is None:
+            self.use_framebuffer(framebuffer)
+            self.load_current_demo(window)
+            return
         self.gui_wrapper = ImguiWrapper(window, use_gui)
         self.load_current_demo(window)
 
@@ -205,6 +561,7 @@ class DemosLoader:
             mouse_scroll_callback=self.mouse_scroll_callback)
         glfw_set_window_callbacks(window,
             window_size_callback=self.window_size_callback)
+        glfw_add_event_callback(window, self.invalidate)
 
 
 
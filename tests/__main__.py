@@ -1,5 +1,23 @@
 import unittest
 from .test_utilities import TestUtilities
+from .test_obj_loader import TestObjLoader
+from .test_mesh_cache import TestMeshCache
+from .test_asset_loader import TestAssetLoader
+from .test_mesh_registry import TestMeshRegistry
+from .test_texture_cache import TestTextureCache
+from .test_gpu_shader import TestGpuShader
+from .test_shader_pool import TestShaderPool
+from .test_program_binary_cache import TestProgramBinaryCache
+from .test_shader_variants import TestShaderVariants
+from .test_glsl_preprocessor import TestGlslPreprocessor
+from .test_shader_errors import TestShaderErrors
+from .test_gl_state import TestGlState
+from .test_gl_profiles import TestGlProfiles
+from .test_gpu_profiler import TestGpuProfiler
+from .test_frame_tracer import TestFrameTracer
+from .test_demos_benchmark import TestDemosBenchmark
+from .test_frame_capture import TestFrameCapture
+from .test_demos_loader import TestDemosLoader
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
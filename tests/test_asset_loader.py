@@ -0,0 +1,78 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+from PIL import Image
+
+from src.common.asset_loader import AssetLoader, loading_progress
+from src.common.mesh_cache import MeshCache
+from src.common.obj_loader import ParsedWavefront
+from concurrent.futures import Future
+
+QUAD_OBJ = """v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 1
+f 1/1 2/2 3/1 4/2
+"""
+
+class TestAssetLoader(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.loader = AssetLoader(max_workers=2, mesh_cache=MeshCache(os.path.join(self.temporary_dir.name, 'cache')))
+        self.working_dir = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.working_dir)
+        self.loader.shutdown()
+        self.temporary_dir.cleanup()
+
+    def test_load_mesh(self):
+        obj_path = os.path.join(self.temporary_dir.name, 'quad.obj')
+        with open(obj_path, 'w') as f:
+            f.write(QUAD_OBJ)
+        expected_attributes, expected_indices = ParsedWavefront(obj_path, verbose=False).as_numpy_indexed('P3_T2')
+        attributes, indices = self.loader.load_mesh(obj_path, 'P3_T2', use_index_buffer=True, verbose=False).result()
+        np.testing.assert_array_equal(attributes, expected_attributes)
+        np.testing.assert_array_equal(indices, expected_indices)
+
+    def test_load_image_relative_to_submission_directory(self):
+        pixels = np.arange(2*3*3, dtype=np.uint8).reshape(2, 3, 3)
+        Image.fromarray(pixels).save(os.path.join(self.temporary_dir.name, 'image.png'))
+        os.chdir(self.temporary_dir.name)
+        image = self.loader.load_image('image.png', flip_y=True)
+        os.chdir(self.working_dir)
+        np.testing.assert_array_equal(np.asarray(image.result()), pixels[::-1])
+
+    def test_loading_progress(self):
+        done, pending = Future(), Future()
+        done.set_result(None)
+        self.assertEqual(loading_progress([]), 1.0)
+        self.assertEqual(loading_progress([done, pending]), 0.5)
+        pending.set_result(None)
+        self.assertEqual(loading_progress([done, pending]), 1.0)
+
+    def test_prefetched_requests(self):
+        pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+        image_path = os.path.join(self.temporary_dir.name, 'image.png')
+        Image.fromarray(pixels).save(image_path)
+        with self.loader.prefetching():
+            prefetched = self.loader.load_image(image_path)
+        prefetched.result()
+        self.assertIs(self.loader.load_image(image_path), prefetched)
+        self.assertIs(self.loader.load_image(image_path), prefetched)
+        self.assertIsNot(self.loader.load_image(image_path, flip_y=True).result(), prefetched.result())
+        self.assertEqual((self.loader.prefetch_hits, self.loader.cache_hits, self.loader.misses), (1, 1, 1))
+        self.assertEqual(self.loader.size_bytes, 2 * pixels.nbytes)
+
+    def test_budget(self):
+        self.loader.budget_bytes = 100
+        for size in [4, 5, 6]:
+            image_path = os.path.join(self.temporary_dir.name, f'image_{size}.png')
+            Image.fromarray(np.zeros((size, size, 3), dtype=np.uint8)).save(image_path)
+            self.loader.load_image(image_path).result()
+        # only the last image fits
+        self.assertEqual(self.loader.size_bytes, 6 * 6 * 3)
+        self.assertTrue(self.loader.is_over_budget)
@@ -0,0 +1,28 @@
+import unittest
+
+from src.demos_benchmark import percentiles, compare_reports
+
+def make_report(**demos):
+    return dict(demos={demo_id: result if isinstance(result, dict) else
+                       dict(load_ms=1.0, frame_ms=percentiles([result] * 10), gpu_ms=None)
+                       for demo_id, result in demos.items()})
+
+class TestDemosBenchmark(unittest.TestCase):
+    def test_percentiles(self):
+        stats = percentiles(list(range(1, 101)))
+        self.assertAlmostEqual(stats['p50'], 50.5)
+        self.assertAlmostEqual(stats['p99'], 99.01)
+        self.assertAlmostEqual(stats['mean'], 50.5)
+
+    def test_regressions(self):
+        baseline = make_report(fast=1.0, slow=1.0, tiny=0.01, fixed=dict(error='missing asset'))
+        report = make_report(fast=1.05, slow=1.5, tiny=0.03, fixed=1.0, new=1.0)
+        regressions = compare_reports(report, baseline, threshold=0.1)
+        # p50 and p95 of the frame time, `tiny` is slower by less than min_difference_ms
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(regression.startswith('slow frame_ms') for regression in regressions))
+
+    def test_failing_demo_is_regression(self):
+        baseline = make_report(demo=1.0)
+        report = make_report(demo=dict(error='FileNotFoundError'))
+        self.assertEqual(compare_reports(report, baseline, threshold=0.1), ['demo fails: FileNotFoundError'])
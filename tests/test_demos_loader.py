@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from src import demos_loader
+from src.demos_loader import DemosLoader, ImguiWrapper, IDLE_TIMEOUT_SEC, N_FRAMES_AFTER_EVENT
+
+class TestDemosLoader(unittest.TestCase):
+    def setUp(self):
+        self.loader = DemosLoader()
+        self.loader.gui_wrapper = ImguiWrapper(None, initialize_gui=False)
+        self.glfw = mock.Mock()
+        self.glfw.window_should_close.return_value = False
+        patcher = mock.patch.object(demos_loader, 'glfw', self.glfw)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_demo(self, demo_id):
+        self.loader.current_demo_idx = [demo_id for demo_id, _ in self.loader.demos].index(demo_id)
+        self.loader.current_demo.is_loaded = True
+        self.addCleanup(setattr, self.loader.current_demo, 'is_loaded', False)
+
+    def test_static_demo_redrawn_after_event(self):
+        self.use_demo('L01_1_triangle')
+        self.assertFalse(self.loader.is_redraw_needed)
+        self.loader.invalidate()
+        self.assertEqual(self.loader.n_frames_to_redraw, N_FRAMES_AFTER_EVENT)
+        self.assertTrue(self.loader.is_redraw_needed)
+        self.loader.n_frames_to_redraw = 0
+        self.loader.current_demo.invalidate()
+        self.assertTrue(self.loader.is_redraw_needed)
+
+    def test_static_demo_redrawn_while_measuring(self):
+        self.use_demo('L01_1_triangle')
+        self.loader.frame_capture.sink = mock.Mock()
+        self.assertTrue(self.loader.is_redraw_needed)
+        self.loader.frame_capture.sink = None
+        self.loader.gui_wrapper.is_profiler_shown = True
+        self.assertTrue(self.loader.is_redraw_needed)
+        self.loader.gui_wrapper.is_profiler_shown = False
+        self.assertFalse(self.loader.is_redraw_needed)
+
+    def test_trace_collected_until_exported(self):
+        self.use_demo('L01_1_triangle')
+        with mock.patch.object(demos_loader.default_frame_tracer, 'export_chrome_trace', return_value='trace.json') as export:
+            self.loader.toggle_trace()
+            self.assertTrue(self.loader.is_redraw_needed)
+            export.assert_not_called()
+            self.loader.toggle_trace()
+        export.assert_called_once()
+        self.assertFalse(self.loader.is_redraw_needed)
+
+    def test_idle_loop_sleeps_until_event(self):
+        self.use_demo('L01_1_triangle')
+        # the second wait gets an input event
+        self.glfw.wait_events_timeout.side_effect = lambda timeout_sec: (
+            self.loader.invalidate() if self.glfw.wait_events_timeout.call_count == 2 else None)
+        self.loader.wait_events(window=None)
+        self.assertEqual([call.args for call in self.glfw.wait_events_timeout.call_args_list], [(IDLE_TIMEOUT_SEC,)] * 2)
+        self.glfw.poll_events.assert_called_once()
+
+    def test_animated_demo_waits_for_frame_rate_cap(self):
+        self.use_demo('L01_7_julia')
+        self.loader.max_fps = 50
+        self.loader.last_frame_sec = demos_loader.time.perf_counter()
+        self.loader.wait_events(window=None)
+        timeout_sec = self.glfw.wait_events_timeout.call_args_list[0].args[0]
+        self.assertTrue(0 < timeout_sec <= 1 / 50)
+        self.glfw.poll_events.assert_called_once()
+
+    def test_demo_switch_ends_wait(self):
+        self.use_demo('L01_1_triangle')
+        demo = self.loader.current_demo
+        self.glfw.wait_events_timeout.side_effect = lambda timeout_sec: setattr(demo, 'is_loaded', False)
+        self.loader.wait_events(window=None)
+        self.assertEqual(self.glfw.wait_events_timeout.call_count, 1)
+        self.glfw.poll_events.assert_not_called()
@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+
+from OpenGL.GL import GL_ALREADY_SIGNALED, GL_TIMEOUT_EXPIRED
+from src.common import frame_capture
+from src.common.frame_capture import FrameCapture, CapturedFrame
+
+class FakeSink:
+    def __init__(self):
+        self.frames = []
+        self.is_closed = False
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        self.is_closed = True
+
+class TestFrameCapture(unittest.TestCase):
+    def setUp(self):
+        self.signaled_fences = set()
+        self.n_fences = 0
+        def fence_sync(*args):
+            self.n_fences += 1
+            return self.n_fences
+        def client_wait_sync(fence, flags, timeout_ns):
+            return GL_ALREADY_SIGNALED if fence in self.signaled_fences or timeout_ns else GL_TIMEOUT_EXPIRED
+        fakes = dict(glGenBuffers=mock.Mock(side_effect=range(1, 100)), glFenceSync=fence_sync, glClientWaitSync=client_wait_sync,
+                     map_pixels=lambda buffer, size_bytes: bytes(size_bytes))
+        for name in ['glBindBuffer', 'glBufferData', 'glPixelStorei', 'glReadPixels', 'glFlush', 'glDeleteSync', 'glDeleteBuffers']:
+            fakes[name] = mock.Mock()
+        for name, fake in fakes.items():
+            patcher = mock.patch.object(frame_capture, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.capture = FrameCapture(n_buffers=2, max_queued=8)
+        self.sink = FakeSink()
+
+    def test_frames_handed_over_when_fences_signal(self):
+        self.capture.start(self.sink)
+        self.capture.capture(4, 2)
+        self.capture.capture(4, 2)
+        self.assertEqual(len(self.capture.pending), 2)
+        self.signaled_fences.update([1, 2])
+        self.capture.capture(4, 2)
+        self.assertEqual([readback.index for readback in self.capture.pending], [2])
+        self.capture.stop()
+        self.assertEqual([frame.index for frame in self.sink.frames], [0, 1, 2])
+        self.assertEqual(len(self.sink.frames[0].pixels), 4 * 2 * 4)
+        self.assertTrue(self.sink.is_closed)
+        self.assertEqual(self.capture.counters(), dict(captured=3, written=3, queued=0, dropped=0))
+
+    def test_frame_dropped_when_buffers_in_flight(self):
+        self.capture.start(self.sink)
+        for _ in range(3):
+            self.capture.capture(4, 2)
+        self.assertEqual(self.capture.n_dropped, 1)
+        self.capture.stop()
+        # the index of the dropped frame is skipped
+        self.assertEqual([frame.index for frame in self.sink.frames], [0, 1])
+
+    def test_waits_for_oldest_frame_without_drop_frames(self):
+        capture = FrameCapture(n_buffers=2, max_queued=8, drop_frames=False)
+        capture.start(self.sink)
+        for frame_idx in range(100, 105):
+            capture.capture(4, 2, frame_idx)
+        self.assertEqual(capture.n_dropped, 0)
+        self.assertEqual(len(capture.pending), 2)
+        capture.stop()
+        self.assertEqual([frame.index for frame in self.sink.frames], list(range(100, 105)))
+
+    def test_buffers_reused(self):
+        self.capture.max_queued = 16 # the worker may not run until `stop`
+        self.capture.start(self.sink)
+        for fence in range(1, 11):
+            self.capture.capture(4, 2)
+            self.signaled_fences.add(fence)
+        self.capture.stop()
+        self.assertEqual(frame_capture.glGenBuffers.call_count, 1)
+        self.assertEqual([frame.index for frame in self.sink.frames], list(range(10)))
+
+    def test_frame_array_top_row_first(self):
+        frame = CapturedFrame(0, 1, 2, bytes([0, 0, 0, 0, 255, 255, 255, 255]))
+        self.assertEqual(frame.as_array()[0, 0].tolist(), [255, 255, 255, 255])
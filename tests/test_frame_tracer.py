@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from src.common import frame_tracer
+from src.common.frame_tracer import FrameTracer
+
+class TestFrameTracer(unittest.TestCase):
+    def setUp(self):
+        self.now_ns = 0
+        def perf_counter_ns():
+            self.now_ns += 1000 # 1 us per call
+            return self.now_ns
+        patcher = mock.patch.object(frame_tracer, 'perf_counter_ns', side_effect=perf_counter_ns)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tracer = FrameTracer(capacity=4)
+
+    def test_nested_scopes(self):
+        with self.tracer.scope('frame'):
+            with self.tracer.scope('render_frame'):
+                pass
+        events = self.tracer.recent_events()
+        self.assertEqual([name for name, *_ in events], ['frame', 'render_frame'])
+        (_, _, frame_start, frame_end), (_, _, inner_start, inner_end) = events
+        self.assertTrue(frame_start < inner_start <= inner_end < frame_end)
+
+    def test_ring_overwrites_oldest(self):
+        for name in 'abcdef':
+            with self.tracer.scope(name):
+                pass
+        self.assertEqual([name for name, *_ in self.tracer.recent_events()], ['c', 'd', 'e', 'f'])
+
+    def test_recent_events(self):
+        with self.tracer.scope('old'):
+            pass
+        self.now_ns += 5 * 10**9
+        with self.tracer.scope('new'):
+            pass
+        self.assertEqual([name for name, *_ in self.tracer.recent_events(last_sec=1)], ['new'])
+
+    def test_chrome_trace_export(self):
+        def parse():
+            with self.tracer.scope('parse_obj'):
+                pass
+        thread = threading.Thread(target=parse, name='AssetLoader_0')
+        thread.start()
+        thread.join()
+        with self.tracer.scope('render_frame'):
+            pass
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.tracer.export_chrome_trace(os.path.join(directory, 'trace.json'))
+            with open(path) as f:
+                trace = json.load(f)
+        events = {event['name']: event for event in trace['traceEvents'] if event['ph'] == 'X'}
+        self.assertEqual(events['render_frame']['dur'], 1.0)
+        self.assertNotEqual(events['parse_obj']['tid'], events['render_frame']['tid'])
+        thread_names = {event['tid']: event['args']['name'] for event in trace['traceEvents'] if event['ph'] == 'M'}
+        self.assertEqual(thread_names[events['parse_obj']['tid']], 'AssetLoader_0')
+
+    def test_disabled(self):
+        self.tracer.is_enabled = False
+        with self.tracer.scope('frame'):
+            pass
+        self.assertEqual(self.tracer.recent_events(), [])
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+import subprocess
+import sys
+import os
+
+from src.common import defines
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def flags_in_fresh_process(**env):
+    # PyOpenGL reads the flags on import, this process has imported OpenGL.GL already
+    code = 'from src.common import defines; import OpenGL.GL, OpenGL; print(OpenGL.ERROR_CHECKING, OpenGL.ERROR_LOGGING, OpenGL.ERROR_ON_COPY)'
+    environment = {name: value for name, value in os.environ.items() if not name.startswith(('PYOPENGL_ERROR', 'COURSE_GL'))}
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT_DIR, env=dict(environment, **env))
+    return output.stdout.split()
+
+class TestGlProfiles(unittest.TestCase):
+    def test_profiles(self):
+        self.assertEqual(flags_in_fresh_process(COURSE_GL_PROFILE='release'), ['False', 'False', 'False'])
+        # per-call checks are installed, GlDebugOutput turns them off if the driver reports errors itself
+        self.assertEqual(flags_in_fresh_process(COURSE_GL_PROFILE='debug'), ['True', 'False', 'False'])
+        # explicit PyOpenGL flags take precedence
+        self.assertEqual(flags_in_fresh_process(COURSE_GL_PROFILE='release', PYOPENGL_ERROR_CHECKING='1'), ['True', 'False', 'False'])
+
+    def test_applied_before_gl_import(self):
+        with self.assertRaises(Exception):
+            defines.apply_gl_profile('unknown')
+        import OpenGL.GL
+        with self.assertRaises(Exception):
+            defines.apply_gl_profile('release')
+
+    def test_per_call_error_checking_switched(self):
+        from src.common import gl_debug
+        checker = mock.Mock(_registeredChecker='glGetError', nullGetError='nullGetError')
+        with mock.patch.object(gl_debug._errors, '_error_checker', checker):
+            gl_debug.set_per_call_error_checking(False)
+            self.assertEqual(checker._currentChecker, 'nullGetError')
+            gl_debug.set_per_call_error_checking(True)
+            self.assertEqual(checker._currentChecker, 'glGetError')
+
+    def test_headless_backend_applied_before_gl_import(self):
+        with self.assertRaises(Exception):
+            defines.apply_headless_backend('glx')
+        import OpenGL.GL
+        with self.assertRaises(Exception):
+            defines.apply_headless_backend('egl')
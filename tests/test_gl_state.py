@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+
+from OpenGL.GL import GL_TEXTURE0, GL_TEXTURE_1D, GL_TEXTURE_2D, GL_FILL, GL_LINE
+from src.common import gl_state
+from src.common.gl_state import GlState
+
+class TestGlState(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        for name in ['glUseProgram', 'glBindVertexArray', 'glActiveTexture', 'glBindTexture', 'glPolygonMode', 'glLineWidth']:
+            patcher = mock.patch.object(gl_state, name, side_effect=lambda *args, name=name: self.calls.append((name, *args)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.state = GlState()
+
+    def test_redundant_binds_skipped(self):
+        self.state.use_program(3)
+        self.state.use_program(3)
+        self.state.bind_vertex_array(5)
+        self.state.bind_vertex_array(5)
+        self.state.use_program(4)
+        self.assertEqual(self.calls, [('glUseProgram', 3), ('glBindVertexArray', 5), ('glUseProgram', 4)])
+        self.assertEqual((self.state.issued['program'], self.state.skipped['program']), (2, 1))
+
+    def test_textures_tracked_per_unit_and_target(self):
+        self.state.bind_texture(GL_TEXTURE_2D, 7, texture_unit=0)
+        self.state.bind_texture(GL_TEXTURE_2D, 8, texture_unit=1)
+        self.state.bind_texture(GL_TEXTURE_1D, 9, texture_unit=1)
+        self.calls.clear()
+        self.state.bind_texture(GL_TEXTURE_2D, 7, texture_unit=0)
+        self.state.bind_texture(GL_TEXTURE_2D, 8, texture_unit=1)
+        self.assertEqual(self.calls, [('glActiveTexture', GL_TEXTURE0), ('glActiveTexture', GL_TEXTURE0 + 1)])
+        # a deleted texture name may be reused
+        self.state.forget_texture(8)
+        self.state.bind_texture(GL_TEXTURE_2D, 8)
+        self.assertEqual(self.calls[-1], ('glBindTexture', GL_TEXTURE_2D, 8))
+
+    def test_invalidate(self):
+        self.state.use_program(3)
+        self.state.bind_texture(GL_TEXTURE_2D, 7)
+        self.state.invalidate()
+        self.calls.clear()
+        self.state.use_program(3)
+        self.state.bind_texture(GL_TEXTURE_2D, 7)
+        # the active unit is unknown, so every bind is issued until a unit is activated
+        self.state.bind_texture(GL_TEXTURE_2D, 7)
+        self.assertEqual(self.calls, [('glUseProgram', 3)] + [('glBindTexture', GL_TEXTURE_2D, 7)] * 2)
+
+    def test_queries_answered_from_shadow(self):
+        with mock.patch.object(gl_state, 'glGetIntegerv', return_value=[GL_FILL, GL_FILL]) as get_integer:
+            self.assertEqual(self.state.polygon_mode, GL_FILL)
+            self.state.set_polygon_mode(GL_LINE)
+            self.state.set_polygon_mode(GL_LINE)
+            self.assertEqual(self.state.polygon_mode, GL_LINE)
+            self.assertEqual(get_integer.call_count, 1)
+        self.state.set_line_width(3)
+        self.assertEqual(self.state.line_width, 3)
+        self.assertEqual(self.calls, [('glPolygonMode', mock.ANY, GL_LINE), ('glLineWidth', 3)])
+
+    def test_frame_counts(self):
+        self.state.use_program(3)
+        self.state.use_program(3)
+        self.state.end_frame()
+        self.state.use_program(3)
+        self.assertEqual(self.state.frame_counts(), {'program': (1, 1)})
+        self.state.end_frame()
+        self.assertEqual(self.state.frame_counts(), {'program': (0, 1)})
+        self.assertEqual((self.state.total_issued['program'], self.state.total_skipped['program'], self.state.n_frames), (1, 2, 2))
@@ -0,0 +1,103 @@
+import unittest
+import tempfile
+import os
+
+from src.common.glsl_preprocessor import GlslPreprocessor, ShaderSource, CODE_STRING_NAME
+
+def read_text(filepath):
+    with open(filepath) as f:
+        return f.read()
+
+class TestGlslPreprocessor(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.shaders_dir = os.path.join(self.temporary_dir.name, 'shaders')
+        self.demo_dir = os.path.join(self.temporary_dir.name, 'demo')
+        os.makedirs(self.shaders_dir)
+        os.makedirs(self.demo_dir)
+        self.preprocessor = GlslPreprocessor(search_paths=[self.shaders_dir], read_text=read_text)
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def write(self, path, code):
+        path = os.path.join(self.temporary_dir.name, path)
+        with open(path, 'w') as f:
+            f.write(code)
+        return path
+
+    def test_include_with_line_directives(self):
+        common_path = self.write('shaders/common.glsl', 'uniform float u_aspect_ratio;\nfloat half_aspect() { return u_aspect_ratio * 0.5; }')
+        local_path = self.write('demo/local.glsl', '#version 330 core\n#include <common.glsl>\nfloat local_value;')
+        main_path = self.write('demo/vert.glsl', '#version 330 core\n#include "local.glsl"\n#include <common.glsl>\nvoid main() {}')
+
+        source = self.preprocessor.process_file(main_path)
+        self.assertEqual(source.source_files, [main_path, local_path, common_path])
+        self.assertEqual(source.code.split('\n'), [
+            '#version 330 core',
+            '#line 1 1',
+            '// #version 330 core',
+            '#line 1 2',
+            'uniform float u_aspect_ratio;',
+            'float half_aspect() { return u_aspect_ratio * 0.5; }',
+            '#line 3 1',
+            'float local_value;',
+            '#line 3 0',
+            '// #include <common.glsl> (already included)',
+            'void main() {}',
+        ])
+
+    def test_line_directives_before_glsl_330(self):
+        common_path = self.write('shaders/common.glsl', 'float x;\nfloat y;')
+        main_path = self.write('demo/vert.glsl', '#version 150 core\n#include <common.glsl>\nvoid main() {}')
+        source = self.preprocessor.process_file(main_path)
+        # `#line N` numbers the next line N+1
+        self.assertEqual(source.code.split('\n'), ['#version 150 core', '#line 0 1', 'float x;', 'float y;', '#line 2 0', 'void main() {}'])
+        self.assertEqual(source.without_line_directives().split('\n')[1], '// #line 0 1')
+        self.assertEqual([source.locate(line_number) for line_number in [1, 3, 4, 6]],
+                         [(main_path, 1), (common_path, 1), (common_path, 2), (main_path, 3)])
+        source_330 = ShaderSource('#version 330 core\n#line 1 1\nfloat x;\n#line 3 0\nvoid main() {}', [main_path, common_path])
+        self.assertEqual([source_330.locate(line_number) for line_number in [3, 5]], [(common_path, 1), (main_path, 3)])
+
+    def test_code_string(self):
+        common_path = self.write('shaders/common.glsl', 'float x;')
+        source = self.preprocessor.process('#version 330 core\n#include <common.glsl>\n')
+        self.assertEqual(source.source_files, [CODE_STRING_NAME, common_path])
+        self.assertEqual(source.filepaths, [common_path])
+        without_includes = self.preprocessor.process('#version 330 core\nvoid main() {}')
+        self.assertEqual(without_includes.code, '#version 330 core\nvoid main() {}')
+
+    def test_errors(self):
+        missing_path = self.write('demo/missing.glsl', '#version 330 core\n#include "nothing.glsl"\n')
+        with self.assertRaisesRegex(Exception, 'nothing.glsl is not found'):
+            self.preprocessor.process_file(missing_path)
+        self.write('shaders/a.glsl', '#include <b.glsl>\n')
+        self.write('shaders/b.glsl', '#include <a.glsl>\n')
+        cycle_path = self.write('demo/cycle.glsl', '#version 330 core\n#include <a.glsl>\n')
+        with self.assertRaisesRegex(Exception, 'includes itself'):
+            self.preprocessor.process_file(cycle_path)
+        # quoted includes are looked up in the search paths too, angle ones aren't looked up near the file
+        self.write('demo/near.glsl', 'float near;')
+        angle_path = self.write('demo/angle.glsl', '#version 330 core\n#include <near.glsl>\n')
+        with self.assertRaisesRegex(Exception, 'not found'):
+            self.preprocessor.process_file(angle_path)
+
+    def test_dependency_graph(self):
+        common_path = self.write('shaders/common.glsl', 'float x;')
+        local_path = self.write('demo/local.glsl', '#include <common.glsl>\n')
+        vert_path = self.write('demo/vert.glsl', '#version 330 core\n#include "local.glsl"\n')
+        frag_path = self.write('demo/frag.glsl', '#version 330 core\n#include <common.glsl>\n')
+        other_path = self.write('demo/other.glsl', '#version 330 core\n')
+        for path in [vert_path, frag_path, other_path]:
+            self.preprocessor.process_file(path)
+
+        graph = self.preprocessor.graph
+        self.assertEqual(graph.dependents(common_path), {local_path, vert_path, frag_path})
+        self.assertEqual(graph.dependents(local_path), {vert_path})
+        self.assertEqual(graph.dependencies(vert_path), {local_path, common_path})
+        self.assertEqual(graph.dependencies(other_path), set())
+
+        # edges are replaced when the file is processed again
+        self.write('demo/frag.glsl', '#version 330 core\n')
+        self.preprocessor.process_file(frag_path)
+        self.assertEqual(graph.dependents(common_path), {local_path, vert_path})
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from OpenGL.GL import GL_TIMESTAMP
+from src.common import gpu_profiler
+from src.common.gpu_profiler import GpuProfiler
+
+class FakeTimer:
+    """Queries get the timestamp of the counter call, available once `gpu_time_ns` passes it"""
+    def __init__(self):
+        self.timestamps = {}
+        self.now_ns = 0
+        self.gpu_time_ns = 0
+        self.n_generated = 0
+
+    def gen_queries(self, n):
+        self.n_generated += n
+        return list(range(self.n_generated - n + 1, self.n_generated + 1))
+
+    def query_counter(self, query, target):
+        assert target == GL_TIMESTAMP
+        self.now_ns += 1_000_000 # 1 ms between the counters
+        self.timestamps[query] = self.now_ns
+
+    def is_available(self, query, pname):
+        return int(self.timestamps[query] <= self.gpu_time_ns)
+
+    def result(self, query):
+        return self.timestamps[query]
+
+class TestGpuProfiler(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        for name, fake in [('glGenQueries', self.timer.gen_queries), ('glQueryCounter', self.timer.query_counter),
+                           ('glGetQueryObjectiv', self.timer.is_available), ('query_result', self.timer.result)]:
+            patcher = mock.patch.object(gpu_profiler, name, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.profiler = GpuProfiler(history_size=3, max_frames_in_flight=2)
+
+    def render_frame(self):
+        with self.profiler.scope('render_frame'):
+            with self.profiler.scope('meshes'):
+                pass
+        self.profiler.end_frame()
+
+    def test_nested_scopes(self):
+        self.timer.gpu_time_ns = float('inf')
+        self.render_frame()
+        self.assertEqual(self.profiler.scope_paths, ['render_frame', 'render_frame/meshes'])
+        self.assertEqual(self.profiler.stats('render_frame').avg_ms, 3.0)
+        self.assertEqual(self.profiler.stats('render_frame/meshes').avg_ms, 1.0)
+
+    def test_results_read_when_available(self):
+        self.render_frame()
+        self.render_frame()
+        self.assertEqual(self.profiler.scope_paths, [])
+        self.assertEqual(len(self.profiler.pending_frames), 2)
+        self.timer.gpu_time_ns = self.timer.now_ns
+        self.render_frame()
+        self.assertEqual(self.profiler.stats('render_frame').n_samples, 2)
+        self.assertEqual(self.profiler.n_stalls, 0)
+
+    def test_stall_when_too_many_frames_pending(self):
+        for _ in range(3):
+            self.render_frame()
+        self.assertEqual(self.profiler.n_stalls, 1)
+        self.assertEqual(self.profiler.stats('render_frame').n_samples, 1)
+
+    def test_flush_waits_for_all_frames(self):
+        self.render_frame()
+        self.render_frame()
+        self.profiler.flush()
+        self.assertEqual(self.profiler.stats('render_frame').n_samples, 2)
+        self.assertEqual(len(self.profiler.pending_frames), 0)
+
+    def test_queries_reused(self):
+        self.timer.gpu_time_ns = float('inf')
+        for _ in range(10):
+            self.render_frame()
+        self.assertEqual(self.timer.n_generated, 8)
+
+    def test_sliding_window_and_export(self):
+        self.timer.gpu_time_ns = float('inf')
+        for _ in range(5):
+            self.render_frame()
+        self.assertEqual([frame for frame, _ in self.profiler.history['render_frame']], [2, 3, 4])
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.profiler.export_json(os.path.join(directory, 'profile.json'))
+            with open(path) as f:
+                exported = json.load(f)
+        self.assertEqual(exported['scopes']['render_frame/meshes']['stats'],
+                         dict(min_ms=1.0, avg_ms=1.0, max_ms=1.0, n_samples=3))
+        self.assertEqual(len(exported['scopes']['render_frame']['samples']), 3)
+
+    def test_disabled(self):
+        self.profiler.is_enabled = False
+        self.render_frame()
+        self.assertEqual(self.timer.n_generated, 0)
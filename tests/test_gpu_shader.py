@@ -0,0 +1,97 @@
+import unittest
+from unittest import mock
+import numpy as np
+
+from OpenGL.GL import GL_FLOAT, GL_FLOAT_VEC2, GL_FLOAT_MAT4, GL_SAMPLER_2D
+from src.common import gpu_shader
+from src.common.gpu_shader import GpuShader, UniformInfo, UniformStats, UNIFORM_SETTERS
+
+class FakeShader(GpuShader):
+    """Shader with the given active uniforms, without a GL program"""
+    def __init__(self, uniforms):
+        self.uniforms = {uniform.name: uniform for uniform in uniforms}
+        self.attributes = {'a_position': 0}
+        self.uniform_values = {}
+        self.uniform_stats = UniformStats()
+        self.shader_program = 1
+        self.is_from_binary = False
+        self.is_finished = True
+
+    def __del__(self):
+        pass
+
+class TestGpuShader(unittest.TestCase):
+    def setUp(self):
+        self.uploads = []
+        def record_vector(location, count, array):
+            self.uploads.append((location, count, array.copy()))
+        def record_matrix(location, count, transpose, array):
+            self.uploads.append((location, count, transpose, array.copy()))
+        fake_setters = {gl_type: setter._replace(function=record_matrix if setter.is_matrix else record_vector)
+                        for gl_type, setter in UNIFORM_SETTERS.items()}
+        patcher = mock.patch.dict(UNIFORM_SETTERS, fake_setters)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.shader = FakeShader([
+            UniformInfo('u_aspect_ratio', 0, GL_FLOAT, 1),
+            UniformInfo('u_c', 1, GL_FLOAT_VEC2, 1),
+            UniformInfo('u_transform', 2, GL_FLOAT_MAT4, 1),
+            UniformInfo('u_texture', 3, GL_SAMPLER_2D, 1),
+        ])
+
+    def test_unchanged_values_skipped(self):
+        self.assertTrue(self.shader.set('u_aspect_ratio', 1.5))
+        self.assertFalse(self.shader.set('u_aspect_ratio', 1.5))
+        self.assertTrue(self.shader.set('u_aspect_ratio', 2.0))
+        self.assertTrue(self.shader.set('u_texture', 0))
+        self.assertFalse(self.shader.set('u_texture', 0))
+        self.assertEqual(len(self.uploads), 3)
+        self.assertEqual(self.uploads[-1][0], 3)
+        self.assertEqual(self.uploads[-1][2].dtype, np.int32)
+        stats = self.shader.uniform_stats
+        self.assertEqual((stats.issued, stats.skipped), (3, 2))
+        stats.end_frame()
+        self.assertEqual((stats.issued, stats.skipped), (0, 0))
+        self.assertEqual((stats.frame_issued, stats.frame_skipped, stats.n_frames), (3, 2, 1))
+
+    def test_array_modified_in_place(self):
+        transform = np.eye(4, dtype=np.float32)
+        self.assertTrue(self.shader.set('u_transform', transform))
+        self.assertFalse(self.shader.set('u_transform', transform))
+        transform[0, 3] = 1.0
+        self.assertTrue(self.shader.set('u_transform', transform))
+        self.assertTrue(self.shader.set('u_transform', transform, transpose=True))
+        location, count, transpose, array = self.uploads[-1]
+        self.assertEqual((location, count, transpose), (2, 1, True))
+        np.testing.assert_array_equal(array, transform)
+
+    def test_set_many(self):
+        values = {'u_aspect_ratio': 1.0, 'u_c': (0.5, -0.5)}
+        self.assertEqual(self.shader.set_many(values), 2)
+        self.assertEqual(self.shader.set_many(values), 0)
+        self.assertEqual(self.shader.set_many({'u_aspect_ratio': 1.0, 'u_c': [0.5, 0.0]}), 1)
+        np.testing.assert_array_equal(self.uploads[-1][2], np.float32([0.5, 0.0]))
+
+    def test_inactive_names_ignored(self):
+        self.assertFalse(self.shader.set('u_optimized_out', 1.0))
+        self.assertEqual(self.uploads, [])
+        self.assertEqual(self.shader.uniform_stats.issued + self.shader.uniform_stats.skipped, 0)
+        self.assertEqual(self.shader.attribute_location('a_position'), 0)
+        self.assertEqual(self.shader.attribute_location('a_normal'), -1)
+
+    def test_unsupported_type(self):
+        self.shader.uniforms['u_image'] = UniformInfo('u_image', 4, -1, 1)
+        with self.assertRaises(Exception):
+            self.shader.set('u_image', (1, 2))
+
+    def test_completion_status_polled(self):
+        self.shader.is_finished = False
+        with mock.patch.dict(gpu_shader.parallel_compile_state, {'is_supported': True}), \
+             mock.patch.object(gpu_shader, 'raw_glGetProgramiv') as get_program:
+            self.assertFalse(self.shader.is_ready)
+            get_program.side_effect = lambda program, name, status: setattr(status, 'value', 1)
+            self.assertTrue(self.shader.done())
+        # without the extension the status can't be queried without waiting, `finish` waits
+        with mock.patch.dict(gpu_shader.parallel_compile_state, {'is_supported': False}):
+            self.assertTrue(self.shader.is_ready)
@@ -0,0 +1,61 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+
+from src.common.mesh_cache import MeshCache
+from src.common.obj_loader import ParsedWavefront
+
+QUAD_OBJ = """v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 1
+f 1/1 2/2 3/1 4/2
+"""
+
+class TestMeshCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.obj_path = os.path.join(self.temporary_dir.name, 'quad.obj')
+        with open(self.obj_path, 'w') as f:
+            f.write(QUAD_OBJ)
+        self.cache = MeshCache(os.path.join(self.temporary_dir.name, 'cache'))
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def test_warm_load_matches_parsing(self):
+        expected_attributes, expected_indices = ParsedWavefront(self.obj_path, verbose=False).as_numpy_indexed('P3_T2')
+        for _ in range(2):
+            attributes, indices = self.cache.load(self.obj_path, 'P3_T2', use_index_buffer=True, verbose=False)
+            np.testing.assert_array_equal(attributes, expected_attributes)
+            np.testing.assert_array_equal(indices, expected_indices)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+        self.assertIsInstance(attributes, np.memmap)
+
+    def test_key_includes_layout_and_mode(self):
+        self.cache.load(self.obj_path, 'P3_T2', use_index_buffer=True, verbose=False)
+        self.cache.load(self.obj_path, 'P2', use_index_buffer=True, verbose=False)
+        attributes, indices = self.cache.load(self.obj_path, 'P3_T2', use_index_buffer=False, verbose=False)
+        self.assertIsNone(indices)
+        self.assertEqual(attributes.shape, (6, 5))
+        self.assertEqual((self.cache.misses, self.cache.hits), (3, 0))
+
+    def test_invalidated_on_content_change(self):
+        self.cache.load(self.obj_path, 'P3', use_index_buffer=True, verbose=False)
+        with open(self.obj_path, 'w') as f:
+            f.write(QUAD_OBJ.replace('v 1 1 0', 'v 2 2 0'))
+        attributes, _ = self.cache.load(self.obj_path, 'P3', use_index_buffer=True, verbose=False)
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(attributes.max(), 2.0)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.load(self.obj_path, 'P3', use_index_buffer=True, verbose=False)
+        entry_size = self.cache.size_bytes
+        self.cache.max_size_bytes = entry_size
+        self.cache.load(self.obj_path, 'P2', use_index_buffer=True, verbose=False)
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.cache.load(self.obj_path, 'P2', use_index_buffer=True, verbose=False)
+        self.assertEqual(self.cache.hits, 1)
@@ -0,0 +1,48 @@
+import unittest
+import tempfile
+import os
+
+from src.common.mesh_registry import GpuMeshRegistry, make_mesh_key
+
+class FakeBuffers:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+class TestMeshRegistry(unittest.TestCase):
+    def test_shared_and_reference_counted(self):
+        registry = GpuMeshRegistry(idle_budget_bytes=0)
+        first = registry.acquire('mesh', lambda: FakeBuffers(10))
+        second = registry.acquire('mesh', lambda: self.fail('must not be uploaded again'))
+        self.assertIs(first, second)
+        self.assertEqual((registry.hits, registry.misses), (1, 1))
+        registry.release('mesh')
+        self.assertIn('mesh', registry)
+        registry.release('mesh')
+        # no users and no budget for idle buffers
+        self.assertNotIn('mesh', registry)
+
+    def test_idle_buffers_evicted_least_recently_released_first(self):
+        registry = GpuMeshRegistry(idle_budget_bytes=25)
+        for key in ['a', 'b', 'c']:
+            registry.acquire(key, lambda: FakeBuffers(10))
+        registry.release('b')
+        registry.release('a')
+        self.assertEqual(registry.idle_bytes, 20)
+        # reused idle buffers aren't evicted
+        registry.acquire('b', lambda: self.fail('must not be uploaded again'))
+        registry.release('c')
+        registry.release('b')
+        self.assertEqual((('a' in registry), ('b' in registry), ('c' in registry)), (False, True, True))
+        self.assertEqual(registry.idle_bytes, 20)
+
+    def test_key(self):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            obj_path = os.path.join(temporary_dir, 'mesh.obj')
+            with open(obj_path, 'w') as f:
+                f.write('v 0 0 0\n')
+            key = make_mesh_key(obj_path, 'p3_t2', use_index_buffer=True)
+            self.assertEqual(key, make_mesh_key(obj_path, 'P3_T2', use_index_buffer=True))
+            self.assertNotEqual(key, make_mesh_key(obj_path, 'P3_T2', use_index_buffer=False))
+            self.assertNotEqual(key, make_mesh_key(obj_path, 'P3_N3', use_index_buffer=True))
+            os.utime(obj_path, ns=(0, 0))
+            self.assertNotEqual(key, make_mesh_key(obj_path, 'P3_T2', use_index_buffer=True))
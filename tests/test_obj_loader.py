@@ -0,0 +1,140 @@
+import unittest
+import pathlib
+import tempfile
+import os
+import numpy as np
+
+from src.common.obj_loader import ParsedWavefront, deduplicate_vertices, make_interleaved_dtype, gather_rows
+
+EXAMPLE_OBJ = """# comment
+v 1.0 2.0 3.0
+  v 4 5 6 # inline comment
+v -1e-1 .5 2.
+vt 0.5 0.5
+vt 1.0 0.0
+vn 0.0 0.0 1.0
+g group
+f 1/1/1 2/2/1 3/1/1
+f 3/2/1 2/2/1 1/1/1 2/1/1
+"""
+
+class TestObjLoader(unittest.TestCase):
+    def assert_same_parsing(self, wavefront_str):
+        bulk = ParsedWavefront.parse_string(wavefront_str, verbose=False)
+        per_line = ParsedWavefront.parse_string_per_line(wavefront_str, verbose=False)
+        self.assertEqual(bulk.keys(), per_line.keys())
+        for key in per_line:
+            if key.endswith('_parsed'):
+                self.assertEqual(bulk[key].dtype, np.float32, key)
+                expected = np.array(per_line[key], dtype=np.float32).reshape(len(per_line[key]), bulk[key].shape[1])
+            else:
+                self.assertEqual(bulk[key].dtype, np.int32, key)
+                expected = np.array(per_line[key], dtype=np.int32)
+            np.testing.assert_array_equal(bulk[key], expected, key)
+
+    def test_bulk_parsing_example(self):
+        self.assert_same_parsing(EXAMPLE_OBJ)
+
+    def test_bulk_parsing_face_forms(self):
+        header = 'v 0 0 0\nv 1 0 0\nv 0 1 0\nvt 0 0\nvn 0 0 1\n'
+        for face in ['f 1 2 3', 'f 1/1 2/1 3/1', 'f 1//1 2//1 3//1', 'f 1/1/1 2/1/1 3/1/1']:
+            self.assert_same_parsing(header + face + '\n' + face)
+
+    def test_bulk_parsing_bad_corners_skipped(self):
+        header = 'v 0 0 0\nv 1 0 0\nv 0 1 0\nvt 0 0\nvn 0 0 1\n'
+        for faces in ['f 1/1/ 2/1/ 3/1/\nf 1/1 2/1 3/1', 'f 1// 2// 3//\nf 1 2 3', 'f 1/1/1 2/1/1 3/1/1\nf 1/1/1 2/1/ 3/1/1',
+                      'f 1/1/1/ 2/1/1 3/1/1 1/1/1\nf 3 2 1', 'f 1/1/ 2/1/ 3/1/']:
+            self.assert_same_parsing(header + faces)
+
+    def test_bulk_parsing_inconsistent_faces(self):
+        with self.assertRaises(Exception):
+            ParsedWavefront.parse_string('v 0 0 0\nvt 0 0\nvn 0 0 1\nf 1/1 1/1 1/1\nf 1//1 1//1 1//1', verbose=False)
+
+    def test_bulk_parsing_negative_indices(self):
+        vertices = 'v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\n'
+        for faces in ['f -3 -2 -1', 'f 1 2 3\nf 2 3 -1', 'f 0 1 2']:
+            with self.assertRaisesRegex(Exception, f'line {faces.count(chr(10)) + 5} has a negative or zero index'):
+                ParsedWavefront.parse_string(vertices + faces, verbose=False)
+
+    def test_gather_rows_out_of_bounds(self):
+        source = np.arange(8, dtype=np.float32).reshape(4, 2)
+        out = np.empty((1, 2), dtype=np.float32)
+        for index in [-1, 4]:
+            with self.assertRaises(IndexError):
+                gather_rows(source, np.array([index]), out)
+
+    def test_bulk_parsing_assets(self):
+        assets_dir = pathlib.Path.cwd()/'assets'
+        for obj_path in sorted(assets_dir.glob('*/*.obj')):
+            with open(obj_path, 'r') as f:
+                self.assert_same_parsing(f.read())
+
+    def test_as_numpy_indexed(self):
+        scene = ParsedWavefront('', parse=False)
+        scene.parsed = ParsedWavefront.parse_string(EXAMPLE_OBJ, verbose=False)
+        attributes = scene.as_numpy('P3_T2')
+        indexed_attributes, indices = scene.as_numpy_indexed('P3_T2')
+        self.assertEqual(attributes.shape, (9, 5))
+        np.testing.assert_array_equal(indexed_attributes[indices], attributes)
+
+    def test_as_numpy_memoized(self):
+        scene = ParsedWavefront('', parse=False)
+        scene.parsed = ParsedWavefront.parse_string(EXAMPLE_OBJ, verbose=False)
+        attributes = scene.as_numpy('P3_T2')
+        self.assertIs(scene.as_numpy('p3_t2'), attributes)
+        self.assertIsNot(scene.as_numpy('P3_T2', dtype=np.float64), attributes)
+        self.assertIs(scene.as_numpy_indexed('P3_T2')[1], scene.as_numpy_indexed('P3_T2')[1])
+        self.assertFalse(attributes.flags.writeable)
+
+    def test_as_numpy_into_output_buffer(self):
+        scene = ParsedWavefront('', parse=False)
+        scene.parsed = ParsedWavefront.parse_string(EXAMPLE_OBJ, verbose=False)
+        expected = scene.as_numpy('T2_P4')
+        np.testing.assert_array_equal(expected[:, 2:5], np.array(scene.parsed['positions_parsed'])[scene.parsed['positions_array_indices']])
+        np.testing.assert_array_equal(expected[:, 5], 0) # padded
+
+        vertex_dtype = make_interleaved_dtype('T2_P4')
+        self.assertEqual(vertex_dtype.itemsize, 6 * 4)
+        out = bytearray(len(expected) * vertex_dtype.itemsize + 8)
+        attributes = scene.as_numpy('T2_P4', out=out)
+        np.testing.assert_array_equal(attributes, expected)
+        np.testing.assert_array_equal(np.frombuffer(out, dtype=vertex_dtype, count=len(expected))['P'], expected[:, 2:])
+
+        out = np.zeros(len(expected), dtype=vertex_dtype)
+        scene.as_numpy('T2_P4', out=out)
+        np.testing.assert_array_equal(out['T'], expected[:, :2])
+        with self.assertRaises(Exception):
+            scene.as_numpy('T2_P4', out=bytearray(vertex_dtype.itemsize))
+
+    def test_as_numpy_from_per_line_parsing(self):
+        bulk, per_line = ParsedWavefront('', parse=False), ParsedWavefront('', parse=False)
+        bulk.parsed = ParsedWavefront.parse_string(EXAMPLE_OBJ, verbose=False)
+        per_line.parsed = ParsedWavefront.parse_string_per_line(EXAMPLE_OBJ, verbose=False)
+        np.testing.assert_array_equal(bulk.as_numpy('P3_N3_T2'), per_line.as_numpy('P3_N3_T2'))
+        for bulk_array, per_line_array in zip(bulk.as_numpy_indexed('N3_P4'), per_line.as_numpy_indexed('N3_P4')):
+            np.testing.assert_array_equal(bulk_array, per_line_array)
+
+    def test_parallel_parsing(self):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            obj_path = os.path.join(temporary_dir, 'example.obj')
+            with open(obj_path, 'w') as f:
+                f.write(EXAMPLE_OBJ * 3)
+            for obj_path in [obj_path, pathlib.Path.cwd()/'assets'/'spot_cow'/'spot_triangulated.obj']:
+                serial = ParsedWavefront(obj_path, verbose=False).parsed
+                for workers in [2, 5]:
+                    parallel = ParsedWavefront(obj_path, verbose=False, workers=workers).parsed
+                    for key in serial:
+                        self.assertEqual(parallel[key].dtype, serial[key].dtype, key)
+                        np.testing.assert_array_equal(parallel[key], serial[key], key)
+
+    def test_deduplicate_vertices_first_occurrence_order(self):
+        random = np.random.default_rng(0)
+        for max_index in [50, 2**40]: # the second one doesn't fit into a packed 64-bit key
+            corners = random.integers(0, max_index, size=(1000, 3))
+            corners[500:] = corners[random.integers(0, 500, size=500)]
+            vertex_index_cache = {}
+            expected_indices = [vertex_index_cache.setdefault(vertex, len(vertex_index_cache))
+                                for vertex in map(tuple, corners.tolist())]
+            unique_vertices, face_vertex_indices = deduplicate_vertices(corners)
+            self.assertEqual(face_vertex_indices.tolist(), expected_indices)
+            self.assertEqual(list(map(tuple, unique_vertices.tolist())), list(vertex_index_cache))
@@ -0,0 +1,48 @@
+import unittest
+import tempfile
+import time
+import os
+
+from src.common.program_binary_cache import ProgramBinaryCache
+
+class TestProgramBinaryCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.cache = ProgramBinaryCache(cache_dir=self.temporary_dir.name, max_size_bytes=250)
+        # as if queried from the current context
+        self.cache.driver_id = 'Mesa|llvmpipe|4.5 (Core Profile) Mesa 22.3.6'
+        self.cache.is_supported = True
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def write_entry(self, key, size, last_use):
+        path = self.cache.entry_path(key)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * size)
+        os.utime(path, (last_use, last_use))
+
+    def test_key_depends_on_sources_and_driver(self):
+        key = self.cache.make_key('#version 330 core\n', '#version 330 core\n', b'out_color')
+        self.assertEqual(key, self.cache.make_key('#version 330 core\n', '#version 330 core\n', b'out_color'))
+        self.assertNotEqual(key, self.cache.make_key('#version 330 core\n', '#version 330 core\n', b'out_other'))
+        self.assertNotEqual(key, self.cache.make_key('#version 330 core\n\n', '#version 330 core\n', b'out_color'))
+        self.cache.driver_id = 'Mesa|llvmpipe|4.5 (Core Profile) Mesa 23.0.0'
+        self.assertNotEqual(key, self.cache.make_key('#version 330 core\n', '#version 330 core\n', b'out_color'))
+
+    def test_missing_entry_or_no_support(self):
+        self.assertIsNone(self.cache.load_program('missing'))
+        self.assertEqual(self.cache.misses, 1)
+        self.write_entry('present', 100, time.time())
+        self.cache.is_supported = False
+        self.assertIsNone(self.cache.load_program('present'))
+
+    def test_evict_least_recently_used(self):
+        now = time.time()
+        for i, key in enumerate(['old', 'middle', 'new']):
+            self.write_entry(key, 100, now - 100 + i)
+        self.cache.evict()
+        self.assertEqual(sorted(key for key, _, _ in self.cache.entries()), ['middle', 'new'])
+        self.assertEqual(self.cache.size_bytes, 200)
+        self.cache.clear()
+        self.assertEqual(self.cache.entries(), [])
@@ -0,0 +1,63 @@
+import unittest
+import subprocess
+import tempfile
+import sys
+import os
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+NO_CONTEXT_EXIT_CODE = 3
+
+COMPILE_CODE = '''
+import sys
+from src.common import defines
+defines.apply_headless_backend('egl')
+from src.common.headless import HeadlessContext
+try:
+    context = HeadlessContext('egl')
+except Exception:
+    sys.exit(NO_CONTEXT_EXIT_CODE)
+from src.common.gpu_shader import GpuShaderStage, load_shader_code, with_defines
+from OpenGL.GL import GL_VERTEX_SHADER
+stage = GpuShaderStage(GL_VERTEX_SHADER, with_defines(load_shader_code(sys.argv[1], 'vertex'), eval(sys.argv[2])))
+try:
+    stage.check()
+except Exception as error:
+    print(error)
+'''.replace('NO_CONTEXT_EXIT_CODE', str(NO_CONTEXT_EXIT_CODE))
+
+class TestShaderErrors(unittest.TestCase):
+    """Compiles broken shaders with the driver (Mesa's llvmpipe through EGL), skipped without it"""
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporary_dir.cleanup)
+
+    def write(self, name, code):
+        path = os.path.join(self.temporary_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(code)
+        return path
+
+    def compile_error(self, shader_path, defines=None) -> str:
+        # the headless backend should be applied before OpenGL.GL is imported, this process has imported it already
+        output = subprocess.run([sys.executable, '-c', COMPILE_CODE, shader_path, repr(defines)],
+                                capture_output=True, text=True, cwd=ROOT_DIR)
+        if output.returncode == NO_CONTEXT_EXIT_CODE:
+            self.skipTest('No EGL context')
+        self.assertEqual(output.returncode, 0, output.stderr)
+        return output.stdout
+
+    def test_error_in_include(self):
+        for version in ['150 core', '330 core']:
+            included_path = self.write('transform.glsl', 'uniform mat4 u_transform;\nvec4 transform(vec3 p) { return u_transform * undeclared; }\n')
+            main_path = self.write('vert.glsl', f'#version {version}\n#include "transform.glsl"\nin vec3 a_position;\n'
+                                                'void main() { gl_Position = transform(a_position) + also_undeclared; }\n')
+            error = self.compile_error(main_path)
+            self.assertIn(f'{included_path}:2', error, version)
+            self.assertIn(f'{main_path}:4', error, version)
+
+    def test_error_with_defines(self):
+        for version in ['150 core', '330 core']:
+            path = self.write('vert.glsl', f'#version {version}\nin vec3 a_position;\nvoid main() {{ gl_Position = vec4(a_position * SCALE, undeclared); }}\n')
+            error = self.compile_error(path, defines={'SCALE': 2.0, 'USE_PALETTE': None})
+            self.assertIn(f'{path}:3', error, version)
+            self.assertNotIn(f'{path}:4', error, version)
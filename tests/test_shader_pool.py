@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+import tempfile
+import os
+
+from OpenGL.GL import GL_VERTEX_SHADER, GL_FRAGMENT_SHADER
+from src.common.gpu_shader import inject_defines, with_defines
+from src.common import shader_pool
+from src.common.shader_pool import ShaderPool
+
+VERTEX_CODE = '#version 330 core\nin vec3 a_position;\nvoid main() { gl_Position = vec4(a_position, 1.0); }\n'
+FRAGMENT_CODE = '#version 330 core\nout vec4 out_color;\nvoid main() { out_color = vec4(1.0); }\n'
+OTHER_FRAGMENT_CODE = '#version 330 core\nout vec4 out_color;\nvoid main() { out_color = vec4(0.0); }\n'
+
+class FakeStage:
+    def __init__(self, shader_type, shader_source):
+        self.shader_type, self.shader_source = shader_type, shader_source
+        self.compile_time_sec = 0.25
+
+class FakeShader:
+    """Builds the shader objects like GpuShader, without a GL program"""
+    def __init__(self, vertex_shader_code, fragment_shader_code, out_variable, defines=None, compile_stage=None, binary_cache=None,
+                 deferred=False):
+        self.vertex_shader = compile_stage(GL_VERTEX_SHADER, with_defines(vertex_shader_code, defines))
+        self.fragment_shader = compile_stage(GL_FRAGMENT_SHADER, with_defines(fragment_shader_code, defines))
+        self.build_time_sec = 1.0
+        self.is_from_binary = False
+        self.is_finished = not deferred
+
+    def finish(self):
+        self.is_finished = True
+
+class TestShaderPool(unittest.TestCase):
+    def setUp(self):
+        for name, fake in [('GpuShader', FakeShader), ('GpuShaderStage', FakeStage)]:
+            patcher = mock.patch.object(shader_pool, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.pool = ShaderPool()
+
+    def test_programs_shared(self):
+        shader = self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color')
+        self.assertIs(self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color'), shader)
+        self.assertIsNot(self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_other'), shader)
+        self.assertIsNot(self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color', defines={'N_STEPS': 10}), shader)
+        self.assertEqual((self.pool.links, self.pool.program_hits), (3, 1))
+
+    def test_shader_objects_shared(self):
+        shader = self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color')
+        other_shader = self.pool.load(VERTEX_CODE, OTHER_FRAGMENT_CODE, b'out_color')
+        self.assertIs(other_shader.vertex_shader, shader.vertex_shader)
+        self.assertIsNot(other_shader.fragment_shader, shader.fragment_shader)
+        self.assertEqual((self.pool.compiles, self.pool.stage_hits), (3, 1))
+        self.assertEqual(self.pool.time_saved_sec, 0.25)
+
+    def test_files_with_same_code_shared(self):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            paths = [os.path.join(temporary_dir, name) for name in ['a_vert.glsl', 'b_vert.glsl']]
+            for path in paths:
+                with open(path, 'w') as f:
+                    f.write(VERTEX_CODE)
+            shader = self.pool.load(paths[0], FRAGMENT_CODE, b'out_color')
+            self.assertIs(self.pool.load(paths[1], FRAGMENT_CODE, b'out_color'), shader)
+
+    def test_released_programs_deleted(self):
+        shader = self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color')
+        del shader
+        self.assertEqual(len(self.pool.programs), 0)
+        self.assertEqual(len(self.pool.stages), 0)
+        self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color')
+        self.assertEqual((self.pool.links, self.pool.compiles), (2, 4))
+
+    def test_deferred_program_finished_by_regular_load(self):
+        shader = self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color', deferred=True)
+        self.assertFalse(shader.is_finished)
+        self.assertIs(self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color', deferred=True), shader)
+        self.assertFalse(shader.is_finished)
+        self.pool.load(VERTEX_CODE, FRAGMENT_CODE, b'out_color')
+        self.assertTrue(shader.is_finished)
+
+    def test_inject_defines(self):
+        self.assertEqual(inject_defines(VERTEX_CODE), VERTEX_CODE)
+        code = inject_defines(VERTEX_CODE, {'THRESHOLD': 4.0, 'USE_PALETTE': None})
+        lines = code.split('\n')
+        self.assertEqual(lines[:4], ['#version 330 core', '#define THRESHOLD 4.0', '#define USE_PALETTE', '#line 2'])
+        self.assertEqual('\n'.join(lines[4:]), VERTEX_CODE.split('\n', 1)[1])
+        # before GLSL 3.30 `#line N` numbers the next line N+1
+        lines = inject_defines(VERTEX_CODE.replace('330', '150'), {'THRESHOLD': 4.0}).split('\n')
+        self.assertEqual(lines[:3], ['#version 150 core', '#define THRESHOLD 4.0', '#line 1'])
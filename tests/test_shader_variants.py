@@ -0,0 +1,41 @@
+import unittest
+
+from src.common.shader_variants import ShaderVariants
+
+class FakePool:
+    def __init__(self):
+        self.loaded = []
+        self.deferred = []
+
+    def load(self, vertex_shader_code, fragment_shader_code, out_variable, defines=None, deferred=False):
+        self.loaded.append(defines)
+        self.deferred.append(deferred)
+        return object()
+
+class TestShaderVariants(unittest.TestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        self.variants = ShaderVariants('vert.glsl', 'frag.glsl', b'out_color', shader_pool=self.pool)
+
+    def test_compiled_once_per_define_set(self):
+        shader = self.variants.get({'N_CONVERGENCE_STEPS': 80, 'THRESHOLD': '4.0'})
+        self.assertIs(self.variants.get({'THRESHOLD': '4.0', 'N_CONVERGENCE_STEPS': 80}), shader)
+        self.assertIsNot(self.variants.get({'N_CONVERGENCE_STEPS': 160, 'THRESHOLD': '4.0'}), shader)
+        self.assertIsNot(self.variants.get(), shader)
+        self.assertEqual(len(self.pool.loaded), 3)
+        self.assertEqual(self.variants.compiled_on_demand, 3)
+
+    def test_warm_up_one_per_call(self):
+        self.variants.get({'N_CONVERGENCE_STEPS': 80})
+        self.variants.warm_up([{'N_CONVERGENCE_STEPS': n} for n in (40, 80, 160, 160)])
+        self.assertEqual(len(self.variants.pending), 2)
+        self.assertTrue(self.variants.warm_up_next())
+        self.assertIn({'N_CONVERGENCE_STEPS': 40}, self.variants)
+        self.assertNotIn({'N_CONVERGENCE_STEPS': 160}, self.variants)
+        # used before its turn, then skipped by the warm-up
+        self.variants.get({'N_CONVERGENCE_STEPS': 160})
+        self.assertFalse(self.variants.warm_up_next())
+        self.assertEqual((self.variants.compiled_ahead, self.variants.compiled_on_demand), (1, 2))
+        self.assertEqual(len(self.pool.loaded), 3)
+        # only the warm-up doesn't wait for the compiler
+        self.assertEqual(self.pool.deferred, [False, True, False])
@@ -0,0 +1,56 @@
+import unittest
+import tempfile
+import shutil
+import os
+import numpy as np
+from PIL import Image
+
+from src.common.asset_loader import AssetLoader
+from src.common.texture_cache import TextureCache, resolve_asset_path, ASSETS_DIR
+
+class TestTextureCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.asset_loader = AssetLoader(max_workers=1)
+        self.cache = TextureCache(self.asset_loader)
+        self.pixels = np.arange(4*3*3, dtype=np.uint8).reshape(4, 3, 3)
+        self.image_path = os.path.join(self.temporary_dir.name, 'image.png')
+        Image.fromarray(self.pixels).save(self.image_path)
+
+    def tearDown(self):
+        self.asset_loader.shutdown()
+        self.temporary_dir.cleanup()
+
+    def test_resolve_asset_path(self):
+        self.assertEqual(resolve_asset_path('crate_color.jpeg'), os.path.join(ASSETS_DIR, 'crate_color.jpeg'))
+        self.assertEqual(resolve_asset_path(self.image_path), self.image_path)
+        working_dir = os.getcwd()
+        try:
+            os.chdir(self.temporary_dir.name)
+            self.assertEqual(resolve_asset_path('crate_color.jpeg'), os.path.join(ASSETS_DIR, 'crate_color.jpeg'))
+            self.assertEqual(os.path.realpath(resolve_asset_path('image.png')), os.path.realpath(self.image_path))
+        finally:
+            os.chdir(working_dir)
+
+    def test_images_deduplicated_by_content(self):
+        copy_path = os.path.join(self.temporary_dir.name, 'copy.png')
+        shutil.copy(self.image_path, copy_path)
+        image = self.cache.load_image_async(self.image_path, flip_y=True)
+        self.assertIs(self.cache.load_image_async(copy_path, flip_y=True), image)
+        self.assertIsNot(self.cache.load_image_async(copy_path), image)
+        np.testing.assert_array_equal(np.asarray(image.result()), self.pixels[::-1])
+
+    def test_texture_key(self):
+        key = self.cache.texture_key(self.image_path)
+        self.assertNotEqual(key, self.cache.texture_key(self.image_path, flip_y=True))
+        self.assertNotEqual(key, self.cache.texture_key(self.image_path, store_srgb=True))
+        self.assertNotEqual(key, self.cache.texture_key(self.image_path, is_1d=True))
+        Image.fromarray(self.pixels[::-1]).save(self.image_path)
+        os.utime(self.image_path, ns=(0, 0))
+        self.assertNotEqual(key, self.cache.texture_key(self.image_path))
+
+    def test_prepare_decodes_only_missing_textures(self):
+        futures = self.cache.prepare(self.image_path)
+        self.assertEqual(len(futures), 1)
+        self.cache.textures[self.cache.texture_key(self.image_path)] = object()
+        self.assertEqual(self.cache.prepare(self.image_path), [])